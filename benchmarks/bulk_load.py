@@ -0,0 +1,117 @@
+"""Benchmark loading many credentials files at once.
+
+Run from the repository root:
+
+    python -m benchmarks.bulk_load [--files N] [--delay SECONDS]
+
+Writes ``--files`` user credentials files and service account key files,
+half of each, whose tokens come from a local stub token endpoint that waits
+``--delay`` seconds before each response, as the real endpoint's latency.
+Compares calling the single-file loaders in a loop with
+:func:`pydata_google_auth.load_credentials_files` at several pool sizes.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+import pydata_google_auth
+from pydata_google_auth import _signers
+from pydata_google_auth import cache
+from tests.unit.conftest import TokenEndpoint
+
+SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+WORKER_COUNTS = (1, 4, 10, 32, 64)
+
+
+def _write_files(directory, count, token_uri):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode("utf-8")
+    paths = []
+    for index in range(count):
+        path = os.path.join(directory, "credentials-{}.json".format(index))
+        if index % 2:
+            info = {
+                "type": "service_account",
+                "client_email": "sa-{}@my-project.iam.gserviceaccount.com".format(
+                    index
+                ),
+                "private_key": pem,
+                "token_uri": token_uri,
+            }
+        else:
+            info = {
+                "type": "authorized_user",
+                "refresh_token": "refresh_token",
+                "token_uri": token_uri,
+                "client_id": "client_id",
+                "client_secret": "client_secret",
+            }
+        with open(path, "w") as stream:
+            json.dump(info, stream)
+        paths.append(path)
+    return paths
+
+
+def _serial(paths):
+    for path in paths:
+        with open(path) as stream:
+            kind = json.load(stream)["type"]
+        if kind == "service_account":
+            pydata_google_auth.load_service_account_credentials(path, scopes=SCOPES)
+        else:
+            pydata_google_auth.load_user_credentials(path)
+
+
+def _bulk(paths, max_workers):
+    _, errors = pydata_google_auth.load_credentials_files(
+        paths, scopes=SCOPES, max_workers=max_workers
+    )
+    assert not errors, errors
+
+
+def _measure(name, paths, load):
+    # Parse each private key again, as a fresh process would.
+    cache._SERVICE_ACCOUNT_SIGNERS = _signers.SignerCache(maxsize=len(paths))
+    start = time.perf_counter()
+    load()
+    elapsed = time.perf_counter() - start
+    print(
+        "{:<16} {:>8.2f}s {:>10.1f} files/s".format(name, elapsed, len(paths) / elapsed)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        endpoint = TokenEndpoint(delay=args.delay)
+        endpoint.start()
+        try:
+            paths = _write_files(temp_dir, args.files, endpoint.uri)
+            print("{:<16} {:>9} {:>16}".format("loader", "elapsed", "throughput"))
+            _measure("serial", paths, lambda: _serial(paths))
+            for workers in WORKER_COUNTS:
+                _measure(
+                    "bulk workers={}".format(workers),
+                    paths,
+                    lambda: _bulk(paths, workers),
+                )
+        finally:
+            endpoint.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark the JSON file and SQLite credentials caches under concurrency.
+
+Run from the repository root:
+
+    python -m benchmarks.cache_concurrency [--operations N]
+
+Each worker process loads a still-valid access token from the cache and,
+every tenth operation, saves a new one, as processes do after refreshing.
+The cache lives in a temporary directory. No requests are made to the token
+endpoint.
+"""
+
+import argparse
+import concurrent.futures
+import datetime
+import multiprocessing
+import os
+import tempfile
+import time
+
+import google.oauth2.credentials
+
+from pydata_google_auth import cache
+
+PROCESS_COUNTS = (1, 2, 4, 8, 16, 32, 64)
+SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+SAVE_EVERY = 10
+
+
+def _make_credentials(token):
+    expiry = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+    return google.oauth2.credentials.Credentials(
+        token=token,
+        expiry=expiry.replace(microsecond=0),
+        refresh_token="refresh_token",
+        token_uri="https://oauth2.googleapis.com/token",
+        client_id="client_id",
+        client_secret="client_secret",
+        scopes=SCOPES,
+    )
+
+
+def _make_cache(kind):
+    if kind == "json":
+        return cache.ReadWriteCredentialsCache()
+    return cache.SQLiteCredentialsCache()
+
+
+def _worker(kind, worker_id, operations):
+    credentials_cache = _make_cache(kind)
+    start = time.perf_counter()
+    for operation in range(operations):
+        if operation % SAVE_EVERY == 0:
+            credentials_cache.save(
+                _make_credentials("token-{}-{}".format(worker_id, operation))
+            )
+        else:
+            credentials = credentials_cache.load_for(
+                scopes=SCOPES, client_id="client_id"
+            )
+            assert credentials is not None and credentials.valid
+    return time.perf_counter() - start
+
+
+def _run(kind, processes, operations):
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=processes, mp_context=multiprocessing.get_context("fork")
+    ) as executor:
+        futures = [
+            executor.submit(_worker, kind, worker_id, operations)
+            for worker_id in range(processes)
+        ]
+        elapsed = [future.result() for future in futures]
+    return processes * operations / max(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--operations", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        os.environ["HOME"] = home
+        print("{:>9}  {:>14}  {:>14}".format("processes", "json ops/s", "sqlite ops/s"))
+        for processes in PROCESS_COUNTS:
+            throughput = {}
+            for kind in ("json", "sqlite"):
+                _make_cache(kind).save(_make_credentials("initial"))
+                throughput[kind] = _run(kind, processes, args.operations)
+            print(
+                "{:>9}  {:>14.0f}  {:>14.0f}".format(
+                    processes, throughput["json"], throughput["sqlite"]
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark interpreter startup with ``import pydata_google_auth``.
+
+Run from the repository root:
+
+    python -m benchmarks.import_startup [--runs N]
+
+Each run starts a fresh interpreter, imports the package and counts the
+processes it spawns. Reading ``__version__`` asks ``git`` in a source
+checkout, including an editable install. The VCS lookup case is what every
+import used to do.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+_SCRIPT = """
+import sys
+
+events = []
+sys.addaudithook(
+    lambda event, args: events.append(event)
+    if event in ("subprocess.Popen", "os.posix_spawn", "os.fork", "os.exec")
+    else None
+)
+import pydata_google_auth
+{statement}
+print(len(events))
+"""
+
+_CASES = (
+    ("import", ""),
+    ("import + __version__", "pydata_google_auth.__version__"),
+    (
+        "import + VCS lookup",
+        "from pydata_google_auth import _version; _version.get_versions()",
+    ),
+)
+
+
+def _run(statement):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", _SCRIPT.format(statement=statement)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return time.perf_counter() - start, int(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    for name, statement in _CASES:
+        results = [_run(statement) for _ in range(args.runs)]
+        timings = [elapsed for elapsed, _ in results]
+        print(
+            "{:<22} median {:7.1f} ms  max {:7.1f} ms  processes spawned {}".format(
+                name,
+                statistics.median(timings) * 1000,
+                max(timings) * 1000,
+                results[-1][1],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark ``python -m pydata_google_auth print-token``.
+
+Run from the repository root:
+
+    python -m benchmarks.print_token [--runs N] [--delay SECONDS]
+
+Each run starts a fresh interpreter, as a shell script calling
+``print-token`` before each request does. The token comes from a local stub
+token endpoint that waits ``--delay`` seconds before each response, as the
+real endpoint's latency. Compares an empty interpreter, a cache miss, which
+refreshes the credentials, and a cache hit.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from tests.unit.conftest import TokenEndpoint
+
+
+def _run(command, env):
+    start = time.perf_counter()
+    subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def _measure(name, runs, command, env, before=None):
+    timings = []
+    for _ in range(runs):
+        if before is not None:
+            before()
+        timings.append(_run(command, env))
+    print(
+        "{:<12} {:>8.1f} ms {:>8.1f} ms".format(
+            name, statistics.median(timings) * 1000, min(timings) * 1000
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        endpoint = TokenEndpoint(delay=args.delay)
+        endpoint.start()
+        try:
+            path = os.path.join(temp_dir, "credentials.json")
+            with open(path, "w") as stream:
+                json.dump(
+                    {
+                        "refresh_token": "refresh_token",
+                        "token_uri": endpoint.uri,
+                        "client_id": "client_id",
+                        "client_secret": "client_secret",
+                    },
+                    stream,
+                )
+            # Keep the token cache out of the user's configuration directory.
+            env = dict(os.environ, HOME=temp_dir)
+            tokens_dir = os.path.join(temp_dir, ".config", "pydata", "tokens")
+            command = [sys.executable, "-m", "pydata_google_auth", "print-token", path]
+
+            print("{:<12} {:>11} {:>11}".format("case", "median", "best"))
+            _measure("interpreter", args.runs, [sys.executable, "-c", "pass"], env)
+            _measure(
+                "cache miss",
+                args.runs,
+                command,
+                env,
+                before=lambda: shutil.rmtree(tokens_dir, ignore_errors=True),
+            )
+            _run(command, env)
+            requests = endpoint.request_count
+            _measure("cache hit", args.runs, command, env)
+            assert endpoint.request_count == requests, "cache hits made requests"
+        finally:
+            endpoint.stop()
+
+
+if __name__ == "__main__":
+    main()
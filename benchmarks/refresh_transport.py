@@ -0,0 +1,140 @@
+"""Benchmark repeated token refreshes with and without a shared transport.
+
+Run from the repository root:
+
+    python -m benchmarks.refresh_transport [--tls]
+
+Refreshes are made against a local stub token endpoint, so this measures
+connection setup and client overhead, not Google's token endpoint. Use
+``--tls`` to include the TLS handshake, as with the real endpoint.
+"""
+
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+import google.auth.transport.requests
+import google.oauth2.credentials
+import requests
+
+from pydata_google_auth import _transport
+from tests.unit.conftest import TokenEndpoint
+
+
+def _write_self_signed_certificate(path):
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+    import ipaddress
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .add_extension(
+            x509.SubjectAlternativeName(
+                [x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]
+            ),
+            critical=False,
+        )
+        .sign(key, hashes.SHA256())
+    )
+    with open(path, "wb") as stream:
+        stream.write(
+            key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.TraditionalOpenSSL,
+                serialization.NoEncryption(),
+            )
+        )
+        stream.write(certificate.public_bytes(serialization.Encoding.PEM))
+
+
+def _refresh(token_uri, request):
+    credentials = google.oauth2.credentials.Credentials(
+        token=None,
+        refresh_token="refresh_token",
+        token_uri=token_uri,
+        client_id="client_id",
+        client_secret="client_secret",
+    )
+    start = time.perf_counter()
+    credentials.refresh(request)
+    return time.perf_counter() - start
+
+
+def _report(name, timings, connections):
+    first = timings[0]
+    rest = sorted(timings[1:])
+    print(
+        "{:<20} first={:.2f}ms nth median={:.2f}ms p99={:.2f}ms "
+        "connections={}".format(
+            name,
+            first * 1000,
+            rest[len(rest) // 2] * 1000,
+            rest[int(len(rest) * 0.99) - 1] * 1000,
+            connections,
+        )
+    )
+
+
+def _trust_certificate(session, certfile):
+    if certfile:
+        # Otherwise REQUESTS_CA_BUNDLE takes precedence over session.verify.
+        session.trust_env = False
+        session.verify = certfile
+
+
+def _new_request(certfile):
+    # What each refresh did before: a new session, and so a new connection.
+    session = requests.Session()
+    _trust_certificate(session, certfile)
+    return google.auth.transport.requests.Request(session=session)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--refreshes", type=int, default=500)
+    parser.add_argument("--tls", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        certfile = None
+        if args.tls:
+            certfile = os.path.join(temp_dir, "cert.pem")
+            _write_self_signed_certificate(certfile)
+
+        endpoint = TokenEndpoint(certfile=certfile)
+        endpoint.start()
+        try:
+            timings = [
+                _refresh(endpoint.uri, _new_request(certfile))
+                for _ in range(args.refreshes)
+            ]
+            _report("new Request()", timings, endpoint.connection_count)
+
+            connections = endpoint.connection_count
+            _transport.set_transport()
+            request = _transport.get_request()
+            _trust_certificate(request.session, certfile)
+            timings = [_refresh(endpoint.uri, request) for _ in range(args.refreshes)]
+            _report(
+                "shared transport", timings, endpoint.connection_count - connections
+            )
+        finally:
+            endpoint.stop()
+
+
+if __name__ == "__main__":
+    main()
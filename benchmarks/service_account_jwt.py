@@ -0,0 +1,120 @@
+"""Benchmark time to first token for service account credentials.
+
+Run from the repository root:
+
+    python -m benchmarks.service_account_jwt [--tls] [--delay SECONDS]
+
+Compares loading a service account key and getting an access token from a
+local stub token endpoint with signing a self-signed JWT locally
+(``use_jwt_access=True``). The stub answers immediately, so this is a lower
+bound for the token endpoint path. Use ``--delay`` to add the latency of the
+real endpoint and ``--tls`` to include the TLS handshake.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+import pydata_google_auth
+from pydata_google_auth import _transport
+from benchmarks.refresh_transport import _trust_certificate
+from benchmarks.refresh_transport import _write_self_signed_certificate
+from tests.unit.conftest import TokenEndpoint
+
+SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+
+
+def _write_key(path, token_uri):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    with open(path, "w") as stream:
+        json.dump(
+            {
+                "type": "service_account",
+                "client_email": "benchmark@my-project.iam.gserviceaccount.com",
+                "private_key": private_key.private_bytes(
+                    serialization.Encoding.PEM,
+                    serialization.PrivateFormat.PKCS8,
+                    serialization.NoEncryption(),
+                ).decode("utf-8"),
+                "token_uri": token_uri,
+            },
+            stream,
+        )
+
+
+def _first_token(path, use_jwt_access):
+    start = time.perf_counter()
+    credentials = pydata_google_auth.load_service_account_credentials(
+        path, scopes=SCOPES, use_jwt_access=use_jwt_access
+    )
+    assert credentials.token
+    return time.perf_counter() - start, credentials
+
+
+def _authorize(credentials, requests):
+    request = _transport.get_request()
+    start = time.perf_counter()
+    for _ in range(requests):
+        credentials.before_request(request, "GET", "https://example.com", {})
+    return (time.perf_counter() - start) / requests
+
+
+def _report(name, timings, per_request):
+    timings = sorted(timings)
+    print(
+        "{:<16} first token median={:.2f}ms p99={:.2f}ms "
+        "before_request={:.1f}us".format(
+            name,
+            timings[len(timings) // 2] * 1000,
+            timings[int(len(timings) * 0.99) - 1] * 1000,
+            per_request * 1e6,
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--loads", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--tls", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        certfile = None
+        if args.tls:
+            certfile = os.path.join(temp_dir, "cert.pem")
+            _write_self_signed_certificate(certfile)
+
+        endpoint = TokenEndpoint(delay=args.delay, certfile=certfile)
+        endpoint.start()
+        try:
+            _trust_certificate(_transport.get_request().session, certfile)
+            path = os.path.join(temp_dir, "service-account.json")
+            _write_key(path, endpoint.uri)
+
+            for name, use_jwt_access in (
+                ("token endpoint", False),
+                ("self-signed JWT", True),
+            ):
+                requests = endpoint.request_count
+                results = [
+                    _first_token(path, use_jwt_access) for _ in range(args.loads)
+                ]
+                per_request = _authorize(results[-1][1], 10000)
+                _report(name, [elapsed for elapsed, _ in results], per_request)
+                print(
+                    "{:<16} token endpoint requests={}".format(
+                        "", endpoint.request_count - requests
+                    )
+                )
+        finally:
+            endpoint.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -25,7 +25,14 @@ import nox
 
 
 BLACK_VERSION = "black==22.12.0"
-BLACK_PATHS = ["docs", "pydata_google_auth", "tests", "noxfile.py", "setup.py"]
+BLACK_PATHS = [
+    "benchmarks",
+    "docs",
+    "pydata_google_auth",
+    "tests",
+    "noxfile.py",
+    "setup.py",
+]
 
 SPHINX_VERSION = "sphinx==4.5.0"
 
@@ -1,13 +1,4 @@
-from .auth import default
-from .auth import get_user_credentials
-from .auth import load_user_credentials
-from .auth import save_user_credentials
-from .auth import load_service_account_credentials
-from ._version import get_versions
-
-versions = get_versions()
-__version__ = versions.get("closest-tag", versions["version"])
-__git_revision__ = versions["full-revisionid"]
+import importlib
 
 """pydata-google-auth
 
@@ -17,9 +8,74 @@ This package provides helpers for fetching Google API credentials.
 __all__ = [
     "__version__",
     "__git_revision__",
+    "clear_credentials_memo",
     "default",
+    "get_refresh_stats",
     "get_user_credentials",
     "load_user_credentials",
     "save_user_credentials",
     "load_service_account_credentials",
+    "load_credentials_files",
+    "set_circuit_breaker",
+    "set_refresh_retry",
+    "set_transport",
+    "start_background_refresh",
 ]
+
+# The modules defining the public functions. They are imported when a
+# function is first accessed, so that ``python -m pydata_google_auth
+# print-token`` can answer from its token cache without importing
+# google-auth.
+_ATTRIBUTE_MODULES = {
+    "clear_credentials_memo": ".auth",
+    "default": ".auth",
+    "get_user_credentials": ".auth",
+    "load_user_credentials": ".auth",
+    "save_user_credentials": ".auth",
+    "load_service_account_credentials": ".auth",
+    "load_credentials_files": ".auth",
+    "get_refresh_stats": "._breaker",
+    "set_circuit_breaker": "._breaker",
+    "start_background_refresh": "._refresher",
+    "set_refresh_retry": "._retry",
+    "set_transport": "._transport",
+}
+# Public submodules, which importing the package used to import too.
+_SUBMODULES = ("aio", "auth", "cache", "exceptions")
+
+_VERSION_ATTRIBUTES = ("versions", "__version__", "__git_revision__")
+
+
+def _get_versions():
+    # In a source checkout, including an editable install, versioneer asks
+    # ``git``, so this is only done when a version attribute is first
+    # accessed.
+    from ._version import get_versions
+
+    return get_versions()
+
+
+def __getattr__(name):
+    module_name = _ATTRIBUTE_MODULES.get(name)
+    if module_name is not None:
+        value = getattr(importlib.import_module(module_name, __name__), name)
+        globals()[name] = value
+        return value
+
+    if name in _SUBMODULES:
+        return importlib.import_module("." + name, __name__)
+
+    if name not in _VERSION_ATTRIBUTES:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+    versions = _get_versions()
+    globals().update(
+        versions=versions,
+        __version__=versions.get("closest-tag", versions["version"]),
+        __git_revision__=versions["full-revisionid"],
+    )
+    return globals()[name]
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(_SUBMODULES))
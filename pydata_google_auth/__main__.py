@@ -1,9 +1,13 @@
-"""Private module that implements a pydata-google-auth CLI tool."""
+"""Private module that implements a pydata-google-auth CLI tool.
 
-import argparse
+Commands import what they need when they run, so that ``print-token`` can
+print a cached access token without importing google-auth or argparse.
+"""
+
+import os
 import sys
 
-from . import auth
+from . import _token_cache
 
 
 LOGIN_HELP = (
@@ -45,10 +49,84 @@ PRINT_TOKEN_DESCRIPTION = r"""examples:
     curl -X GET \
         -H "Authorization: Bearer $(python -m pydata_google_auth print-token credentials.json)" \
         "https://storage.googleapis.com/storage/v1/b/your-bucket/o/path%%2Fto%%2Fobject.txt?alt=media"
+
+Access tokens are cached, so repeated calls return without a request to
+Google until the token is about to expire.
+"""
+PRINT_TOKEN_MIN_TTL_HELP = (
+    "Seconds the printed token must remain valid for. A cached token that "
+    "expires sooner is refreshed. Default: {}"
+).format(_token_cache.DEFAULT_MIN_TTL)
+
+SERVE_HELP = (
+    "Hold credentials, refresh them ahead of expiry, and serve access tokens "
+    "to local processes over a Unix domain socket."
+)
+SERVE_DESCRIPTION = r"""Processes get tokens from the broker with
+pydata_google_auth.cache.BrokerCredentialsCache.
+
+examples:
+
+  Serve tokens for a credentials file saved with the login command.
+
+    python -m pydata_google_auth serve credentials.json
+"""
+SERVE_CREDENTIALS_PATH_HELP = (
+    "Path of a user credentials JSON file. If not set, use Application "
+    "Default Credentials."
+)
+SERVE_SOCKET_HELP = (
+    "Path of the Unix domain socket to listen on. Default: broker.sock in "
+    "the pydata configuration directory."
+)
+
+CHECK_HELP = (
+    "Load many credentials JSON files concurrently and report whether each "
+    "can get an access token."
+)
+CHECK_DESCRIPTION = r"""Loads user credentials files and service account
+key files, refreshing their access tokens at the same time on a pool of
+threads. Prints a line for each file, and exits with status 1 if any file
+couldn't be loaded.
+
+examples:
+
+  Check every JSON file in a directory of service account keys.
+
+    python -m pydata_google_auth check ~/keys/ --max-workers 32
+"""
+CHECK_PATHS_HELP = (
+    "Paths of credentials JSON files, or of directories to check all JSON files in."
+)
+CHECK_SCOPES_HELP = (
+    "Comma-separated list of scopes to request for service accounts. User "
+    "credentials keep the scopes they were granted. Default: {}"
+).format(LOGIN_SCOPES_DEFAULT)
+CHECK_MAX_WORKERS_HELP_TEMPLATE = (
+    "Number of files to load at the same time. Default: {}"
+)
+
+METADATA_SERVER_HELP = (
+    "Serve access tokens for a credentials JSON file on localhost with the "
+    "Compute Engine metadata server protocol."
+)
+METADATA_SERVER_DESCRIPTION = r"""Clients that get credentials from the
+metadata server, such as google.auth.default() and the Cloud SDK, use the
+server when the GCE_METADATA_HOST and GCE_METADATA_IP environment variables
+are set to its address.
+
+examples:
+
+  Serve tokens for a credentials file saved with the login command.
+
+    python -m pydata_google_auth metadata-server credentials.json --project my-project
+    GCE_METADATA_HOST=127.0.0.1:8990 GCE_METADATA_IP=127.0.0.1:8990 your-tool
 """
 
 
 def login(args):
+    from . import auth
+
     scopes = args.scopes.split(",")
     auth.save_user_credentials(
         scopes,
@@ -59,50 +137,276 @@ def login(args):
     )
 
 
+def _parse_print_token_args(argv):
+    """
+    Parse ``print-token PATH [--min-ttl SECONDS]`` without argparse.
+
+    Returns a ``(credentials_path, min_ttl)`` pair, or ``None`` for any other
+    arguments, which are left to argparse, including to report errors.
+    """
+    if not argv or argv[0] != "print-token":
+        return None
+
+    credentials_path = None
+    min_ttl = _token_cache.DEFAULT_MIN_TTL
+    args = iter(argv[1:])
+    for arg in args:
+        if arg == "--min-ttl":
+            value = next(args, None)
+        elif arg.startswith("--min-ttl="):
+            value = arg[len("--min-ttl=") :]
+        elif arg.startswith("-") or credentials_path is not None:
+            return None
+        else:
+            credentials_path = arg
+            continue
+
+        try:
+            min_ttl = float(value)
+        except (TypeError, ValueError):
+            return None
+
+    if credentials_path is None:
+        return None
+    return credentials_path, min_ttl
+
+
 def print_token(args):
-    credentials = auth.load_user_credentials(args.credentials_path)
+    import google.auth._helpers
+
+    from . import auth
+    from . import cache
+    from . import exceptions
+
+    # Check the file before reading it, so that a token cached from an
+    # older version of the file is never used.
+    identity = _token_cache.get_source_identity(args.credentials_path)
+    # Load lazily, so that the credentials are refreshed at most once, and
+    # only if their token isn't valid for long enough.
+    credentials = auth.load_user_credentials(args.credentials_path, lazy=True)
+
+    expiry = credentials.expiry
+    if (
+        not credentials.valid
+        or (expiry - google.auth._helpers.utcnow()).total_seconds() < args.min_ttl
+    ):
+        if cache._refresh_user_credentials(credentials) is None:
+            raise exceptions.PyDataCredentialsError("Could not load credentials.")
+
+    _token_cache.save_token(args.credentials_path, identity, credentials)
     print(credentials.token)
 
 
-parser = argparse.ArgumentParser(
-    prog="python -m pydata_google_auth",
-    description="Manage credentials for Google APIs.",
-)
-subparsers = parser.add_subparsers(title="commands", dest="command")
+def serve(args):
+    from . import auth
+    from . import _broker
 
-login_parser = subparsers.add_parser("login", help=LOGIN_HELP)
-login_parser.add_argument(
-    "destination", help="Path of where to save user credentials JSON file."
-)
-login_parser.add_argument(
-    "--scopes", help=LOGIN_SCOPES_HELP, default=LOGIN_SCOPES_DEFAULT
-)
-login_parser.add_argument("--client_id", help=LOGIN_CLIENT_ID_HELP)
-login_parser.add_argument("--client_secret", help=LOGIN_CLIENT_SECRET_HELP)
-login_parser.add_argument(
-    "--use_local_webserver",
-    action="store_true",
-    help="Ignored. Defaults to true. To disable, set --nouse_local_webserver option.",
-)
-login_parser.add_argument(
-    "--nouse_local_webserver", action="store_true", help=LOGIN_USE_LOCAL_WEBSERVER_HELP
-)
+    if args.credentials_path:
+        credentials = auth.load_user_credentials(args.credentials_path)
+    else:
+        credentials, _ = auth.default(args.scopes.split(","))
+
+    socket_path = args.socket or _broker.get_default_socket_path()
+    broker = _broker.TokenBroker(credentials, socket_path)
+    print("Serving access tokens on {}".format(socket_path), file=sys.stderr)
+    try:
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broker.server_close()
+
+
+def _expand_paths(paths):
+    import glob
+
+    for path in paths:
+        if os.path.isdir(path):
+            for child in sorted(glob.glob(os.path.join(path, "*.json"))):
+                yield child
+        else:
+            yield path
+
+
+def check(args):
+    from . import auth
+
+    loaded, errors = auth.load_credentials_files(
+        _expand_paths(args.paths),
+        scopes=args.scopes.split(","),
+        max_workers=args.max_workers,
+    )
+    for path, credentials in loaded.items():
+        print("OK     {} (expires {})".format(path, credentials.expiry))
+    for path, error in errors.items():
+        print("ERROR  {}: {}".format(path, error))
+    print(
+        "{} loaded, {} failed".format(len(loaded), len(errors)),
+        file=sys.stderr,
+    )
+    if errors:
+        sys.exit(1)
+
+
+def metadata_server(args):
+    import asyncio
+
+    from . import auth
+    from . import _metadata_server
+
+    credentials = auth.load_user_credentials(args.credentials_path)
+    server = _metadata_server.MetadataServer(
+        credentials, host=args.host, port=args.port, project_id=args.project
+    )
+
+    async def serve():
+        await server.start()
+        address = "{}:{}".format(server.host, server.port)
+        print(
+            "Serving metadata on {address}. Point clients at it with:\n\n"
+            "    export GCE_METADATA_HOST={address}\n"
+            "    export GCE_METADATA_IP={address}\n".format(address=address),
+            file=sys.stderr,
+        )
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def _make_parser():
+    import argparse
+
+    from . import _transport
+
+    parser = argparse.ArgumentParser(
+        prog="python -m pydata_google_auth",
+        description="Manage credentials for Google APIs.",
+    )
+    subparsers = parser.add_subparsers(title="commands", dest="command")
+
+    login_parser = subparsers.add_parser("login", help=LOGIN_HELP)
+    login_parser.add_argument(
+        "destination", help="Path of where to save user credentials JSON file."
+    )
+    login_parser.add_argument(
+        "--scopes", help=LOGIN_SCOPES_HELP, default=LOGIN_SCOPES_DEFAULT
+    )
+    login_parser.add_argument("--client_id", help=LOGIN_CLIENT_ID_HELP)
+    login_parser.add_argument("--client_secret", help=LOGIN_CLIENT_SECRET_HELP)
+    login_parser.add_argument(
+        "--use_local_webserver",
+        action="store_true",
+        help="Ignored. Defaults to true. To disable, set --nouse_local_webserver option.",
+    )
+    login_parser.add_argument(
+        "--nouse_local_webserver",
+        action="store_true",
+        help=LOGIN_USE_LOCAL_WEBSERVER_HELP,
+    )
+
+    print_token_parser = subparsers.add_parser(
+        "print-token",
+        help=PRINT_TOKEN_HELP,
+        description=PRINT_TOKEN_DESCRIPTION,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    print_token_parser.add_argument(
+        "credentials_path", help="Path of credentials JSON file."
+    )
+    print_token_parser.add_argument(
+        "--min-ttl",
+        type=float,
+        default=_token_cache.DEFAULT_MIN_TTL,
+        help=PRINT_TOKEN_MIN_TTL_HELP,
+    )
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help=SERVE_HELP,
+        description=SERVE_DESCRIPTION,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    serve_parser.add_argument(
+        "credentials_path", nargs="?", help=SERVE_CREDENTIALS_PATH_HELP
+    )
+    serve_parser.add_argument(
+        "--scopes", help=LOGIN_SCOPES_HELP, default=LOGIN_SCOPES_DEFAULT
+    )
+    serve_parser.add_argument("--socket", help=SERVE_SOCKET_HELP)
+
+    check_parser = subparsers.add_parser(
+        "check",
+        help=CHECK_HELP,
+        description=CHECK_DESCRIPTION,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    check_parser.add_argument("paths", nargs="+", help=CHECK_PATHS_HELP)
+    check_parser.add_argument(
+        "--scopes", help=CHECK_SCOPES_HELP, default=LOGIN_SCOPES_DEFAULT
+    )
+    check_parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=_transport.DEFAULT_POOL_SIZE,
+        help=CHECK_MAX_WORKERS_HELP_TEMPLATE.format(_transport.DEFAULT_POOL_SIZE),
+    )
+
+    metadata_server_parser = subparsers.add_parser(
+        "metadata-server",
+        help=METADATA_SERVER_HELP,
+        description=METADATA_SERVER_DESCRIPTION,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    metadata_server_parser.add_argument(
+        "credentials_path", help="Path of credentials JSON file."
+    )
+    metadata_server_parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Address to listen on. Default: 127.0.0.1",
+    )
+    metadata_server_parser.add_argument(
+        "--port", type=int, default=8990, help="Port to listen on. Default: 8990"
+    )
+    metadata_server_parser.add_argument(
+        "--project",
+        help="Project ID to serve. Default: the credentials' quota project.",
+    )
+    return parser
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    # Shell scripts call print-token for every request, so answer from the
+    # token cache before building the parser.
+    print_token_args = _parse_print_token_args(argv)
+    if print_token_args is not None:
+        token = _token_cache.load_token(*print_token_args)
+        if token is not None:
+            print(token)
+            return
+
+    parser = _make_parser()
+    args = parser.parse_args(argv)
+    if args.command == "login":
+        login(args)
+    elif args.command == "print-token":
+        print_token(args)
+    elif args.command == "serve":
+        serve(args)
+    elif args.command == "check":
+        check(args)
+    elif args.command == "metadata-server":
+        metadata_server(args)
+    else:
+        print('Got unknown command "{}".'.format(args.command), file=sys.stderr)
+        parser.print_help()
 
-print_token_parser = subparsers.add_parser(
-    "print-token",
-    help=PRINT_TOKEN_HELP,
-    description=PRINT_TOKEN_DESCRIPTION,
-    formatter_class=argparse.RawDescriptionHelpFormatter,
-)
-print_token_parser.add_argument(
-    "credentials_path", help="Path of credentials JSON file."
-)
 
-args = parser.parse_args()
-if args.command == "login":
-    login(args)
-elif args.command == "print-token":
-    print_token(args)
-else:
-    print('Got unknown command "{}".'.format(args.command), file=sys.stderr)
-    parser.print_help()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""Fast discovery of Application Default Credentials.
+
+:func:`google.auth.default` probes the GCE metadata server when no other
+credentials are found. Off GCE, the probe takes several seconds of timeouts
+and retries. This module caps the probe and remembers the outcome on disk, so
+that later processes in the same environment skip discovery when there are
+no Application Default Credentials to find.
+"""
+
+import errno
+import hashlib
+import json
+import logging
+import os
+import socket
+import time
+import urllib.parse
+
+import google.auth
+import google.auth._cloud_sdk
+import google.auth.environment_vars
+import google.auth.exceptions
+import google.auth.transport
+
+from pydata_google_auth import cache
+from pydata_google_auth import _transport
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for the GCE metadata server before assuming we aren't on GCE.
+DEFAULT_PROBE_TIMEOUT = 0.5
+
+SOURCE_ENV = "env"
+SOURCE_GCLOUD = "gcloud"
+SOURCE_GCE = "gce"
+SOURCE_OTHER = "other"
+SOURCE_NONE = "none"
+
+_RECORD_FILENAME = "adc_source.json"
+# Recorded sources are rediscovered after this many seconds, in case the
+# environment changed in a way the fingerprint doesn't capture.
+_RECORD_TTL = 24 * 60 * 60
+# Finding no credentials is rediscovered sooner, in case credentials appear
+# in a way the fingerprint doesn't capture.
+_NONE_RECORD_TTL = 10 * 60
+_MAX_RECORDS = 16
+_DEFAULT_METADATA_IP = "169.254.169.254"
+
+
+def _get_record_path():
+    return cache._get_default_credentials_path(cache._DIRNAME, _RECORD_FILENAME)
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _environment_fingerprint():
+    """
+    Hash the parts of the environment that decide which credentials
+    :func:`google.auth.default` finds.
+    """
+    environment_vars = google.auth.environment_vars
+    explicit_path = os.environ.get(environment_vars.CREDENTIALS)
+    gcloud_path = google.auth._cloud_sdk.get_application_default_credentials_path()
+    fingerprint = {
+        "hostname": socket.gethostname(),
+        "explicit": [explicit_path, _file_signature(explicit_path)],
+        "gcloud": [gcloud_path, _file_signature(gcloud_path)],
+        "environ": [
+            os.environ.get(name)
+            for name in (
+                environment_vars.CLOUD_SDK_CONFIG_DIR,
+                environment_vars.GCE_METADATA_HOST,
+                environment_vars.GCE_METADATA_IP,
+                environment_vars.NO_GCE_CHECK,
+                "GAE_APPLICATION",
+                "GAE_ENV",
+            )
+        ],
+    }
+    serialized = json.dumps(fingerprint, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(serialized).hexdigest()
+
+
+def _read_records():
+    try:
+        with open(_get_record_path()) as records_file:
+            records = json.load(records_file)
+    except (IOError, ValueError):
+        return {}
+    return records if isinstance(records, dict) else {}
+
+
+def load_source(fingerprint):
+    """Get the recorded credentials source for ``fingerprint``, if fresh."""
+    record = _read_records().get(fingerprint)
+    if not isinstance(record, dict):
+        return None
+    source = record.get("source")
+    ttl = _NONE_RECORD_TTL if source == SOURCE_NONE else _RECORD_TTL
+    if time.time() - record.get("time", 0) > ttl:
+        return None
+    return source
+
+
+def save_source(fingerprint, source):
+    """Record the credentials source discovered for ``fingerprint``."""
+    records = _read_records()
+    records[fingerprint] = {"source": source, "time": time.time()}
+    # Keep only the most recent environments.
+    newest = sorted(records.items(), key=lambda item: item[1].get("time", 0))
+    records = dict(newest[-_MAX_RECORDS:])
+
+    if not cache._write_json_file(records, _get_record_path()):
+        logger.debug("Unable to record credentials source.")
+
+
+class _NotOnGCEResponse(google.auth.transport.Response):
+    """Metadata server ping response that tells google-auth we're off GCE."""
+
+    status = 404
+    headers = {}
+    data = b""
+
+
+# Errors that mean there is no metadata server, as opposed to a slow one.
+_NO_METADATA_SERVER_ERRNOS = frozenset(
+    (errno.ECONNREFUSED, errno.EHOSTUNREACH, errno.ENETUNREACH)
+)
+
+
+def _is_definitely_unreachable(exc):
+    """
+    Whether a failed ping says there's no metadata server, such as a refused
+    connection. A timeout doesn't: the metadata server can be slow to answer
+    while a VM or pod starts.
+    """
+    seen = set()
+    pending = [exc]
+    while pending:
+        error = pending.pop()
+        if error is None or id(error) in seen:
+            continue
+        seen.add(id(error))
+        if isinstance(error, OSError) and error.errno in _NO_METADATA_SERVER_ERRNOS:
+            return True
+        # requests and urllib3 wrap the socket error in their own errors.
+        pending.extend((error.__cause__, error.__context__))
+        pending.extend(arg for arg in error.args if isinstance(arg, BaseException))
+        reason = getattr(error, "reason", None)
+        if isinstance(reason, BaseException):
+            pending.append(reason)
+    return False
+
+
+class _ProbeRequest(object):
+    """
+    Wrap a transport, capping the time spent probing the metadata server.
+
+    google-auth pings the metadata server several times, with backoff. The
+    first ping waits at most ``probe_timeout`` seconds. If it fails, later
+    pings are answered immediately without touching the network.
+
+    ``inconclusive`` is set if a ping failed without showing that there is
+    no metadata server, such as a timeout.
+    """
+
+    def __init__(self, request, probe_timeout):
+        self._request = request
+        self._probe_timeout = probe_timeout
+        self.metadata_server_unreachable = False
+        self.inconclusive = False
+
+    def _is_ping(self, url):
+        parsed = urllib.parse.urlparse(url)
+        metadata_ip = os.environ.get(
+            google.auth.environment_vars.GCE_METADATA_IP, _DEFAULT_METADATA_IP
+        )
+        return parsed.netloc == metadata_ip and parsed.path in ("", "/")
+
+    def __call__(self, url, method="GET", body=None, headers=None, **kwargs):
+        if not self._is_ping(url):
+            return self._request(
+                url, method=method, body=body, headers=headers, **kwargs
+            )
+
+        if self.metadata_server_unreachable:
+            return _NotOnGCEResponse()
+
+        timeout = kwargs.get("timeout")
+        if timeout is None or timeout > self._probe_timeout:
+            kwargs["timeout"] = self._probe_timeout
+        try:
+            return self._request(
+                url, method=method, body=body, headers=headers, **kwargs
+            )
+        except google.auth.exceptions.TransportError as exc:
+            self.metadata_server_unreachable = True
+            if not _is_definitely_unreachable(exc):
+                logger.debug(
+                    "Metadata server didn't answer within {} seconds: {}".format(
+                        self._probe_timeout, exc
+                    )
+                )
+                self.inconclusive = True
+            return _NotOnGCEResponse()
+
+
+def _classify(credentials):
+    environment_vars = google.auth.environment_vars
+    if os.environ.get(environment_vars.CREDENTIALS):
+        return SOURCE_ENV
+    if type(credentials).__module__.startswith("google.auth.compute_engine"):
+        return SOURCE_GCE
+    if os.path.exists(
+        google.auth._cloud_sdk.get_application_default_credentials_path()
+    ):
+        return SOURCE_GCLOUD
+    return SOURCE_OTHER
+
+
+def find_default_credentials(
+    scopes, probe_timeout=DEFAULT_PROBE_TIMEOUT, record_source=True
+):
+    """
+    Find Application Default Credentials, using the recorded source if known.
+
+    Finding no credentials is only recorded if the metadata server ping,
+    if any, definitely failed. A ping that timed out is tried again by the
+    next lookup. Set ``record_source`` to ``False`` to neither read nor
+    write the record.
+
+    Returns
+    -------
+    credentials, project_id : tuple
+        As returned by :func:`google.auth.default`.
+
+    Raises
+    ------
+    google.auth.exceptions.DefaultCredentialsError
+        If there are no Application Default Credentials.
+    """
+    if record_source:
+        fingerprint = _environment_fingerprint()
+        source = load_source(fingerprint)
+    else:
+        fingerprint = source = None
+
+    if source == SOURCE_NONE:
+        raise google.auth.exceptions.DefaultCredentialsError(
+            "No Application Default Credentials were found in this environment "
+            "on a previous attempt."
+        )
+
+    request = _transport.get_request()
+    probe_request = None
+    if source != SOURCE_GCE:
+        request = probe_request = _ProbeRequest(request, probe_timeout)
+
+    try:
+        credentials, project = google.auth.default(scopes=scopes, request=request)
+    except google.auth.exceptions.DefaultCredentialsError:
+        inconclusive = probe_request is not None and probe_request.inconclusive
+        if record_source and not inconclusive:
+            save_source(fingerprint, SOURCE_NONE)
+        raise
+
+    if record_source and credentials is not None and source is None:
+        save_source(fingerprint, _classify(credentials))
+    return credentials, project
@@ -0,0 +1,347 @@
+"""Circuit breakers that stop refreshes against a failing token endpoint.
+
+Each token endpoint has a breaker. It opens after ``failure_threshold``
+refreshes in a row fail with
+:class:`~pydata_google_auth.exceptions.PyDataConnectionError`, which are
+raised only once retries are exhausted. While it is open, refreshes fail at
+once instead of adding load to the endpoint or proxy. After
+``reset_timeout`` seconds it is half-open: one refresh is let through as a
+trial, and its outcome closes or reopens the breaker.
+
+Independently, each credentials' last connection failure is remembered for
+``negative_ttl`` seconds, so that callers retrying the same credentials in
+a loop fail fast before the breaker has seen enough failures to open.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from pydata_google_auth import exceptions
+
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# Failed refreshes in a row before the breaker opens. Each has already been
+# retried, see pydata_google_auth.set_refresh_retry.
+DEFAULT_FAILURE_THRESHOLD = 3
+# Seconds the breaker stays open before it lets a trial refresh through.
+DEFAULT_RESET_TIMEOUT = 30.0
+# Seconds a credentials' connection failure is reused for new refreshes.
+DEFAULT_NEGATIVE_TTL = 5.0
+
+_BREAKER_DIRNAME = "breakers"
+
+
+class _Settings(object):
+    def __init__(
+        self,
+        failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout=DEFAULT_RESET_TIMEOUT,
+        negative_ttl=DEFAULT_NEGATIVE_TTL,
+        shared=False,
+    ):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1.")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.negative_ttl = negative_ttl
+        self.shared = shared
+
+
+_settings = _Settings()
+_lock = threading.Lock()
+_breakers = {}
+
+
+def _get_shared_path(endpoint):
+    # Imported here because cache imports this module through _retry.
+    from pydata_google_auth import cache
+
+    filename = hashlib.sha256(endpoint.encode("utf-8")).hexdigest()[:16] + ".json"
+    directory = cache._get_default_credentials_path(cache._DIRNAME, _BREAKER_DIRNAME)
+    return os.path.join(directory, filename)
+
+
+def _get_endpoint(credentials):
+    token_uri = getattr(credentials, "token_uri", None) or getattr(
+        credentials, "_token_uri", None
+    )
+    return token_uri or type(credentials).__name__
+
+
+def get_identity(credentials):
+    """A key for the credentials, for the negative cache."""
+    identity = getattr(credentials, "refresh_token", None) or getattr(
+        credentials, "service_account_email", None
+    )
+    if identity is None:
+        return None
+    # Don't keep refresh tokens around as dictionary keys.
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+class CircuitBreaker(object):
+    """Breaker and negative cache for refreshes against one token endpoint."""
+
+    def __init__(self, endpoint, settings):
+        self.endpoint = endpoint
+        self._settings = settings
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_until = None
+        self._trial_in_flight = False
+        self._last_error = None
+        self._negative = {}
+        self._successes = 0
+        self._failures = 0
+        self._rejections = 0
+
+    def before_refresh(self, identity=None):
+        """
+        Raise :class:`~pydata_google_auth.exceptions.PyDataConnectionError`
+        if a refresh shouldn't be sent now.
+        """
+        now = time.time()
+        with self._lock:
+            error = self._check(identity, now)
+            if error is not None:
+                self._rejections += 1
+        if error is not None:
+            raise exceptions.PyDataConnectionError(error)
+
+    def _check(self, identity, now):
+        negative = self._negative.get(identity)
+        if negative is not None:
+            expires_at, error = negative
+            if now < expires_at:
+                return "Refresh failed {:.1f} seconds ago: {}".format(
+                    now - (expires_at - self._settings.negative_ttl), error
+                )
+            del self._negative[identity]
+
+        if self._state == CLOSED and self._settings.shared:
+            self._load_shared(now)
+
+        if self._state == OPEN:
+            if now < self._opened_until:
+                return (
+                    "Token endpoint {} is failing, not refreshing for {:.1f} "
+                    "more seconds. Last error: {}".format(
+                        self.endpoint, self._opened_until - now, self._last_error
+                    )
+                )
+            self._state = HALF_OPEN
+
+        if self._state == HALF_OPEN:
+            if self._trial_in_flight:
+                return (
+                    "Token endpoint {} is failing, waiting on a trial refresh.".format(
+                        self.endpoint
+                    )
+                )
+            self._trial_in_flight = True
+        return None
+
+    def record_success(self):
+        """Close the breaker after a refresh that reached the endpoint."""
+        with self._lock:
+            was_open = self._state != CLOSED
+            self._state = CLOSED
+            self._consecutive_failures = 0
+            self._opened_until = None
+            self._trial_in_flight = False
+            self._successes += 1
+        if was_open:
+            logger.debug("Token endpoint {} recovered.".format(self.endpoint))
+            if self._settings.shared:
+                self._remove_shared()
+
+    def record_failure(self, error, identity=None):
+        """Count a refresh that failed with a connection error."""
+        now = time.time()
+        with self._lock:
+            self._failures += 1
+            self._consecutive_failures += 1
+            self._last_error = str(error)
+            self._trial_in_flight = False
+            if identity is not None and self._settings.negative_ttl > 0:
+                self._prune_negative(now)
+                self._negative[identity] = (
+                    now + self._settings.negative_ttl,
+                    self._last_error,
+                )
+
+            opens = (
+                self._state == HALF_OPEN
+                or self._consecutive_failures >= self._settings.failure_threshold
+            )
+            if opens:
+                self._state = OPEN
+                self._opened_until = now + self._settings.reset_timeout
+        if opens:
+            logger.warning(
+                "Token endpoint {} is failing. Not refreshing for {} "
+                "seconds: {}".format(self.endpoint, self._settings.reset_timeout, error)
+            )
+            if self._settings.shared:
+                self._save_shared()
+
+    def release(self):
+        """End a refresh that failed before reaching the endpoint."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def _prune_negative(self, now):
+        expired = [
+            key for key, (expires_at, _) in self._negative.items() if expires_at <= now
+        ]
+        for key in expired:
+            del self._negative[key]
+
+    def _load_shared(self, now):
+        """Open the breaker if another process opened it."""
+        try:
+            with open(_get_shared_path(self.endpoint)) as stream:
+                state = json.load(stream)
+        except (IOError, ValueError):
+            return
+        opened_until = state.get("opened_until") or 0
+        if now < opened_until:
+            self._state = OPEN
+            self._opened_until = opened_until
+            self._last_error = state.get("last_error")
+
+    def _save_shared(self):
+        # Imported here because cache imports this module through _retry.
+        from pydata_google_auth import cache
+
+        with self._lock:
+            state = {
+                "endpoint": self.endpoint,
+                "opened_until": self._opened_until,
+                "last_error": self._last_error,
+            }
+        cache._write_json_file(state, _get_shared_path(self.endpoint))
+
+    def _remove_shared(self):
+        try:
+            os.remove(_get_shared_path(self.endpoint))
+        except OSError:
+            pass
+
+    def stats(self):
+        """Get a snapshot of the breaker's state and counters."""
+        now = time.time()
+        with self._lock:
+            state = self._state
+            if state == OPEN and now >= self._opened_until:
+                state = HALF_OPEN
+            return {
+                "state": state,
+                "consecutive_failures": self._consecutive_failures,
+                "open_for": (
+                    max(self._opened_until - now, 0.0) if state == OPEN else 0.0
+                ),
+                "successes": self._successes,
+                "failures": self._failures,
+                "rejections": self._rejections,
+                "last_error": self._last_error,
+            }
+
+
+def get_breaker(credentials):
+    """Get the breaker for the token endpoint of ``credentials``."""
+    endpoint = _get_endpoint(credentials)
+    with _lock:
+        breaker = _breakers.get(endpoint)
+        if breaker is None:
+            breaker = _breakers[endpoint] = CircuitBreaker(endpoint, _settings)
+        return breaker
+
+
+def set_circuit_breaker(
+    failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+    reset_timeout=DEFAULT_RESET_TIMEOUT,
+    negative_ttl=DEFAULT_NEGATIVE_TTL,
+    shared=False,
+):
+    """
+    Set when pydata-google-auth stops refreshing against a failing token
+    endpoint.
+
+    A token endpoint's breaker opens after ``failure_threshold`` refreshes
+    in a row can't reach it. While the breaker is open, refreshes against
+    the endpoint raise
+    :class:`~pydata_google_auth.exceptions.PyDataConnectionError` without a
+    request. After ``reset_timeout`` seconds, one refresh is let through to
+    check whether the endpoint has recovered. Resets the state of all
+    breakers.
+
+    Parameters
+    ----------
+    failure_threshold : int, optional
+        Failed refreshes in a row, each after its retries, before the
+        breaker opens. Defaults to 3.
+    reset_timeout : float, optional
+        Seconds the breaker stays open. Defaults to 30 seconds.
+    negative_ttl : float, optional
+        Seconds after a refresh of some credentials fails during which new
+        refreshes of the same credentials fail at once, even while the
+        breaker is closed. Set to 0 to disable. Defaults to 5 seconds.
+    shared : bool, optional
+        Share open breakers with other processes of the same user, through
+        a file in the pydata configuration directory. Then one process
+        finding the endpoint down stops the others from trying it too.
+        Defaults to ``False``.
+    """
+    global _settings
+
+    settings = _Settings(
+        failure_threshold=failure_threshold,
+        reset_timeout=reset_timeout,
+        negative_ttl=negative_ttl,
+        shared=shared,
+    )
+    with _lock:
+        _settings = settings
+        _breakers.clear()
+
+
+def get_refresh_stats():
+    """
+    Get the state of the circuit breaker for each token endpoint.
+
+    Returns
+    -------
+    dict
+        Maps each token endpoint this process has refreshed against to a
+        dictionary with its breaker's ``state`` (``"closed"``, ``"open"`` or
+        ``"half-open"``), ``consecutive_failures``, seconds the breaker
+        stays ``open_for``, counts of refresh ``successes``, ``failures``
+        and fast-failed ``rejections``, and the ``last_error``.
+    """
+    with _lock:
+        breakers = list(_breakers.values())
+    return {breaker.endpoint: breaker.stats() for breaker in breakers}
+
+
+def _reset_after_fork():
+    global _lock
+
+    # A lock held by another thread at fork time would never be released.
+    _lock = threading.Lock()
+    for breaker in _breakers.values():
+        breaker._lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,232 @@
+"""Local token broker that serves access tokens over a Unix domain socket.
+
+One broker process holds the credentials and refreshes them ahead of expiry.
+Clients on the same machine ask it for the current access token instead of
+refreshing on their own.
+
+Requests and responses are single lines of JSON. A client sends
+``{"method": "token"}`` and receives ``{"access_token": ..., "expiry": ...}``
+or ``{"error": ...}``. Errors that may go away, such as the token endpoint
+being unreachable, also have ``"transient": true``.
+"""
+
+import errno
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+
+import google.auth.credentials
+import google.auth.exceptions
+
+from pydata_google_auth import cache
+from pydata_google_auth import exceptions
+from pydata_google_auth import _refresher
+from pydata_google_auth import _retry
+
+
+logger = logging.getLogger(__name__)
+
+_SOCKET_FILENAME = "broker.sock"
+
+# Seconds to wait for the broker to answer.
+DEFAULT_TIMEOUT = 5.0
+
+
+def get_default_socket_path():
+    """Path of the broker socket within the pydata configuration directory."""
+    return cache._get_default_credentials_path(cache._DIRNAME, _SOCKET_FILENAME)
+
+
+def _remove_stale_socket(socket_path):
+    """
+    Remove the socket file of a broker that is no longer running.
+
+    Raises :class:`OSError` if a broker is listening on ``socket_path``.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError as exc:
+            if exc.errno == errno.ENOENT:
+                return
+            if exc.errno != errno.ECONNREFUSED:
+                raise
+        else:
+            raise OSError(
+                errno.EADDRINUSE,
+                "A token broker is already listening on {}.".format(socket_path),
+            )
+    os.unlink(socket_path)
+
+
+class _BrokerHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if request.get("method") != "token":
+                    raise ValueError(
+                        "Unknown method {!r}.".format(request.get("method"))
+                    )
+                response = self.server.token_response()
+            except (ValueError, AttributeError) as exc:
+                response = {"error": "Bad request: {}".format(exc)}
+            except (
+                google.auth.exceptions.TransportError,
+                exceptions.PyDataConnectionError,
+            ) as exc:
+                response = {
+                    "error": "Refresh failed: {}".format(exc),
+                    "transient": True,
+                }
+            except (google.auth.exceptions.GoogleAuthError, IOError) as exc:
+                response = {"error": "Refresh failed: {}".format(exc)}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class TokenBroker(socketserver.ThreadingUnixStreamServer):
+    """
+    Serve access tokens for ``credentials`` on a Unix domain socket.
+
+    The socket is created readable and writable only by the current user.
+
+    Parameters
+    ----------
+    credentials : google.auth.credentials.Credentials
+        Credentials to serve. They are refreshed ahead of expiry in a
+        background thread, and on demand if a client asks for an expired
+        token.
+    socket_path : str
+        Path of the Unix domain socket to listen on. A stale socket file at
+        this path is replaced. Raises :class:`OSError` if another broker is
+        listening on it.
+    """
+
+    daemon_threads = True
+    # Many worker processes may connect at once.
+    request_queue_size = socket.SOMAXCONN
+
+    def __init__(self, credentials, socket_path):
+        self.credentials = credentials
+        self.socket_path = socket_path
+        self._refresh_lock = threading.Lock()
+        self._refresher = None
+
+        socket_dir = os.path.dirname(socket_path)
+        if socket_dir:
+            os.makedirs(socket_dir, exist_ok=True)
+        _remove_stale_socket(socket_path)
+
+        # Restrict the socket to the current user while it is created, so
+        # that no other user can connect before the permissions are set.
+        old_umask = os.umask(0o077)
+        try:
+            super(TokenBroker, self).__init__(socket_path, _BrokerHandler)
+        finally:
+            os.umask(old_umask)
+
+    def token_response(self):
+        credentials = self.credentials
+        if not credentials.valid:
+            with self._refresh_lock:
+                # Another client may have triggered the refresh already.
+                if not credentials.valid:
+                    _retry.refresh(credentials)
+        return {
+            "access_token": credentials.token,
+            "expiry": cache._format_expiry(credentials.expiry),
+        }
+
+    def serve_forever(self, poll_interval=0.5):
+        # Get a token before the refresher starts, so that the first clients
+        # and the refresher don't both refresh.
+        self.token_response()
+        self._refresher = _refresher.start_background_refresh(self.credentials)
+        try:
+            super(TokenBroker, self).serve_forever(poll_interval=poll_interval)
+        finally:
+            self._refresher.stop()
+
+    def server_close(self):
+        super(TokenBroker, self).server_close()
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+
+def request_token(socket_path, timeout=DEFAULT_TIMEOUT):
+    """
+    Ask the broker listening on ``socket_path`` for an access token.
+
+    Returns
+    -------
+    Tuple[str, Optional[datetime.datetime]]
+        The access token and its expiry.
+
+    Raises
+    ------
+    google.auth.exceptions.TransportError
+        If the broker can't be reached, or it can't reach the token endpoint.
+    google.auth.exceptions.RefreshError
+        If the broker's credentials can't be refreshed, such as when the
+        refresh token was revoked.
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            sock.sendall(b'{"method": "token"}\n')
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+    except (OSError, socket.timeout) as exc:
+        raise google.auth.exceptions.TransportError(
+            "Could not reach the token broker at {}: {}".format(socket_path, exc)
+        )
+
+    try:
+        response = json.loads(line)
+    except ValueError:
+        # Such as an empty line from a broker that crashed.
+        raise google.auth.exceptions.TransportError(
+            "Invalid response from the token broker at {}.".format(socket_path)
+        )
+    if "error" in response:
+        if response.get("transient"):
+            raise google.auth.exceptions.TransportError(response["error"])
+        raise google.auth.exceptions.RefreshError(response["error"])
+    return response["access_token"], cache._parse_expiry(response.get("expiry"))
+
+
+class BrokerCredentials(google.auth.credentials.Credentials):
+    """
+    Credentials whose access token comes from a local token broker.
+
+    Start a broker with ``python -m pydata_google_auth serve``.
+
+    Parameters
+    ----------
+    socket_path : str, optional
+        Path of the broker's Unix domain socket. Defaults to ``broker.sock``
+        in the pydata configuration directory.
+    timeout : float, optional
+        Seconds to wait for the broker to answer.
+    """
+
+    def __init__(self, socket_path=None, timeout=DEFAULT_TIMEOUT):
+        super(BrokerCredentials, self).__init__()
+        if socket_path is None:
+            socket_path = get_default_socket_path()
+        self.socket_path = socket_path
+        self._timeout = timeout
+
+    def refresh(self, request):
+        """Get the current access token from the broker.
+
+        ``request`` is not used: the broker makes any HTTP requests.
+        """
+        self.token, self.expiry = request_token(self.socket_path, timeout=self._timeout)
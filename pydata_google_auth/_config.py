@@ -0,0 +1,30 @@
+"""Location of the pydata configuration directory.
+
+Only uses the standard library, so that the CLI can find cached tokens
+without importing google-auth.
+"""
+
+import os
+
+
+DIRNAME = "pydata"
+
+
+def get_default_path(dirname, filename):
+    """
+    Gets the path of ``filename`` in the ``dirname`` configuration directory.
+
+    Returns
+    -------
+    str
+        Path in the user's configuration directory.
+    """
+    config_path = None
+
+    if os.name == "nt":
+        config_path = os.getenv("APPDATA")
+    if not config_path:
+        config_path = os.path.join(os.path.expanduser("~"), ".config")
+
+    config_path = os.path.join(config_path, dirname)
+    return os.path.join(config_path, filename)
@@ -0,0 +1,87 @@
+"""Credentials that refresh the first time their access token is used.
+
+The loaders return these in lazy mode, so that loading credentials never
+waits on the network. The refresh happens on the first ``before_request``,
+which is how client libraries use credentials, or on the first read of
+``token``. Until then, ``valid`` is ``False`` and no request is made.
+"""
+
+import threading
+
+import google.auth.credentials
+import google.oauth2.credentials
+from google.oauth2 import service_account
+
+from pydata_google_auth import _transport
+
+
+# Deferred refreshes happen once per credentials object, so one lock is
+# enough. A per-object lock would keep the credentials from being pickled.
+_refresh_lock = threading.Lock()
+
+# Set while google-auth copies credentials, which reads ``token``. Copies,
+# such as from ``with_quota_project``, stay lazy rather than refresh.
+_copying = threading.local()
+
+
+class _DeferredRefreshMixin(object):
+    _refresh_pending = False
+
+    def defer_refresh(self):
+        """Refresh on first use instead of now, if the token isn't valid."""
+        self._refresh_pending = not self.valid
+        return self
+
+    @property
+    def token(self):
+        if self._refresh_pending and not getattr(_copying, "active", False):
+            with _refresh_lock:
+                if self._refresh_pending:
+                    self.refresh(_transport.get_request())
+        return self.__dict__.get("token")
+
+    @token.setter
+    def token(self, value):
+        self.__dict__["token"] = value
+
+    @property
+    def valid(self):
+        if self._refresh_pending:
+            return False
+        return super(_DeferredRefreshMixin, self).valid
+
+    @property
+    def token_state(self):
+        if self._refresh_pending:
+            return google.auth.credentials.TokenState.INVALID
+        return super(_DeferredRefreshMixin, self).token_state
+
+    def refresh(self, request):
+        super(_DeferredRefreshMixin, self).refresh(request)
+        self._refresh_pending = False
+
+    def _make_copy(self):
+        _copying.active = True
+        try:
+            copy = super(_DeferredRefreshMixin, self)._make_copy()
+        finally:
+            _copying.active = False
+        copy._refresh_pending = self._refresh_pending
+        return copy
+
+    def __setstate__(self, state):
+        # User credentials restore only the attributes they know about.
+        parent = getattr(super(_DeferredRefreshMixin, self), "__setstate__", None)
+        if parent is None:
+            self.__dict__.update(state)
+        else:
+            parent(state)
+        self._refresh_pending = state.get("_refresh_pending", False)
+
+
+class UserCredentials(_DeferredRefreshMixin, google.oauth2.credentials.Credentials):
+    """User credentials that refresh on first use."""
+
+
+class ServiceAccountCredentials(_DeferredRefreshMixin, service_account.Credentials):
+    """Service account credentials that refresh on first use."""
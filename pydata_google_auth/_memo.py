@@ -0,0 +1,92 @@
+"""Process-wide memo of credentials returned by the public helpers."""
+
+import threading
+
+
+class CredentialsMemo(object):
+    """
+    Thread-safe map from a lookup key to live credentials.
+
+    Entries are returned for as long as their credentials are valid. Only one
+    thread computes the value for a given key at a time, so concurrent
+    callers share a single credentials lookup (and OAuth flow).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Maps each key being created to its lock and the number of threads
+        # using the lock. Locks are dropped when unused, so that varying
+        # keys don't accumulate locks.
+        self._key_locks = {}
+        self._entries = {}
+
+    def _get_valid(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        credentials, _ = entry
+        if not credentials.valid:
+            return None
+        return entry
+
+    def get(self, key):
+        """
+        Get the memoized ``(credentials, extra)`` pair for ``key``, or
+        ``None`` if there is none or its credentials are no longer valid.
+        Never waits for another thread to create the entry.
+        """
+        return self._get_valid(key)
+
+    def get_or_create(self, key, factory):
+        """
+        Get the memoized ``(credentials, extra)`` pair for ``key``.
+
+        Calls ``factory`` to create the pair if there is no entry or if the
+        memoized credentials are no longer valid.
+        """
+        entry = self._get_valid(key)
+        if entry is not None:
+            return entry
+
+        key_lock = self._acquire_key_lock(key)
+        try:
+            with key_lock:
+                # Another thread may have populated the entry while we waited.
+                entry = self._get_valid(key)
+                if entry is not None:
+                    return entry
+
+                entry = factory()
+                credentials, _ = entry
+                with self._lock:
+                    if credentials is None:
+                        self._entries.pop(key, None)
+                    else:
+                        self._entries[key] = entry
+                return entry
+        finally:
+            self._release_key_lock(key)
+
+    def _acquire_key_lock(self, key):
+        with self._lock:
+            key_lock = self._key_locks.get(key)
+            if key_lock is None:
+                key_lock = self._key_locks[key] = [threading.Lock(), 0]
+            key_lock[1] += 1
+            return key_lock[0]
+
+    def _release_key_lock(self, key):
+        with self._lock:
+            key_lock = self._key_locks[key]
+            key_lock[1] -= 1
+            if not key_lock[1]:
+                del self._key_locks[key]
+
+    def clear(self):
+        """Forget all memoized credentials."""
+        with self._lock:
+            # Locks in use are kept, so that threads creating an entry now
+            # still exclude each other.
+            self._entries.clear()
@@ -0,0 +1,269 @@
+"""Local server that speaks the Compute Engine metadata server protocol.
+
+Serves access tokens for user credentials to any client that can get
+credentials from the metadata server, including ``google.auth.default()``,
+the Cloud SDK and the Go and Java client libraries. Point clients at it with
+the ``GCE_METADATA_HOST`` and ``GCE_METADATA_IP`` environment variables.
+
+Only the endpoints needed to get an access token and a project ID are
+served.
+"""
+
+import asyncio
+import json
+import logging
+import urllib.parse
+
+import google.auth._helpers
+import google.auth.exceptions
+
+from pydata_google_auth import _refresher
+from pydata_google_auth import _transport
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8990
+
+_METADATA_FLAVOR_HEADER = "metadata-flavor"
+_METADATA_FLAVOR_VALUE = "Google"
+_DEFAULT_UNIVERSE_DOMAIN = "googleapis.com"
+
+# Limits on the size of a request, to keep a misbehaving client from using
+# up memory.
+_MAX_LINE = 8192
+_MAX_HEADERS = 100
+# Metadata server requests have no body worth reading. Bodies are discarded.
+_MAX_BODY = 4096
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+class _BadRequest(Exception):
+    pass
+
+
+class MetadataServer(object):
+    """
+    Serve ``credentials`` with the Compute Engine metadata server protocol.
+
+    Parameters
+    ----------
+    credentials : google.auth.credentials.Credentials
+        Credentials to serve. They are refreshed ahead of expiry in a
+        background thread, and on demand if a client asks for an expired
+        token.
+    host : str, optional
+        Address to listen on. Defaults to ``127.0.0.1``. Anyone who can
+        connect can get an access token, so only listen on loopback
+        addresses.
+    port : int, optional
+        Port to listen on. Use 0 to let the operating system assign a port.
+    project_id : str, optional
+        Project ID to serve. Defaults to the credentials' quota project, if
+        any.
+    """
+
+    def __init__(
+        self, credentials, host=DEFAULT_HOST, port=DEFAULT_PORT, project_id=None
+    ):
+        self.credentials = credentials
+        self.host = host
+        self.port = port
+        self.project_id = project_id or getattr(credentials, "quota_project_id", None)
+        self._server = None
+        self._refresh_lock = None
+        self._refresher = None
+
+    async def start(self):
+        """Refresh the credentials if needed and start listening."""
+        self._refresh_lock = asyncio.Lock()
+        # Get a token before the refresher starts, so that the first clients
+        # and the refresher don't both refresh.
+        await self._valid_credentials()
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=_MAX_LINE
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._refresher = _refresher.start_background_refresh(self.credentials)
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        if self._refresher is not None:
+            self._refresher.stop()
+        if self._server is not None:
+            self._server.close()
+
+    async def _valid_credentials(self):
+        credentials = self.credentials
+        if not credentials.valid:
+            async with self._refresh_lock:
+                # Another client may have triggered the refresh already.
+                if not credentials.valid:
+                    loop = asyncio.get_running_loop()
+                    await loop.run_in_executor(None, self._refresh)
+        return credentials
+
+    def _refresh(self):
+        self.credentials.refresh(_transport.get_request())
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    request = await _read_request(reader)
+                except _BadRequest as exc:
+                    await _write_response(writer, 400, str(exc), keep_alive=False)
+                    return
+                if request is None:
+                    return
+
+                method, target, version, headers = request
+                keep_alive = version == "HTTP/1.1" and (
+                    headers.get("connection", "").lower() != "close"
+                )
+                status, body = await self._respond(method, target, headers)
+                await _write_response(writer, status, body, keep_alive=keep_alive)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method, target, headers):
+        # Same checks as the real metadata server. They keep browsers and
+        # proxied requests from reading tokens.
+        if headers.get(_METADATA_FLAVOR_HEADER) != _METADATA_FLAVOR_VALUE:
+            return 403, "Missing Metadata-Flavor: Google header."
+        if "x-forwarded-for" in headers:
+            return 403, "Forwarded requests are not allowed."
+        if method != "GET":
+            return 405, "Method not allowed."
+
+        url = urllib.parse.urlsplit(target)
+        path = url.path.rstrip("/")
+        query = urllib.parse.parse_qs(url.query)
+
+        if path in ("", "/computeMetadata/v1"):
+            return 200, ""
+        if path == "/computeMetadata/v1/instance/service-accounts/default/token":
+            return await self._token_response()
+        if path == "/computeMetadata/v1/instance/service-accounts/default":
+            if query.get("recursive") == ["true"]:
+                return 200, self._service_account_info()
+            return 200, "aliases\nemail\nscopes\ntoken\n"
+        if path == "/computeMetadata/v1/instance/service-accounts/default/email":
+            return 200, self._service_account_info()["email"]
+        if path == "/computeMetadata/v1/instance/service-accounts/default/scopes":
+            return 200, "\n".join(self._service_account_info()["scopes"])
+        if path == "/computeMetadata/v1/project/project-id":
+            if self.project_id:
+                return 200, self.project_id
+            return 404, "No project ID is set."
+        if path == "/computeMetadata/v1/universe/universe-domain":
+            return 200, getattr(
+                self.credentials, "universe_domain", _DEFAULT_UNIVERSE_DOMAIN
+            )
+        return 404, "Not found."
+
+    async def _token_response(self):
+        try:
+            credentials = await self._valid_credentials()
+        except (google.auth.exceptions.GoogleAuthError, IOError) as exc:
+            logger.warning("Token refresh failed: {}".format(str(exc)))
+            return 500, "Token refresh failed."
+
+        expires_in = 0
+        if credentials.expiry is not None:
+            remaining = credentials.expiry - google.auth._helpers.utcnow()
+            expires_in = max(int(remaining.total_seconds()), 0)
+        return 200, {
+            "access_token": credentials.token,
+            "expires_in": expires_in,
+            "token_type": "Bearer",
+        }
+
+    def _service_account_info(self):
+        # User credentials have no service account. Report the
+        # ``default`` alias, which is what clients ask for.
+        return {
+            "aliases": ["default"],
+            "email": "default",
+            "scopes": list(getattr(self.credentials, "scopes", None) or []),
+        }
+
+
+async def _read_request(reader):
+    """Read one HTTP request. Returns ``None`` at end of stream."""
+    try:
+        request_line = await reader.readline()
+    except (asyncio.LimitOverrunError, ValueError):
+        raise _BadRequest("Request line too long.")
+    if not request_line:
+        return None
+
+    try:
+        method, target, version = request_line.decode("latin-1").split()
+    except ValueError:
+        raise _BadRequest("Malformed request line.")
+
+    headers = {}
+    for _ in range(_MAX_HEADERS + 1):
+        try:
+            line = await reader.readline()
+        except (asyncio.LimitOverrunError, ValueError):
+            raise _BadRequest("Header line too long.")
+        line = line.decode("latin-1").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise _BadRequest("Too many headers.")
+
+    # Discard any body, such as from a bound token request.
+    content_length = headers.get("content-length")
+    if content_length:
+        # Headers are decoded as Latin-1, and str.isdigit also accepts
+        # characters such as "²" that int() doesn't.
+        if not (content_length.isascii() and content_length.isdigit()):
+            raise _BadRequest("Invalid Content-Length.")
+        content_length = int(content_length)
+        if content_length > _MAX_BODY:
+            raise _BadRequest("Request body too large.")
+        await reader.readexactly(content_length)
+    return method, target, version, headers
+
+
+async def _write_response(writer, status, body, keep_alive=True):
+    if isinstance(body, dict):
+        content_type = "application/json"
+        body = json.dumps(body)
+    else:
+        content_type = "application/text"
+    body = body.encode("utf-8")
+
+    head = [
+        "HTTP/1.1 {} {}".format(status, _REASONS[status]),
+        "Metadata-Flavor: {}".format(_METADATA_FLAVOR_VALUE),
+        "Content-Type: {}".format(content_type),
+        "Content-Length: {}".format(len(body)),
+        "Connection: {}".format("keep-alive" if keep_alive else "close"),
+    ]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
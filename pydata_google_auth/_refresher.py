@@ -0,0 +1,171 @@
+"""Background thread that refreshes credentials before they expire."""
+
+import logging
+import random
+import threading
+
+import google.auth._helpers
+import google.auth.exceptions
+
+from pydata_google_auth import _transport
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_FRACTION = 0.75
+DEFAULT_JITTER = 0.1
+
+# Bounds on how long to sleep between refresh attempts, in seconds.
+_MIN_DELAY = 1.0
+_RETRY_DELAY = 30.0
+
+# Running refreshers, keyed by the id() of the credentials they refresh.
+_refreshers = {}
+_refreshers_lock = threading.Lock()
+
+
+class BackgroundRefresher(object):
+    """
+    Refresh ``credentials`` in a daemon thread ahead of their expiry.
+
+    Parameters
+    ----------
+    credentials : google.auth.credentials.Credentials
+        Credentials to keep fresh. They are refreshed in place.
+    credentials_cache : pydata_google_auth.cache.CredentialsCache, optional
+        If set, each new token is written back through this cache.
+    refresh_fraction : float, optional
+        Fraction of the remaining token lifetime to wait before refreshing.
+    jitter : float, optional
+        Randomize each delay by up to this fraction, so that many processes
+        started at the same time don't refresh in lockstep.
+    """
+
+    def __init__(
+        self,
+        credentials,
+        credentials_cache=None,
+        refresh_fraction=DEFAULT_REFRESH_FRACTION,
+        jitter=DEFAULT_JITTER,
+    ):
+        if not 0 < refresh_fraction <= 1:
+            raise ValueError("refresh_fraction must be in the range (0, 1].")
+        self.credentials = credentials
+        self._credentials_cache = credentials_cache
+        self._refresh_fraction = refresh_fraction
+        self._jitter = jitter
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="pydata-google-auth-refresher"
+        )
+        self._thread.daemon = True
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Stop refreshing and wait up to ``timeout`` seconds for the thread."""
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _next_delay(self):
+        expiry = self.credentials.expiry
+        if not self.credentials.valid:
+            return 0.0
+        if expiry is None:
+            # The token never expires.
+            return None
+
+        remaining = (expiry - google.auth._helpers.utcnow()).total_seconds()
+        delay = remaining * self._refresh_fraction
+        delay *= 1 + random.uniform(-self._jitter, self._jitter)
+        return max(delay, _MIN_DELAY)
+
+    def _refresh(self):
+        request = _transport.get_request()
+        self.credentials.refresh(request)
+        if self._credentials_cache is not None:
+            self._credentials_cache.save(self.credentials)
+
+    def _run(self):
+        try:
+            self._refresh_until_stopped()
+        finally:
+            with _refreshers_lock:
+                if _refreshers.get(id(self.credentials)) is self:
+                    del _refreshers[id(self.credentials)]
+
+    def _refresh_until_stopped(self):
+        while not self._stopped.is_set():
+            delay = self._next_delay()
+            if delay is None:
+                logger.debug("Credentials don't expire. Stopping refresher.")
+                return
+            if self._stopped.wait(delay):
+                return
+
+            try:
+                self._refresh()
+            except (google.auth.exceptions.GoogleAuthError, IOError) as exc:
+                # Leave the current token in place. Requests made with it
+                # fall back to a lazy refresh if it expires before we retry.
+                logger.warning("Background refresh failed: {}".format(str(exc)))
+                if self._stopped.wait(_RETRY_DELAY):
+                    return
+
+
+def start_background_refresh(
+    credentials,
+    credentials_cache=None,
+    refresh_fraction=DEFAULT_REFRESH_FRACTION,
+    jitter=DEFAULT_JITTER,
+):
+    """
+    Start a daemon thread that refreshes ``credentials`` ahead of expiry.
+
+    Long-running services can use this to keep token refreshes out of the
+    latency path of their requests. At most one refresher runs for a given
+    credentials object. If one is already running, it is returned.
+
+    Parameters
+    ----------
+    credentials : google.auth.credentials.Credentials
+        Credentials to keep fresh. They are refreshed in place, so any client
+        already using them picks up the new token.
+    credentials_cache : pydata_google_auth.cache.CredentialsCache, optional
+        If set, each new token is written back through this cache so that
+        other processes can use it.
+    refresh_fraction : float, optional
+        Fraction of the remaining token lifetime to wait before refreshing.
+        Defaults to 0.75, which refreshes a one hour token after 45 minutes.
+    jitter : float, optional
+        Randomize each delay by up to this fraction. Defaults to 0.1.
+
+    Returns
+    -------
+    pydata_google_auth._refresher.BackgroundRefresher
+        The refresher. Call its ``stop()`` method to stop refreshing.
+    """
+    with _refreshers_lock:
+        refresher = _refreshers.get(id(credentials))
+        if (
+            refresher is not None
+            and refresher.credentials is credentials
+            and not refresher._stopped.is_set()
+        ):
+            return refresher
+
+        refresher = BackgroundRefresher(
+            credentials,
+            credentials_cache=credentials_cache,
+            refresh_fraction=refresh_fraction,
+            jitter=jitter,
+        )
+        _refreshers[id(credentials)] = refresher
+        return refresher.start()
@@ -0,0 +1,235 @@
+"""Retry credentials refreshes through transient failures."""
+
+import logging
+import random
+import time
+
+import google.auth.exceptions
+import google.auth.transport
+
+from pydata_google_auth import exceptions
+from pydata_google_auth import _breaker
+from pydata_google_auth import _transport
+
+
+logger = logging.getLogger(__name__)
+
+# Attempts at a refresh, including the first.
+DEFAULT_MAX_ATTEMPTS = 4
+# Upper bound, in seconds, of the first backoff. It doubles per attempt.
+DEFAULT_INITIAL_DELAY = 0.25
+DEFAULT_MAX_DELAY = 4.0
+# Seconds a refresh may take in total, across attempts and backoffs.
+DEFAULT_DEADLINE = 30.0
+
+# Token endpoint responses worth retrying. google-auth already retries most
+# of these a few times itself, but not a 502 from a proxy or load balancer,
+# and it doesn't retry connection errors at all.
+_TRANSIENT_STATUSES = frozenset((408, 429, 500, 502, 503, 504))
+
+
+class RetryPolicy(object):
+    """
+    How many times, and for how long, to retry a refresh.
+
+    Backoffs use "full jitter": each is a random duration up to an
+    exponentially growing bound, so processes that failed together don't
+    retry together.
+    """
+
+    def __init__(
+        self,
+        max_attempts=DEFAULT_MAX_ATTEMPTS,
+        initial_delay=DEFAULT_INITIAL_DELAY,
+        max_delay=DEFAULT_MAX_DELAY,
+        deadline=DEFAULT_DEADLINE,
+    ):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1.")
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, attempt):
+        """Seconds to wait after the ``attempt``-th failed attempt."""
+        bound = min(self.max_delay, self.initial_delay * 2 ** (attempt - 1))
+        return random.uniform(0, bound)
+
+
+_policy = RetryPolicy()
+
+
+def set_refresh_retry(
+    max_attempts=DEFAULT_MAX_ATTEMPTS,
+    initial_delay=DEFAULT_INITIAL_DELAY,
+    max_delay=DEFAULT_MAX_DELAY,
+    deadline=DEFAULT_DEADLINE,
+):
+    """
+    Set how pydata-google-auth retries refreshes that fail transiently.
+
+    Connection errors, timeouts, and server errors from the token endpoint
+    are retried with exponential backoff and jitter. When the attempts or
+    the deadline run out,
+    :class:`~pydata_google_auth.exceptions.PyDataConnectionError` is raised.
+    A refresh token that was revoked or has expired (``invalid_grant``) is
+    never retried.
+
+    Parameters
+    ----------
+    max_attempts : int, optional
+        Attempts at each refresh, including the first. Set to 1 to disable
+        retries. Defaults to 4.
+    initial_delay : float, optional
+        Upper bound, in seconds, of the random wait after the first failed
+        attempt. The bound doubles after each attempt. Defaults to 0.25
+        seconds.
+    max_delay : float, optional
+        Upper bound, in seconds, of any one wait. Defaults to 4 seconds.
+    deadline : float, optional
+        Seconds each refresh may take in total, across attempts and waits.
+        Requests to the token endpoint time out when it passes, even if the
+        transport's own timeout is longer. Defaults to 30 seconds.
+    """
+    global _policy
+
+    _policy = RetryPolicy(
+        max_attempts=max_attempts,
+        initial_delay=initial_delay,
+        max_delay=max_delay,
+        deadline=deadline,
+    )
+
+
+class _DeadlineRequest(google.auth.transport.Request):
+    """
+    Wraps a transport to fit its requests into the time left before
+    ``deadline``, and to remember the status of the last response.
+    """
+
+    def __init__(self, request, deadline):
+        self._request = request
+        self._deadline = deadline
+        self.status = None
+
+    def __call__(
+        self, url, method="GET", body=None, headers=None, timeout=None, **kwargs
+    ):
+        remaining = self._deadline - time.monotonic()
+        if remaining <= 0:
+            raise google.auth.exceptions.TransportError("Refresh deadline exceeded.")
+        if timeout is None:
+            timeout = getattr(self._request, "timeout", None)
+        if timeout is None or timeout > remaining:
+            timeout = remaining
+
+        response = self._request(
+            url, method=method, body=body, headers=headers, timeout=timeout, **kwargs
+        )
+        self.status = response.status
+        return response
+
+
+def _is_transient(exc, status=None):
+    if isinstance(exc, google.auth.exceptions.TransportError):
+        return True
+    if isinstance(exc, google.auth.exceptions.RefreshError):
+        # RefreshError has no retryable attribute before google-auth 2.
+        return getattr(exc, "retryable", False) or status in _TRANSIENT_STATUSES
+    return False
+
+
+def _refreshes_locally(credentials):
+    """
+    Whether refreshing ``credentials`` signs a self-signed JWT instead of
+    requesting a token from the token endpoint.
+    """
+    if type(credentials).__module__ == "google.auth.jwt":
+        return True
+    # Service account credentials. Domain-wide delegation always needs the
+    # token endpoint.
+    if getattr(credentials, "_subject", None) is not None:
+        return False
+    if getattr(credentials, "_jwt_credentials", None) is not None:
+        return True
+    return bool(
+        getattr(credentials, "_always_use_jwt_access", False)
+        and (
+            getattr(credentials, "_scopes", None)
+            or getattr(credentials, "_default_scopes", None)
+        )
+    )
+
+
+def refresh(credentials, request=None, policy=None):
+    """
+    Refresh ``credentials``, retrying transient failures.
+
+    Raises :class:`~pydata_google_auth.exceptions.PyDataConnectionError` if
+    the refresh still fails transiently when the attempts or the deadline
+    run out, or without a request while the token endpoint's circuit
+    breaker is open. Other errors, such as a
+    :class:`google.auth.exceptions.RefreshError` for a revoked refresh
+    token, are raised at once.
+
+    Credentials that sign their own tokens, such as service account
+    credentials with ``use_jwt_access``, are refreshed without retries or
+    the circuit breaker, so that they keep working while the token endpoint
+    is down.
+    """
+    if request is None:
+        request = _transport.get_request()
+    if policy is None:
+        policy = _policy
+
+    if _refreshes_locally(credentials):
+        credentials.refresh(request)
+        return credentials
+
+    breaker = _breaker.get_breaker(credentials)
+    identity = _breaker.get_identity(credentials)
+    breaker.before_refresh(identity)
+
+    # Only the endpoint's answers, or its failure to answer, say whether it
+    # is up. Other errors leave the breaker as it was.
+    reached = False
+    failure = None
+    try:
+        deadline = time.monotonic() + policy.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            deadline_request = _DeadlineRequest(request, deadline)
+            try:
+                credentials.refresh(deadline_request)
+                reached = True
+                return credentials
+            except google.auth.exceptions.GoogleAuthError as exc:
+                if not _is_transient(exc, deadline_request.status):
+                    reached = deadline_request.status is not None
+                    raise
+                error = exc
+
+            delay = policy.backoff(attempt)
+            if attempt >= policy.max_attempts or time.monotonic() + delay >= deadline:
+                failure = exceptions.PyDataConnectionError(
+                    "Unable to refresh credentials after {} attempts: {}".format(
+                        attempt, error
+                    )
+                )
+                raise failure from error
+
+            logger.debug(
+                "Error refreshing credentials, retrying in {:.2f} seconds: {}".format(
+                    delay, error
+                )
+            )
+            time.sleep(delay)
+    finally:
+        if failure is not None:
+            breaker.record_failure(failure, identity)
+        elif reached:
+            breaker.record_success()
+        else:
+            breaker.release()
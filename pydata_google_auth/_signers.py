@@ -0,0 +1,61 @@
+"""Process-wide cache of signers parsed from service account key files."""
+
+import collections
+import threading
+
+# Enough for the few keys a process normally uses, small enough that
+# forgotten keys don't accumulate.
+DEFAULT_MAXSIZE = 32
+
+
+class SignerCache(object):
+    """
+    Thread-safe, size-bounded map from a key file to its parsed signer.
+
+    Parsing an RSA private key takes milliseconds, so loading the same key
+    file many times reuses the signer instead. An entry is only used while
+    the file is unchanged: either its identity (modification time, size and
+    inode) is the same, or its content hashes to the same digest. When there
+    are more than ``maxsize`` files, the least recently used is forgotten.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self._lock = threading.Lock()
+        self._maxsize = maxsize
+        self._entries = collections.OrderedDict()
+
+    def get(self, path, identity=None, digest=None):
+        """
+        Get the ``(info, signer)`` pair cached for ``path``.
+
+        Returns ``None`` unless the cached file had the given ``identity``
+        or content ``digest``.
+        """
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return None
+            entry_identity, entry_digest, info, signer = entry
+            if identity is not None and identity == entry_identity:
+                pass
+            elif digest is not None and digest == entry_digest:
+                # Same content, rewritten or touched. Remember the new
+                # identity so that the next lookup doesn't read the file.
+                self._entries[path] = (identity, entry_digest, info, signer)
+            else:
+                return None
+            self._entries.move_to_end(path)
+            return info, signer
+
+    def put(self, path, identity, digest, info, signer):
+        """Cache the signer parsed from ``path``, replacing any older one."""
+        with self._lock:
+            self._entries[path] = (identity, digest, info, signer)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Forget all cached signers."""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,94 @@
+"""Access tokens printed by ``print-token``, cached between processes.
+
+Shell scripts run ``print-token`` for every request they make, so a token
+that is still valid is printed from this cache. Reading the cache only uses
+the standard library: it doesn't import google-auth or make a request.
+
+Each credentials file has its own cache file, keyed by the file's absolute
+path. A cached token is only used while the credentials file is unchanged.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from pydata_google_auth import _config
+
+
+# Seconds a cached token must still be valid for, unless the caller asks
+# for longer. Long enough for a curl request to finish with the token.
+DEFAULT_MIN_TTL = 60
+
+_TOKENS_DIRNAME = "tokens"
+
+
+def _get_token_path(credentials_path):
+    digest = hashlib.sha256(credentials_path.encode("utf-8")).hexdigest()
+    directory = _config.get_default_path(_config.DIRNAME, _TOKENS_DIRNAME)
+    return os.path.join(directory, digest[:32] + ".json")
+
+
+def get_source_identity(credentials_path):
+    """
+    Get the identity of the credentials file: its modification time, size,
+    and inode. Returns ``None`` if the file doesn't exist.
+    """
+    try:
+        stat = os.stat(credentials_path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size, stat.st_ino]
+
+
+def load_token(credentials_path, min_ttl=DEFAULT_MIN_TTL):
+    """
+    Get the cached access token for ``credentials_path``.
+
+    Returns ``None`` unless there is a token for the file as it is now,
+    valid for at least ``min_ttl`` more seconds.
+    """
+    credentials_path = os.path.abspath(credentials_path)
+    identity = get_source_identity(credentials_path)
+    if identity is None:
+        return None
+
+    try:
+        with open(_get_token_path(credentials_path)) as stream:
+            entry = json.load(stream)
+    except (IOError, ValueError):
+        return None
+
+    if entry.get("source") != identity:
+        return None
+    expires_at = entry.get("expires_at")
+    if expires_at is None or expires_at - time.time() < min_ttl:
+        return None
+    return entry.get("access_token")
+
+
+def save_token(credentials_path, identity, credentials):
+    """
+    Cache the access token of ``credentials``, loaded from
+    ``credentials_path`` when the file had the given ``identity``.
+    """
+    # Imported here because only a cache miss writes the cache, and the
+    # cache module imports google-auth.
+    import datetime
+
+    from pydata_google_auth import cache
+
+    if identity is None or credentials.expiry is None:
+        # A token that never expires can't be checked against --min-ttl.
+        return False
+
+    credentials_path = os.path.abspath(credentials_path)
+    entry = {
+        "access_token": credentials.token,
+        # google-auth expiries are naive UTC datetimes.
+        "expires_at": (
+            credentials.expiry - datetime.datetime(1970, 1, 1)
+        ).total_seconds(),
+        "source": identity,
+    }
+    return cache._write_json_file(entry, _get_token_path(credentials_path))
@@ -0,0 +1,121 @@
+"""Shared HTTP transport used to refresh credentials."""
+
+import os
+import threading
+
+import google.auth.transport
+
+
+# Seconds to wait for the token endpoint when the caller doesn't say.
+DEFAULT_TIMEOUT = 30
+# Connections kept alive per host. Sized for a handful of threads
+# refreshing at the same time.
+DEFAULT_POOL_SIZE = 10
+
+_lock = threading.Lock()
+_request = None
+
+
+class _PooledRequest(google.auth.transport.Request):
+    """
+    A :class:`google.auth.transport.requests.Request` with a default timeout.
+
+    The underlying :class:`requests.Session` keeps connections alive, so
+    repeated refreshes against the same token endpoint reuse the TCP and TLS
+    connection. Sessions are safe to share between threads for this use.
+    """
+
+    def __init__(self, request, timeout=DEFAULT_TIMEOUT):
+        self._request = request
+        self._timeout = timeout
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @property
+    def session(self):
+        return self._request.session
+
+    @session.setter
+    def session(self, session):
+        self._request.session = session
+
+    def __call__(self, url, method="GET", body=None, headers=None, **kwargs):
+        kwargs.setdefault("timeout", self._timeout)
+        return self._request(url, method=method, body=body, headers=headers, **kwargs)
+
+
+def _make_request(timeout=DEFAULT_TIMEOUT, pool_size=DEFAULT_POOL_SIZE):
+    # Imported here because requests is slow to import, and processes that
+    # only use a cached access token never need it.
+    import google.auth.transport.requests
+    import requests
+    import requests.adapters
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return _PooledRequest(
+        google.auth.transport.requests.Request(session=session), timeout=timeout
+    )
+
+
+def get_request():
+    """
+    Get the shared transport for refreshing credentials.
+
+    Returns
+    -------
+    google.auth.transport.Request
+    """
+    global _request
+
+    with _lock:
+        if _request is None:
+            _request = _make_request()
+        return _request
+
+
+def _reset_after_fork():
+    global _lock, _request
+
+    # Don't share pooled sockets between a parent process and its children.
+    _lock = threading.Lock()
+    _request = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def set_transport(request=None, timeout=DEFAULT_TIMEOUT, pool_size=DEFAULT_POOL_SIZE):
+    """
+    Set the HTTP transport pydata-google-auth uses to refresh credentials.
+
+    By default, all refreshes in a process share one pool of keep-alive
+    connections, so only the first refresh pays for TCP and TLS setup.
+
+    Parameters
+    ----------
+    request : google.auth.transport.Request, optional
+        Transport to use for all refreshes, for example one configured with
+        a proxy or custom certificates. If not set, a new pooled transport is
+        created with the given ``timeout`` and ``pool_size``.
+    timeout : float, optional
+        Seconds to wait for the token endpoint, unless the caller passes its
+        own timeout. Ignored if ``request`` is set. Defaults to 30 seconds.
+    pool_size : int, optional
+        Number of connections to keep alive per host. Ignored if ``request``
+        is set. Defaults to 10.
+    """
+    global _request
+
+    if request is None:
+        request = _make_request(timeout=timeout, pool_size=pool_size)
+
+    with _lock:
+        _request = request
@@ -1,13 +1,25 @@
 """Helpers for running a local webserver to receive authorization code."""
 
+import logging
 import socket
+import webbrowser
+import wsgiref.simple_server
+import wsgiref.util
 from contextlib import closing
 
 from pydata_google_auth import exceptions
 
 
+logger = logging.getLogger(__name__)
+
 LOCALHOST = "localhost"
 DEFAULT_PORTS_TO_TRY = 100
+DEFAULT_AUTH_PROMPT_MESSAGE = (
+    "Please visit this URL to authorize this application: {url}"
+)
+DEFAULT_WEB_SUCCESS_MESSAGE = (
+    "The authentication flow has completed. You may close this window."
+)
 
 
 def is_port_open(port):
@@ -64,13 +76,186 @@ def find_open_port(start=8080, stop=None):
     return None
 
 
-def run_local_server(app_flow, **kwargs):
+def _listen(port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        # Match the flow's own server: on Windows, keep other processes from
+        # binding the same port.
+        if hasattr(socket, "SO_EXCLUSIVEADDRUSE"):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+        sock.bind((LOCALHOST, port))
+        sock.listen(1)
+    except socket.error:
+        sock.close()
+        raise
+    return sock
+
+
+def bind_open_port(start=8080, stop=None):
+    """Bind and listen on an open port between ``start`` and ``stop``.
+
+    Unlike :func:`find_open_port`, each port is bound only once and the
+    listening socket is returned, so another process can't take the port
+    before the redirect server uses it.
+
+    Parameters
+    ----------
+    start : Optional[int]
+        Beginning of range of ports to try. Defaults to 8080. If 0, the
+        operating system assigns a free port.
+    stop : Optional[int]
+        End of range of ports to try (not including exactly equals ``stop``).
+        This function tries 100 possible ports if no ``stop`` is specified.
+
+    Returns
+    -------
+    Optional[socket.socket]
+        ``None`` if no open port is found, otherwise a socket listening on
+        localhost.
+    """
+    if start == 0:
+        try:
+            return _listen(0)
+        except socket.error:
+            return None
+
+    if not stop:
+        stop = start + DEFAULT_PORTS_TO_TRY
+
+    for port in range(start, stop):
+        try:
+            return _listen(port)
+        except socket.error:
+            continue
+
+    # No open ports found.
+    return None
+
+
+class _RedirectWSGIApp(object):
+    """WSGI app to record the authorization redirect."""
+
+    def __init__(self, success_message):
+        self.last_request_uri = None
+        self._success_message = success_message
+
+    def __call__(self, environ, start_response):
+        start_response("200 OK", [("Content-type", "text/plain; charset=utf-8")])
+        self.last_request_uri = wsgiref.util.request_uri(environ)
+        return [self._success_message.encode("utf-8")]
+
+
+class _WSGIRequestHandler(wsgiref.simple_server.WSGIRequestHandler):
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def _make_server(sock, app):
+    """Make a WSGI server that serves on an already listening socket."""
+    server = wsgiref.simple_server.WSGIServer(
+        sock.getsockname(), _WSGIRequestHandler, bind_and_activate=False
+    )
+    # Replace the unbound socket created by the server. This does the work of
+    # ``server_bind``, without binding again.
+    server.socket.close()
+    server.socket = sock
+    server.server_address = sock.getsockname()
+    host, port = server.server_address[:2]
+    server.server_name = socket.getfqdn(host)
+    server.server_port = port
+    server.setup_environ()
+    server.set_app(app)
+    return server
+
+
+def run_flow_on_socket(
+    app_flow,
+    sock,
+    authorization_prompt_message=None,
+    success_message=None,
+    open_browser=True,
+    **kwargs
+):
+    """Run an installed app flow with a redirect server on ``sock``.
+
+    Does the same as
+    :meth:`google_auth_oauthlib.flow.InstalledAppFlow.run_local_server`,
+    but receives the redirect on a socket that is already listening.
+
+    Parameters
+    ----------
+    app_flow : google_auth_oauthlib.flow.InstalledAppFlow
+        Installed application flow to fetch user credentials.
+    sock : socket.socket
+        A socket listening on localhost, such as one returned by
+        :func:`bind_open_port`. It is closed when the flow completes.
+    authorization_prompt_message : Optional[str]
+        Message telling the user to open the authorization URL, formatted
+        with ``url``. Defaults to :data:`DEFAULT_AUTH_PROMPT_MESSAGE`.
+    success_message : Optional[str]
+        Message shown in the browser once authorization completes. Defaults
+        to :data:`DEFAULT_WEB_SUCCESS_MESSAGE`.
+    open_browser : bool
+        Whether to open the authorization URL in the user's browser.
+    kwargs
+        Passed to the flow's ``authorization_url`` method.
+
+    Returns
+    -------
+    google.auth.credentials.Credentials
+        User credentials from installed application flow.
+    """
+    if authorization_prompt_message is None:
+        authorization_prompt_message = DEFAULT_AUTH_PROMPT_MESSAGE
+    if success_message is None:
+        success_message = DEFAULT_WEB_SUCCESS_MESSAGE
+
+    app = _RedirectWSGIApp(success_message)
+    try:
+        server = _make_server(sock, app)
+    except Exception:
+        sock.close()
+        raise
+    try:
+        app_flow.redirect_uri = "http://{}:{}/".format(LOCALHOST, server.server_port)
+        auth_url, _ = app_flow.authorization_url(**kwargs)
+
+        if open_browser:
+            webbrowser.open(auth_url, new=1, autoraise=True)
+        if authorization_prompt_message:
+            print(authorization_prompt_message.format(url=auth_url))
+
+        server.handle_request()
+        if app.last_request_uri is None:
+            raise exceptions.PyDataConnectionError(
+                "No authorization response was received."
+            )
+
+        # oauthlib requires OAuth 2.0 responses to be over https.
+        authorization_response = app.last_request_uri.replace("http", "https", 1)
+        app_flow.fetch_token(authorization_response=authorization_response)
+    finally:
+        server.server_close()
+
+    return app_flow.credentials
+
+
+def run_local_server(app_flow, bind_once=False, port=8080, **kwargs):
     """Run local webserver installed app flow on some open port.
 
     Parameters
     ----------
     app_flow : google_auth_oauthlib.flow.InstalledAppFlow
         Installed application flow to fetch user credentials.
+    bind_once : Optional[bool]
+        If True, bind the first open port once and hand the listening
+        socket to the redirect server. Otherwise, check for an open port
+        and let the flow bind it again, which is racy on shared hosts.
+    port : Optional[int]
+        With ``bind_once``, the first port to try. Up to 100 ports are
+        tried. Use 0 to let the operating system assign a port.
+    kwargs
+        Passed to the flow.
 
     Returns
     -------
@@ -80,9 +265,15 @@ def run_local_server(app_flow, **kwargs):
     Raises
     ------
     pydata_google_auth.exceptions.PyDataConnectionError
-        If no open port can be found in the range from 8080 to 8089,
+        If no open port can be found in the range from 8080 to 8179,
         inclusive.
     """
+    if bind_once:
+        sock = bind_open_port(start=port)
+        if sock is None:
+            raise exceptions.PyDataConnectionError("Could not find open port.")
+        return run_flow_on_socket(app_flow, sock, **kwargs)
+
     port = find_open_port()
     if not port:
         raise exceptions.PyDataConnectionError("Could not find open port.")
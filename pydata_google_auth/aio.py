@@ -0,0 +1,248 @@
+"""Asyncio versions of the pydata-google-auth helpers.
+
+Credentials are loaded, refreshed and saved with blocking I/O. These
+coroutines run that work in the event loop's default executor, so the loop
+keeps serving other tasks, and share the work between tasks:
+
+* Concurrent calls with the same arguments wait on one call in the
+  executor rather than each taking an executor thread.
+* Credentials already remembered by :func:`pydata_google_auth.default` or
+  :func:`pydata_google_auth.get_user_credentials` are returned without
+  leaving the event loop.
+* :func:`refresh` refreshes a credentials object at most once at a time, no
+  matter how many tasks find its token expired.
+
+HTTP requests use the transport set with
+:func:`pydata_google_auth.set_transport`, whose connections are shared by
+the executor threads.
+"""
+
+import asyncio
+import functools
+import weakref
+
+from pydata_google_auth import auth
+from pydata_google_auth import cache
+from pydata_google_auth import _refresher
+from pydata_google_auth import _transport
+
+
+# Per event loop: in-flight executor calls by key, and refresh locks by
+# credentials. asyncio primitives belong to one loop.
+_inflight = weakref.WeakKeyDictionary()
+_refresh_locks = weakref.WeakKeyDictionary()
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+async def _run_shared(key, func, *args, **kwargs):
+    """
+    Run ``func`` in the default executor, sharing the call with any other
+    task that asks for the same ``key`` while it runs.
+    """
+    loop = asyncio.get_running_loop()
+    inflight = _inflight.setdefault(loop, {})
+    future = inflight.get(key)
+    if future is None:
+        future = loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+        inflight[key] = future
+        future.add_done_callback(lambda _: inflight.pop(key, None))
+    # A cancelled waiter must not cancel the call for the others.
+    return await asyncio.shield(future)
+
+
+async def refresh(credentials):
+    """
+    Refresh ``credentials`` if their token isn't valid.
+
+    Tasks that call this for the same credentials while a refresh is running
+    wait for it instead of refreshing again.
+
+    Parameters
+    ----------
+    credentials : google.auth.credentials.Credentials
+        Credentials to refresh in place.
+
+    Returns
+    -------
+    google.auth.credentials.Credentials
+        The same ``credentials``, with a valid token.
+
+    Raises
+    ------
+    google.auth.exceptions.RefreshError
+        If the credentials could not be refreshed.
+    """
+    if credentials.valid:
+        return credentials
+
+    loop = asyncio.get_running_loop()
+    locks = _refresh_locks.setdefault(loop, weakref.WeakKeyDictionary())
+    lock = locks.get(credentials)
+    if lock is None:
+        lock = locks[credentials] = asyncio.Lock()
+
+    async with lock:
+        # Another task may have refreshed the credentials while we waited.
+        if not credentials.valid:
+            await loop.run_in_executor(
+                None, credentials.refresh, _transport.get_request()
+            )
+    return credentials
+
+
+async def default(
+    scopes,
+    client_id=None,
+    client_secret=None,
+    credentials_cache=cache.READ_WRITE,
+    use_local_webserver=True,
+    auth_local_webserver=None,
+    redirect_uri=None,
+):
+    """
+    Get credentials and default project for accessing Google APIs.
+
+    Asyncio version of :func:`pydata_google_auth.default`, which describes
+    the parameters.
+
+    Returns
+    -------
+    credentials, project_id : tuple[google.auth.credentials.Credentials, str or None]
+    """
+    if auth_local_webserver is not None:
+        use_local_webserver = auth_local_webserver
+
+    key = auth._memo_key(
+        "default",
+        scopes,
+        client_id,
+        use_local_webserver,
+        redirect_uri,
+        credentials_cache,
+    )
+    if auth._is_memoizable(credentials_cache):
+        entry = auth._MEMO.get(key)
+        if entry is not None:
+            return entry
+
+    return await _run_shared(
+        key,
+        auth.default,
+        scopes,
+        client_id=client_id,
+        client_secret=client_secret,
+        credentials_cache=credentials_cache,
+        use_local_webserver=use_local_webserver,
+        redirect_uri=redirect_uri,
+    )
+
+
+async def get_user_credentials(
+    scopes,
+    client_id=None,
+    client_secret=None,
+    credentials_cache=cache.READ_WRITE,
+    use_local_webserver=True,
+    auth_local_webserver=None,
+    redirect_uri=None,
+    background_refresh=False,
+):
+    """
+    Gets user account credentials.
+
+    Asyncio version of :func:`pydata_google_auth.get_user_credentials`,
+    which describes the parameters. If an OAuth flow is needed, it runs in
+    the executor.
+
+    Returns
+    -------
+    credentials : google.oauth2.credentials.Credentials
+    """
+    if auth_local_webserver is not None:
+        use_local_webserver = auth_local_webserver
+
+    key = auth._memo_key(
+        "user",
+        scopes,
+        client_id,
+        use_local_webserver,
+        redirect_uri,
+        credentials_cache,
+    )
+    if auth._is_memoizable(credentials_cache):
+        entry = auth._MEMO.get(key)
+        if entry is not None:
+            credentials, source_cache = entry
+            if background_refresh:
+                _refresher.start_background_refresh(
+                    credentials, credentials_cache=source_cache
+                )
+            return credentials
+
+    return await _run_shared(
+        key + (background_refresh,),
+        auth.get_user_credentials,
+        scopes,
+        client_id=client_id,
+        client_secret=client_secret,
+        credentials_cache=credentials_cache,
+        use_local_webserver=use_local_webserver,
+        redirect_uri=redirect_uri,
+        background_refresh=background_refresh,
+    )
+
+
+async def load_user_credentials(path, lazy=False):
+    """
+    Gets user account credentials from JSON file at ``path``.
+
+    Asyncio version of :func:`pydata_google_auth.load_user_credentials`,
+    which describes the parameters. Tasks loading the same file at the same
+    time get the same credentials object.
+
+    Returns
+    -------
+    google.auth.credentials.Credentials
+    """
+    return await _run_shared(
+        ("load_user_credentials", path, lazy),
+        auth.load_user_credentials,
+        path,
+        lazy=lazy,
+    )
+
+
+async def load_service_account_credentials(
+    path, scopes=None, background_refresh=False, lazy=False, use_jwt_access=False
+):
+    """
+    Gets service account credentials from JSON file at ``path``.
+
+    Asyncio version of
+    :func:`pydata_google_auth.load_service_account_credentials`, which
+    describes the parameters. Tasks loading the same file at the same time
+    get the same credentials object.
+
+    Returns
+    -------
+    google.oauth2.service_account.Credentials
+    """
+    kwargs = dict(
+        scopes=scopes,
+        background_refresh=background_refresh,
+        lazy=lazy,
+        use_jwt_access=use_jwt_access,
+    )
+    return await _run_shared(
+        ("load_service_account_credentials", path, _freeze(kwargs)),
+        auth.load_service_account_credentials,
+        path,
+        **kwargs
+    )
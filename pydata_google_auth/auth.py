@@ -5,12 +5,14 @@ import logging
 import google.auth
 import google.auth.exceptions
 import google.oauth2.credentials
-from google_auth_oauthlib import flow
-import oauthlib.oauth2.rfc6749.errors
-import google.auth.transport.requests
 
 from pydata_google_auth import exceptions
 from pydata_google_auth import cache
+from pydata_google_auth import _adc
+from pydata_google_auth import _memo
+from pydata_google_auth import _refresher
+from pydata_google_auth import _retry
+from pydata_google_auth import _transport
 from pydata_google_auth import _webserver
 
 
@@ -38,6 +40,73 @@ AUTH_URI_KWARGS = {
     "prompt": "consent",
 }
 
+_MEMO = _memo.CredentialsMemo()
+
+# Whether google.colab can be imported doesn't change during a process, so
+# it's only tried once.
+_COLAB_UNKNOWN = object()
+_colab_auth = _COLAB_UNKNOWN
+# Colab authentication lasts for the life of the runtime. Remember that it
+# succeeded, and the credentials it gave for each set of scopes.
+_colab_authenticated = False
+_colab_credentials = {}
+
+
+def _memo_key(
+    kind, scopes, client_id, use_local_webserver, redirect_uri, credentials_cache
+):
+    return (
+        kind,
+        cache._normalize_scopes(scopes),
+        client_id,
+        use_local_webserver,
+        redirect_uri,
+        credentials_cache,
+    )
+
+
+def _is_memoizable(credentials_cache):
+    # Caches that never read credentials, such as NOOP and REAUTH, are used to
+    # force a new OAuth flow. Don't short-circuit that with a memoized result.
+    return getattr(type(credentials_cache), "load", None) is not (
+        cache.CredentialsCache.load
+    )
+
+
+def _forget_memoized(credentials):
+    # A call with a cache that isn't memoized, such as REAUTH, may have
+    # switched accounts and saved the new account's credentials where
+    # memoized caches read them. Don't keep returning the old account's.
+    if credentials is not None:
+        _MEMO.clear()
+
+
+def _load_from_cache(credentials_cache, scopes, client_id):
+    # Caches that don't derive from CredentialsCache may only implement load().
+    if getattr(type(credentials_cache), "load_for", None) is None:
+        return credentials_cache.load()
+    return credentials_cache.load_for(scopes=scopes, client_id=client_id)
+
+
+def clear_credentials_memo():
+    """
+    Forget credentials remembered by :func:`default` and
+    :func:`get_user_credentials`.
+
+    Within a process, these functions return the same credentials object for
+    the same scopes, client ID, redirect mode, and credentials cache for as
+    long as the credentials are valid. Call this function to force the next
+    call to look up credentials again, for example after revoking a token.
+    Getting credentials with a cache that doesn't read credentials, such as
+    :data:`~pydata_google_auth.cache.REAUTH`, also clears the memo, so that
+    switching accounts takes effect.
+    """
+    global _colab_authenticated
+
+    _MEMO.clear()
+    _colab_authenticated = False
+    _colab_credentials.clear()
+
 
 def _run_webapp(flow, redirect_uri=None, **kwargs):
     if redirect_uri:
@@ -68,6 +137,8 @@ def default(
     use_local_webserver=True,
     auth_local_webserver=None,
     redirect_uri=None,
+    probe_timeout=_adc.DEFAULT_PROBE_TIMEOUT,
+    record_source=True,
 ):
     """
     Get credentials and default project for accessing Google APIs.
@@ -77,6 +148,10 @@ def default(
     credentials, it then attempts to get user account credentials via the
     :func:`pydata_google_auth.get_user_credentials` function.
 
+    Within a process, repeated calls with the same arguments return the same
+    credentials object while it is valid. Use
+    :func:`pydata_google_auth.clear_credentials_memo` to force a new lookup.
+
     Parameters
     ----------
     scopes : list[str]
@@ -123,6 +198,14 @@ def default(
         * an organization can not use an endpoint directly because of
           constraints on access to the internet (i.e. when running code on a
           remotely hosted device).
+    probe_timeout : float, optional
+        Seconds to wait for the GCE metadata server before assuming the
+        code isn't running on Google Cloud. Defaults to 0.5 seconds.
+    record_source : bool, optional
+        Record on disk where Application Default Credentials were found, or
+        that there were none, so that later processes skip the discovery.
+        See :func:`get_application_default_credentials`. Defaults to
+        ``True``.
 
     Returns
     -------
@@ -138,12 +221,55 @@ def default(
     ------
     pydata_google_auth.exceptions.PyDataCredentialsError
         If unable to get valid credentials.
+    pydata_google_auth.exceptions.PyDataConnectionError
+        If the token endpoint can't be reached. See
+        :func:`pydata_google_auth.set_refresh_retry`.
     """
     if auth_local_webserver is not None:
         use_local_webserver = auth_local_webserver
 
+    def create():
+        return _default(
+            scopes,
+            client_id=client_id,
+            client_secret=client_secret,
+            credentials_cache=credentials_cache,
+            use_local_webserver=use_local_webserver,
+            redirect_uri=redirect_uri,
+            probe_timeout=probe_timeout,
+            record_source=record_source,
+        )
+
+    if not _is_memoizable(credentials_cache):
+        credentials, project = create()
+        _forget_memoized(credentials)
+        return credentials, project
+
+    key = _memo_key(
+        "default",
+        scopes,
+        client_id,
+        use_local_webserver,
+        redirect_uri,
+        credentials_cache,
+    )
+    return _MEMO.get_or_create(key, create)
+
+
+def _default(
+    scopes,
+    client_id,
+    client_secret,
+    credentials_cache,
+    use_local_webserver,
+    redirect_uri,
+    probe_timeout=_adc.DEFAULT_PROBE_TIMEOUT,
+    record_source=True,
+):
     # Try to retrieve Application Default Credentials
-    credentials, default_project = get_application_default_credentials(scopes)
+    credentials, default_project = get_application_default_credentials(
+        scopes, probe_timeout=probe_timeout, record_source=record_source
+    )
 
     if credentials and credentials.valid:
         return credentials, default_project
@@ -178,23 +304,64 @@ def try_colab_auth_import():
         return None
 
 
+def _get_colab_auth():
+    global _colab_auth
+
+    if _colab_auth is _COLAB_UNKNOWN:
+        _colab_auth = try_colab_auth_import()
+    return _colab_auth
+
+
+def _get_remembered_colab_credentials(key):
+    global _colab_authenticated
+
+    entry = _colab_credentials.get(key)
+    if entry is None:
+        return None
+
+    credentials, _ = entry
+    if not credentials.valid:
+        try:
+            _retry.refresh(credentials)
+        except google.auth.exceptions.GoogleAuthError as exc:
+            # The runtime's authentication may have been revoked.
+            logger.debug("Error refreshing Colab credentials: {}".format(exc))
+            _colab_credentials.pop(key, None)
+            _colab_authenticated = False
+            return None
+    return entry
+
+
 def get_colab_default_credentials(scopes):
     """This is a special handling for google colab environment where we want to
     use the colab specific authentication flow.
 
+    Whether the process runs in Colab is only checked once. After Colab
+    authentication succeeds, the credentials for each set of scopes are
+    remembered until :func:`clear_credentials_memo` is called.
+
     See:
     https://github.com/googlecolab/colabtools/blob/3c8772efd332289e1c6d1204826b0915d22b5b95/google/colab/auth.py#L209
     """
-    auth = try_colab_auth_import()
+    global _colab_authenticated
+
+    auth = _get_colab_auth()
     if auth is None:
         return None, None
 
+    key = cache._normalize_scopes(scopes)
+    entry = _get_remembered_colab_credentials(key)
+    if entry is not None:
+        return entry
+
     try:
-        auth.authenticate_user()
+        if not _colab_authenticated:
+            auth.authenticate_user()
+            _colab_authenticated = True
 
         # authenticate_user() sets the default credentials, but we
         # still need to get the token from those default credentials.
-        return get_application_default_credentials(scopes=scopes)
+        credentials, project = get_application_default_credentials(scopes=scopes)
     except Exception:
         # We are catching a broad exception class here because we want to be
         # agnostic to anything that could internally go wrong in the google
@@ -206,15 +373,35 @@ def get_colab_default_credentials(scopes):
         # from the Compute Engine Metadata server.
         return None, None
 
+    if credentials is not None:
+        _colab_credentials[key] = (credentials, project)
+    return credentials, project
+
 
-def get_application_default_credentials(scopes):
+def get_application_default_credentials(
+    scopes, probe_timeout=_adc.DEFAULT_PROBE_TIMEOUT, record_source=True
+):
     """
     This method tries to retrieve the "default application credentials".
     This could be useful for running code on Google Cloud Platform.
 
+    The source of the credentials (environment variable, gcloud, or the GCE
+    metadata server) is recorded on disk. If a previous process found no
+    credentials in the same environment in the last few minutes, this
+    method returns immediately. Finding no credentials isn't recorded when
+    the metadata server ping timed out, since the metadata server can be
+    slow to answer while a VM or pod starts.
+
     Parameters
     ----------
-    project_id (str, optional): Override the default project ID.
+    scopes : list[str]
+        A list of scopes to use when authenticating to Google APIs.
+    probe_timeout : float, optional
+        Seconds to wait for the GCE metadata server before assuming the
+        code isn't running on Google Cloud. Defaults to 0.5 seconds.
+    record_source : bool, optional
+        Read and write the record of where credentials were found. Set to
+        ``False`` to always discover them. Defaults to ``True``.
 
     Returns
     -------
@@ -228,15 +415,16 @@ def get_application_default_credentials(scopes):
         have access to the project (project_id) on BigQuery.
     """
     try:
-        credentials, project = google.auth.default(scopes=scopes)
+        credentials, project = _adc.find_default_credentials(
+            scopes, probe_timeout=probe_timeout, record_source=record_source
+        )
     except (google.auth.exceptions.DefaultCredentialsError, IOError) as exc:
         logger.debug("Error getting default credentials: {}".format(str(exc)))
         return None, None
 
     if credentials and not credentials.valid:
-        request = google.auth.transport.requests.Request()
         try:
-            credentials.refresh(request)
+            _retry.refresh(credentials)
         except google.auth.exceptions.RefreshError:
             # Sometimes (such as on Travis) google-auth returns GCE
             # credentials, but fetching the token for those credentials doesn't
@@ -255,6 +443,7 @@ def get_user_credentials(
     use_local_webserver=True,
     auth_local_webserver=None,
     redirect_uri=None,
+    background_refresh=False,
 ):
     """
     Gets user account credentials.
@@ -273,6 +462,12 @@ def get_user_credentials(
     ``PyData Google Auth``. The permissions it requests correspond to the
     scopes you've provided.
 
+    Within a process, repeated calls with the same arguments return the same
+    credentials object while it is valid. Use
+    :func:`pydata_google_auth.clear_credentials_memo` to force a new lookup.
+    Caches which don't read credentials, such as
+    :data:`~pydata_google_auth.cache.REAUTH`, always start a new lookup.
+
     Additional information on the user credentials authentication mechanism
     can be found `here
     <https://developers.google.com/identity/protocols/OAuth2#clientside/>`__.
@@ -306,7 +501,11 @@ def get_user_credentials(
         By default, pydata-google-auth reads and writes credentials in
         ``$HOME/.config/pydata/pydata_google_credentials.json`` or
         ``$APPDATA/.config/pydata/pydata_google_credentials.json`` on
-        Windows.
+        Windows. To keep credentials for several sets of scopes or client
+        IDs, use
+        :class:`~pydata_google_auth.cache.MultiProfileCredentialsCache`.
+        It also serves a request for a subset of previously authorized scopes
+        without asking for consent again.
     use_local_webserver : bool, optional
         Use a local webserver for the user authentication
         :class:`google_auth_oauthlib.flow.InstalledAppFlow`. Binds a
@@ -323,6 +522,13 @@ def get_user_credentials(
         * an organization can not use an endpoint directly because of
           constraints on access to the internet (i.e. when running code on a
           remotely hosted device).
+    background_refresh : bool, optional
+        Start a daemon thread that refreshes the credentials ahead of their
+        expiry and writes each new token back through ``credentials_cache``.
+        Use this in long-running services to keep token refreshes out of the
+        request path. See
+        :func:`pydata_google_auth.start_background_refresh` to configure
+        when the refresh happens.
 
     Returns
     -------
@@ -333,8 +539,56 @@ def get_user_credentials(
     ------
     pydata_google_auth.exceptions.PyDataCredentialsError
         If unable to get valid user credentials.
+    pydata_google_auth.exceptions.PyDataConnectionError
+        If the token endpoint can't be reached. See
+        :func:`pydata_google_auth.set_refresh_retry`.
     """
+    if auth_local_webserver is not None:
+        use_local_webserver = auth_local_webserver
 
+    def create():
+        return _get_user_credentials(
+            scopes,
+            client_id=client_id,
+            client_secret=client_secret,
+            credentials_cache=credentials_cache,
+            use_local_webserver=use_local_webserver,
+            redirect_uri=redirect_uri,
+        )
+
+    if _is_memoizable(credentials_cache):
+        key = _memo_key(
+            "user",
+            scopes,
+            client_id,
+            use_local_webserver,
+            redirect_uri,
+            credentials_cache,
+        )
+        credentials, source_cache = _MEMO.get_or_create(key, create)
+    else:
+        credentials, source_cache = create()
+        _forget_memoized(credentials)
+
+    if background_refresh and credentials is not None:
+        _refresher.start_background_refresh(credentials, credentials_cache=source_cache)
+    return credentials
+
+
+def _get_user_credentials(
+    scopes,
+    client_id,
+    client_secret,
+    credentials_cache,
+    use_local_webserver,
+    redirect_uri,
+):
+    """
+    Get user credentials, ignoring the memo.
+
+    Returns a ``(credentials, credentials_cache)`` pair. The cache is ``None``
+    if the credentials must not be written to it, such as Colab credentials.
+    """
     # Try to authenticate the user with Colab-based credentials, if possible.
     # The default_project ignored for colab credentials. It's not usually set,
     # anyway.
@@ -346,10 +600,7 @@ def get_user_credentials(
     if credentials:
         # Make sure to exit early since we don't want to try to save these
         # credentials to a cache file.
-        return credentials
-
-    if auth_local_webserver is not None:
-        use_local_webserver = auth_local_webserver
+        return credentials, None
 
     # Use None as default for client_id and client_secret so that the values
     # aren't included in the docs. A string of bytes isn't useful for the
@@ -376,7 +627,7 @@ def get_user_credentials(
 valid client_id and/or client_secret."""
             )
 
-    credentials = credentials_cache.load()
+    credentials = _load_from_cache(credentials_cache, scopes, client_id)
 
     client_config = {
         "installed": {
@@ -389,13 +640,20 @@ valid client_id and/or client_secret."""
     }
 
     if credentials is None:
+        # Imported here because the OAuth flow libraries are slow to import,
+        # and most processes only ever load cached credentials.
+        from google_auth_oauthlib import flow
+        import oauthlib.oauth2.rfc6749.errors
+
         app_flow = flow.InstalledAppFlow.from_client_config(
             client_config, scopes=scopes
         )
 
         try:
             if use_local_webserver:
-                credentials = _webserver.run_local_server(app_flow, **AUTH_URI_KWARGS)
+                credentials = _webserver.run_local_server(
+                    app_flow, bind_once=True, **AUTH_URI_KWARGS
+                )
             else:
                 credentials = _run_webapp(
                     app_flow, redirect_uri=redirect_uri, **AUTH_URI_KWARGS
@@ -409,10 +667,11 @@ valid client_id and/or client_secret."""
         credentials_cache.save(credentials)
 
     if credentials and not credentials.valid:
-        request = google.auth.transport.requests.Request()
-        credentials.refresh(request)
+        _retry.refresh(credentials)
+        # Share the new access token with other processes using this cache.
+        credentials_cache.save(credentials)
 
-    return credentials
+    return credentials, credentials_cache
 
 
 def save_user_credentials(
@@ -498,7 +757,7 @@ def save_user_credentials(
     cache._save_user_account_credentials(credentials, path)
 
 
-def load_user_credentials(path):
+def load_user_credentials(path, lazy=False):
     """
     Gets user account credentials from JSON file at ``path``.
 
@@ -517,6 +776,13 @@ def load_user_credentials(path):
     ----------
     path : str
         Path to credentials JSON file.
+    lazy : bool, optional
+        Don't refresh the credentials while loading them. They refresh the
+        first time they authorize a request or their ``token`` is read
+        instead, and ``valid`` is ``False`` until then. No network request
+        is made for credentials that are never used. Errors refreshing the
+        credentials are raised at first use as
+        :class:`google.auth.exceptions.RefreshError`.
 
     Returns
     -------
@@ -527,6 +793,9 @@ def load_user_credentials(path):
     ------
     pydata_google_auth.exceptions.PyDataCredentialsError
         If unable to load user credentials.
+    pydata_google_auth.exceptions.PyDataConnectionError
+        If the token endpoint can't be reached. See
+        :func:`pydata_google_auth.set_refresh_retry`.
 
     Examples
     --------
@@ -546,13 +815,15 @@ def load_user_credentials(path):
            project="my-project-id"
        )
     """
-    credentials = cache._load_user_credentials_from_file(path)
+    credentials = cache._load_user_credentials_from_file(path, lazy=lazy)
     if not credentials:
         raise exceptions.PyDataCredentialsError("Could not load credentials.")
     return credentials
 
 
-def load_service_account_credentials(path, scopes=None):
+def load_service_account_credentials(
+    path, scopes=None, background_refresh=False, lazy=False, use_jwt_access=False
+):
     """
     Gets service account credentials from JSON file at ``path``.
 
@@ -564,6 +835,18 @@ def load_service_account_credentials(path, scopes=None):
         A list of scopes to use when authenticating to Google APIs. See the
         `list of OAuth 2.0 scopes for Google APIs
         <https://developers.google.com/identity/protocols/googlescopes>`_.
+    background_refresh : bool, optional
+        Start a daemon thread that refreshes the credentials ahead of their
+        expiry. See :func:`pydata_google_auth.start_background_refresh`.
+    lazy : bool, optional
+        Don't refresh the credentials while loading them. They refresh the
+        first time they authorize a request or their ``token`` is read
+        instead. See :func:`load_user_credentials`.
+    use_jwt_access : bool, optional
+        Sign access tokens locally as self-signed JWTs, instead of getting
+        them from the OAuth 2.0 token endpoint. This skips a network round
+        trip for each token. Requires ``scopes``. Most Google APIs accept
+        self-signed JWTs, but some older APIs don't.
 
     Returns
     -------
@@ -574,6 +857,11 @@ def load_service_account_credentials(path, scopes=None):
     ------
     pydata_google_auth.exceptions.PyDataCredentialsError
         If unable to load service credentials.
+    pydata_google_auth.exceptions.PyDataConnectionError
+        If the token endpoint can't be reached. See
+        :func:`pydata_google_auth.set_refresh_retry`.
+    ValueError
+        If ``use_jwt_access`` is set without ``scopes``.
 
     Examples
     --------
@@ -594,7 +882,124 @@ def load_service_account_credentials(path, scopes=None):
        )
     """
 
-    credentials = cache._load_service_account_credentials_from_file(path, scopes=scopes)
+    if use_jwt_access and not scopes:
+        # Self-signed JWTs need scopes or an audience, and only the client
+        # library knows the audience.
+        raise ValueError("use_jwt_access requires scopes.")
+
+    credentials = cache._load_service_account_credentials_from_file(
+        path, lazy=lazy, use_jwt_access=use_jwt_access, scopes=scopes
+    )
+    if not credentials:
+        raise exceptions.PyDataCredentialsError("Could not load credentials.")
+    if background_refresh:
+        _refresher.start_background_refresh(credentials)
+    return credentials
+
+
+def _load_credentials_file(path, scopes, lazy, use_jwt_access):
+    credentials_json = cache._load_credentials_json_from_file(path)
+    if credentials_json is None:
+        raise exceptions.PyDataCredentialsError("Could not read credentials file.")
+    # Files saved before the "type" field was added hold user credentials.
+    if credentials_json.get("type") == "service_account":
+        return load_service_account_credentials(
+            path, scopes=scopes, lazy=lazy, use_jwt_access=use_jwt_access
+        )
+
+    credentials = cache._load_user_credentials_from_info(credentials_json, lazy=lazy)
     if not credentials:
         raise exceptions.PyDataCredentialsError("Could not load credentials.")
     return credentials
+
+
+def load_credentials_files(
+    paths, scopes=None, max_workers=None, lazy=False, use_jwt_access=False
+):
+    """
+    Gets credentials from many JSON files at once.
+
+    Files are loaded and refreshed concurrently on a pool of threads, so the
+    time to load hundreds of files is bounded by the token endpoint's
+    latency rather than the number of files. User credentials files and
+    service account key files can be mixed, and are told apart by their
+    ``type`` field.
+
+    Parameters
+    ----------
+    paths : Iterable[str]
+        Paths to credentials JSON files.
+    scopes : list[str], optional
+        Scopes for the service account credentials. See
+        :func:`load_service_account_credentials`. User credentials keep the
+        scopes they were granted.
+    max_workers : int, optional
+        Number of files to load at the same time. Defaults to the number of
+        connections kept alive by the shared transport. See
+        :func:`pydata_google_auth.set_transport`.
+    lazy : bool, optional
+        Don't refresh the credentials while loading them. See
+        :func:`load_user_credentials`.
+    use_jwt_access : bool, optional
+        Sign access tokens for service accounts locally. See
+        :func:`load_service_account_credentials`.
+
+    Returns
+    -------
+    credentials, errors : tuple[dict, dict]
+        The credentials loaded from each path, and the exception raised
+        for each path that couldn't be loaded. Every path is a key of
+        exactly one of the dictionaries.
+
+    Raises
+    ------
+    ValueError
+        If ``use_jwt_access`` is set without ``scopes``.
+
+    Examples
+    --------
+
+    Check that every key file in a directory can get an access token.
+
+    .. code-block:: python
+
+       import glob
+       import pydata_google_auth
+
+       credentials, errors = pydata_google_auth.load_credentials_files(
+           glob.glob("/home/username/keys/*.json"),
+           scopes=["https://www.googleapis.com/auth/cloud-platform"],
+       )
+       for path, error in errors.items():
+           print("{}: {}".format(path, error))
+    """
+    # Imported here because only bulk loads need a thread pool.
+    import concurrent.futures
+
+    if use_jwt_access and not scopes:
+        raise ValueError("use_jwt_access requires scopes.")
+
+    # Keep the caller's order, and load each file once.
+    paths = list(dict.fromkeys(paths))
+    if max_workers is None:
+        max_workers = _transport.DEFAULT_POOL_SIZE
+
+    loaded = {}
+    errors = {}
+    if not paths:
+        return loaded, errors
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(max_workers, len(paths))
+    ) as executor:
+        futures = [
+            executor.submit(_load_credentials_file, path, scopes, lazy, use_jwt_access)
+            for path in paths
+        ]
+        for path, future in zip(paths, futures):
+            try:
+                loaded[path] = future.result()
+            except Exception as exc:
+                logger.debug("Error loading credentials from {}: {}".format(path, exc))
+                errors[path] = exc
+    return loaded, errors
@@ -1,21 +1,94 @@
 """Caching implementations for reading and writing user credentials."""
 
+import contextlib
+import datetime
 import errno
+import hashlib
 import json
 import logging
 import os
 import os.path
+import tempfile
+import threading
+import time
+import weakref
 
+import google.auth.exceptions
 import google.oauth2.credentials
-from google.oauth2 import service_account
+
+from pydata_google_auth import exceptions
+from pydata_google_auth import _config
+from pydata_google_auth import _retry
+from pydata_google_auth import _signers
+
+try:
+    import fcntl
+except ImportError:  # pragma: NO COVER
+    # Advisory file locks are not available on Windows. Writes are still
+    # atomic, so readers never see a partially written file.
+    fcntl = None
 
 
 logger = logging.getLogger(__name__)
 
 
-_DIRNAME = "pydata"
+_DIRNAME = _config.DIRNAME
 _FILENAME = "pydata_google_credentials.json"
 
+# Same timestamp format google-auth uses when serializing authorized user
+# credentials, so that the cache file stays readable as Application Default
+# Credentials.
+_EXPIRY_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+# How long to wait for another process to finish refreshing the credentials
+# before refreshing them ourselves.
+_REFRESH_TIMEOUT = 30.0
+_LOCK_POLL_INTERVAL = 0.05
+
+_PROFILES_DIRNAME = "profiles"
+_PROFILES_INDEX_FILENAME = "index.json"
+_MAX_PROFILES = 16
+_SQLITE_FILENAME = "pydata_google_credentials.sqlite3"
+# Seconds a connection waits for another process's write transaction.
+_SQLITE_BUSY_TIMEOUT = 30.0
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS credentials (
+    scopes TEXT NOT NULL,
+    client_id TEXT NOT NULL,
+    account TEXT NOT NULL,
+    access_token TEXT,
+    expiry TEXT,
+    refresh_token TEXT,
+    id_token TEXT,
+    token_uri TEXT,
+    client_secret TEXT,
+    last_used REAL NOT NULL,
+    refresh_claimed_until REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (scopes, client_id, account)
+);
+CREATE INDEX IF NOT EXISTS credentials_last_used ON credentials (last_used);
+"""
+_SQLITE_COLUMNS = (
+    "rowid",
+    "scopes",
+    "client_id",
+    "account",
+    "access_token",
+    "expiry",
+    "refresh_token",
+    "id_token",
+    "token_uri",
+    "client_secret",
+    "refresh_claimed_until",
+)
+
+# Record when a profile was used at most this often, in seconds, so that
+# loading credentials doesn't rewrite the index every time.
+_PROFILE_LAST_USED_RESOLUTION = 60.0
+
+# Signers parsed from service account key files, shared by all loads.
+_SERVICE_ACCOUNT_SIGNERS = _signers.SignerCache()
+
 
 def _get_default_credentials_path(credentials_dirname, credentials_filename):
     """
@@ -26,20 +99,164 @@ def _get_default_credentials_path(credentials_dirname, credentials_filename):
     str
         Path to the Google user credentials
     """
-    config_path = None
+    return _config.get_default_path(credentials_dirname, credentials_filename)
+
+
+def _normalize_scopes(scopes):
+    """
+    Convert ``scopes`` to a hashable form that ignores order and duplicates.
 
-    if os.name == "nt":
-        config_path = os.getenv("APPDATA")
-    if not config_path:
-        config_path = os.path.join(os.path.expanduser("~"), ".config")
+    A string is treated as a space-separated list of scopes, as in OAuth
+    requests.
+    """
+    if not scopes:
+        return ()
+    if isinstance(scopes, str):
+        scopes = scopes.split()
+    return tuple(sorted(set(scope.strip() for scope in scopes if scope.strip())))
+
+
+def _scopes_cover(granted, requested):
+    """
+    Whether credentials granted ``granted`` scopes can be narrowed to
+    ``requested``.
+
+    Scopes are compared literally. A broad scope such as ``cloud-platform``
+    does not cover the narrower scopes it implies, because the token
+    endpoint only narrows to scopes that were granted.
+    """
+    return set(_normalize_scopes(requested)) <= set(_normalize_scopes(granted))
 
-    config_path = os.path.join(config_path, credentials_dirname)
-    return os.path.join(config_path, credentials_filename)
 
+def _format_expiry(expiry):
+    if expiry is None:
+        return None
+    return expiry.strftime(_EXPIRY_FORMAT) + "Z"
+
+
+def _parse_expiry(expiry):
+    try:
+        return datetime.datetime.strptime(
+            expiry.rstrip("Z").split(".")[0], _EXPIRY_FORMAT
+        )
+    except (AttributeError, ValueError):
+        return None
+
+
+def _get_account(credentials):
+    """
+    Get the account of user credentials, or ``""`` if it isn't known.
+    """
+    account = getattr(credentials, "account", None)
+    if account:
+        return account
+
+    id_token = getattr(credentials, "id_token", None)
+    if not id_token:
+        return ""
+    try:
+        import google.auth.jwt
+
+        claims = google.auth.jwt.decode(id_token, verify=False)
+    except (ValueError, google.auth.exceptions.GoogleAuthError):
+        return ""
+    return claims.get("email", "")
+
+
+def _profile_key(entry):
+    """
+    File name stem for the credentials with the given scopes, client and
+    account.
+    """
+    key_json = json.dumps(
+        [entry["scopes"], entry["client_id"], entry["account"]], sort_keys=True
+    )
+    return hashlib.sha256(key_json.encode("utf-8")).hexdigest()[:32]
+
+
+def _scopes_key(scopes):
+    """Normalized scopes as a string, for use as a database key."""
+    return " ".join(_normalize_scopes(scopes))
+
+
+def _user_credentials_from_row(row):
+    return _user_credentials_from_info(
+        {
+            "access_token": row["access_token"],
+            "expiry": row["expiry"],
+            "refresh_token": row["refresh_token"],
+            "id_token": row["id_token"],
+            "token_uri": row["token_uri"],
+            "client_id": row["client_id"] or None,
+            "client_secret": row["client_secret"],
+            "scopes": row["scopes"].split() or None,
+        }
+    )
+
+
+@contextlib.contextmanager
+def _lock_credentials_file(credentials_path, timeout=None):
+    """
+    Hold an exclusive advisory lock on a ``.lock`` file next to
+    ``credentials_path``.
 
-def _load_user_credentials_from_info(credentials_json):
-    credentials = google.oauth2.credentials.Credentials(
-        token=credentials_json.get("access_token"),
+    The lock coordinates processes sharing a credentials file. A separate lock
+    file is used because the credentials file itself is replaced on each
+    write. The lock is released by the operating system if the holder dies,
+    so a crashed process can't block the others.
+
+    Yields ``True`` if the lock was acquired, or ``False`` if it could not be
+    acquired within ``timeout`` seconds. Waits indefinitely if ``timeout`` is
+    ``None``.
+    """
+    if fcntl is None:  # pragma: NO COVER
+        yield True
+        return
+
+    try:
+        lock_file = open(credentials_path + ".lock", "a")
+    except IOError as exc:
+        # The directory may not exist yet or may not be writable. Locking is
+        # best-effort, so carry on without it.
+        logger.debug("Unable to lock credentials file: {}".format(str(exc)))
+        yield True
+        return
+
+    with lock_file:
+        if timeout is None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except (IOError, OSError) as exc:
+                    if exc.errno not in (errno.EAGAIN, errno.EACCES):
+                        raise
+                if time.monotonic() >= deadline:
+                    yield False
+                    return
+                time.sleep(_LOCK_POLL_INTERVAL)
+
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _user_credentials_from_info(credentials_json, credentials_class=None):
+    if credentials_class is None:
+        credentials_class = google.oauth2.credentials.Credentials
+
+    # Only trust a cached access token if we know when it expires. Otherwise
+    # google-auth would consider it valid forever.
+    expiry = _parse_expiry(credentials_json.get("expiry"))
+    token = credentials_json.get("access_token") if expiry else None
+
+    return credentials_class(
+        token=token,
+        expiry=expiry,
         refresh_token=credentials_json.get("refresh_token"),
         id_token=credentials_json.get("id_token"),
         token_uri=credentials_json.get("token_uri"),
@@ -48,24 +265,87 @@ def _load_user_credentials_from_info(credentials_json):
         scopes=credentials_json.get("scopes"),
     )
 
+
+def _refresh_user_credentials(credentials):
+    """
+    Refresh ``credentials``, or return ``None`` if the user needs to
+    reauthorize.
+
+    Transient errors are retried, and raise
+    :class:`~pydata_google_auth.exceptions.PyDataConnectionError` if they
+    persist, so that an outage of the token endpoint doesn't start an
+    interactive OAuth flow.
+    """
+    try:
+        _retry.refresh(credentials)
+    except google.auth.exceptions.RefreshError as exc:
+        # The refresh token was revoked or has expired (invalid_grant), or
+        # the credentials are unusable. Try to reauthorize.
+        logger.debug("Error refreshing credentials: {}".format(str(exc)))
+        return None
+    return credentials
+
+
+def _narrow_user_credentials(credentials, scopes):
+    """
+    Get an access token for ``scopes`` with the refresh token of
+    ``credentials``, which were granted a superset of ``scopes``.
+
+    Returns new credentials for just ``scopes``, or ``None`` if the refresh
+    fails.
+    """
+    narrowed = google.oauth2.credentials.Credentials(
+        token=None,
+        refresh_token=credentials.refresh_token,
+        id_token=credentials.id_token,
+        token_uri=credentials.token_uri,
+        client_id=credentials.client_id,
+        client_secret=credentials.client_secret,
+        scopes=list(_normalize_scopes(scopes)),
+    )
+    return _refresh_user_credentials(narrowed)
+
+
+def _load_user_credentials_from_info(credentials_json, lazy=False):
+    if lazy:
+        # Imported here because most callers refresh eagerly.
+        from pydata_google_auth import _lazy
+
+        credentials = _user_credentials_from_info(
+            credentials_json, credentials_class=_lazy.UserCredentials
+        )
+        return credentials.defer_refresh()
+
+    credentials = _user_credentials_from_info(credentials_json)
+
     if credentials and not credentials.valid:
-        request = google.auth.transport.requests.Request()
-        try:
-            credentials.refresh(request)
-        except google.auth.exceptions.RefreshError:
-            # Credentials could be expired or revoked. Try to reauthorize.
-            return None
+        return _refresh_user_credentials(credentials)
 
     return credentials
 
 
-def _load_user_credentials_from_file(credentials_path):
+def _load_credentials_json_from_file(credentials_path):
+    try:
+        with open(credentials_path) as credentials_file:
+            return json.load(credentials_file)
+    except (IOError, ValueError) as exc:
+        logger.debug(
+            "Error loading credentials from {}: {}".format(credentials_path, str(exc))
+        )
+        return None
+
+
+def _load_user_credentials_from_file(credentials_path, lazy=False):
     """
     Loads user account credentials from a local file.
 
     Parameters
     ----------
-    None
+    credentials_path : str
+        Path to the credentials file.
+    lazy : bool, optional
+        Don't refresh the credentials now. They refresh the first time their
+        access token is used instead.
 
     Returns
     -------
@@ -77,74 +357,220 @@ def _load_user_credentials_from_file(credentials_path):
         credentials do not have access to the project (project_id)
         on BigQuery.
     """
-    try:
-        with open(credentials_path) as credentials_file:
-            credentials_json = json.load(credentials_file)
-    except (IOError, ValueError) as exc:
-        logger.debug(
-            "Error loading credentials from {}: {}".format(credentials_path, str(exc))
-        )
+    credentials_json = _load_credentials_json_from_file(credentials_path)
+    if credentials_json is None:
         return None
 
-    return _load_user_credentials_from_info(credentials_json)
+    return _load_user_credentials_from_info(credentials_json, lazy=lazy)
+
+
+def _load_cached_user_credentials(credentials_path, refresh_timeout):
+    """
+    Load user credentials from a cache file shared between processes.
+
+    A cached access token is returned as-is while it is still valid.
+    Otherwise, one process refreshes the credentials and writes the new access
+    token back to the file.
+    """
+    # No lock is needed to read: writes replace the file atomically.
+    # Readers of a still-valid token must not wait behind a refresh.
+    credentials_json = _load_credentials_json_from_file(credentials_path)
+    if credentials_json is None:
+        return None
+
+    credentials = _user_credentials_from_info(credentials_json)
+    if credentials.valid:
+        return credentials
+
+    with _lock_credentials_file(credentials_path, timeout=refresh_timeout) as acquired:
+        if not acquired:
+            # The process holding the refresh lease is taking too long.
+            # Refresh without it, but leave the file to the lease holder.
+            logger.debug("Timed out waiting for credentials refresh lock.")
+            return _refresh_user_credentials(credentials)
+
+        # Another process may have refreshed the credentials while we were
+        # waiting for the lock.
+        credentials_json = _load_credentials_json_from_file(credentials_path)
+        if credentials_json is None:
+            return None
+
+        credentials = _user_credentials_from_info(credentials_json)
+        if credentials.valid:
+            return credentials
+
+        credentials = _refresh_user_credentials(credentials)
+        if credentials is not None:
+            # Save the new access token for use by other processes.
+            _save_user_account_credentials(credentials, credentials_path)
+        return credentials
 
 
 def _save_user_account_credentials(credentials, credentials_path):
     """
     Saves user account credentials to a local file.
+
+    The file is replaced atomically. Callers sharing the file between
+    processes should hold :func:`_lock_credentials_file` while saving.
+
+    Returns ``True`` if the file was written.
+    """
+
+    credentials_json = {
+        # Persist the access token so that new processes can use it without a
+        # round trip to the token endpoint.
+        "access_token": credentials.token,
+        "expiry": _format_expiry(credentials.expiry),
+        "refresh_token": credentials.refresh_token,
+        "id_token": credentials.id_token,
+        "token_uri": credentials.token_uri,
+        "client_id": credentials.client_id,
+        "client_secret": credentials.client_secret,
+        "scopes": credentials.scopes,
+        # Required for Application Default Credentials to detect the
+        # credentials type. See:
+        # https://github.com/pydata/pydata-google-auth/issues/22
+        "type": "authorized_user",
+    }
+
+    return _write_json_file(credentials_json, credentials_path)
+
+
+def _file_identity(path):
     """
+    Modification time, size and inode of ``path``, or ``None`` if it can't be
+    read.
 
+    Writes replace the file, so a rewrite within the resolution of the
+    modification time is still detected by its new inode.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def _write_json_file(data, path):
+    """
+    Write ``data`` as JSON to ``path``, replacing the file atomically.
+
+    Returns ``True`` if the file was written.
+    """
     # Create the direcory if it doesn't exist.
     # https://stackoverflow.com/a/12517490/101923
-    config_dir = os.path.dirname(credentials_path)
+    config_dir = os.path.dirname(path) or os.curdir
     if not os.path.exists(config_dir):
         try:
             os.makedirs(config_dir)
         except OSError as exc:  # Guard against race condition.
             if exc.errno != errno.EEXIST:
                 logger.warning("Unable to create credentials directory.")
-                return
+                return False
 
+    # Write to a temporary file and rename it over the destination, so that
+    # concurrent readers see either the old or the new file, never a
+    # truncated one.
     try:
-        with open(credentials_path, "w") as credentials_file:
-            credentials_json = {
-                "refresh_token": credentials.refresh_token,
-                "id_token": credentials.id_token,
-                "token_uri": credentials.token_uri,
-                "client_id": credentials.client_id,
-                "client_secret": credentials.client_secret,
-                "scopes": credentials.scopes,
-                # Required for Application Default Credentials to detect the
-                # credentials type. See:
-                # https://github.com/pydata/pydata-google-auth/issues/22
-                "type": "authorized_user",
-            }
-            json.dump(credentials_json, credentials_file)
-    except IOError:
+        fd, temp_path = tempfile.mkstemp(
+            dir=config_dir, prefix=".pydata_google_credentials", suffix=".tmp"
+        )
+    except (IOError, OSError):
         logger.warning("Unable to save credentials.")
+        return False
 
-
-def _load_service_account_credentials_from_file(credentials_path, **kwargs):
     try:
-        with open(credentials_path) as credentials_file:
-            credentials_json = json.load(credentials_file)
-    except (IOError, ValueError) as exc:
-        logger.debug(
-            "Error loading credentials from {}: {}".format(credentials_path, str(exc))
-        )
-        return None
+        with os.fdopen(fd, "w") as json_file:
+            json.dump(data, json_file)
+            json_file.flush()
+            os.fsync(json_file.fileno())
+        os.replace(temp_path, path)
+    except (IOError, OSError):
+        logger.warning("Unable to save credentials.")
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return False
+    return True
+
 
-    return _load_service_account_credentials_from_info(credentials_json, **kwargs)
+def _load_service_account_credentials_from_file(
+    credentials_path, lazy=False, use_jwt_access=False, **kwargs
+):
+    path = os.path.abspath(credentials_path)
+    # Check the file before reading it, as in ReadWriteCredentialsCache.
+    identity = _file_identity(path)
+    cached = _SERVICE_ACCOUNT_SIGNERS.get(path, identity=identity)
+    if cached is None:
+        try:
+            with open(path, "rb") as credentials_file:
+                content = credentials_file.read()
+            credentials_json = json.loads(content.decode("utf-8"))
+        except (IOError, ValueError) as exc:
+            logger.debug("Error loading credentials from {}: {}".format(path, str(exc)))
+            return None
+        digest = hashlib.sha256(content).hexdigest()
+        cached = _SERVICE_ACCOUNT_SIGNERS.get(path, identity=identity, digest=digest)
 
+    if cached is not None:
+        credentials_json, signer = cached
+    else:
+        signer = None
 
-def _load_service_account_credentials_from_info(credentials_json, **kwargs):
-    credentials = service_account.Credentials.from_service_account_info(
-        credentials_json, **kwargs
+    credentials = _load_service_account_credentials_from_info(
+        credentials_json,
+        lazy=lazy,
+        use_jwt_access=use_jwt_access,
+        signer=signer,
+        **kwargs
     )
+    signer = getattr(credentials, "signer", None)
+    if cached is None and signer is not None:
+        _SERVICE_ACCOUNT_SIGNERS.put(path, identity, digest, credentials_json, signer)
+    return credentials
+
+
+def _load_service_account_credentials_from_info(
+    credentials_json, lazy=False, use_jwt_access=False, signer=None, **kwargs
+):
+    """
+    Load service account credentials from the parsed key file.
+
+    Pass the ``signer`` already parsed from the same key to skip parsing the
+    private key again.
+    """
+    if use_jwt_access:
+        # Sign access tokens locally instead of exchanging a signed
+        # assertion at the token endpoint. google-auth keeps the signer and
+        # reuses each token until shortly before it expires.
+        kwargs["always_use_jwt_access"] = True
+
+    if lazy:
+        from pydata_google_auth import _lazy
+
+        credentials_class = _lazy.ServiceAccountCredentials
+    else:
+        # Imported here to avoid loading the RSA signing code unless needed.
+        from google.oauth2 import service_account
+
+        credentials_class = service_account.Credentials
+
+    if signer is None:
+        credentials = credentials_class.from_service_account_info(
+            credentials_json, **kwargs
+        )
+    else:
+        credentials = credentials_class._from_signer_and_info(
+            signer, credentials_json, **kwargs
+        )
+
+    if lazy:
+        return credentials.defer_refresh()
+
     if not credentials.valid:
-        request = google.auth.transport.requests.Request()
         try:
-            credentials.refresh(request)
+            _retry.refresh(credentials)
         except google.auth.exceptions.RefreshError as exc:
             # Credentials could be expired or revoked.
             logger.debug("Error refreshing credentials: {}".format(str(exc)))
@@ -174,6 +600,28 @@ class CredentialsCache(object):
         """
         pass
 
+    def load_for(self, scopes=None, client_id=None):
+        """
+        Load credentials for the given scopes and OAuth client.
+
+        Caches that hold a single set of credentials ignore the arguments.
+        This base class calls :meth:`load`.
+
+        Parameters
+        ----------
+        scopes : list[str], optional
+            Scopes the credentials were requested with.
+        client_id : str, optional
+            OAuth client ID the credentials were requested with.
+
+        Returns
+        -------
+        google.oauth2.credentials.Credentials, optional
+            Returns user account credentials loaded from disk or ``None`` if no
+            matching credentials could be found.
+        """
+        return self.load()
+
     def save(self, credentials):
         """
         Write credentials to disk.
@@ -201,23 +649,53 @@ class ReadWriteCredentialsCache(CredentialsCache):
         Windows) directory.
     filename : str, optional
         Name of the credentials file within the credentials directory.
+    refresh_timeout : float, optional
+        When the cached access token has expired, only one process sharing
+        the credentials file refreshes it. The others wait up to this many
+        seconds for the new token to be written before refreshing on their
+        own. Defaults to 30 seconds.
     """
 
-    def __init__(self, dirname=_DIRNAME, filename=_FILENAME):
+    def __init__(
+        self, dirname=_DIRNAME, filename=_FILENAME, refresh_timeout=_REFRESH_TIMEOUT
+    ):
         super(ReadWriteCredentialsCache, self).__init__()
         self._path = _get_default_credentials_path(dirname, filename)
+        self._refresh_timeout = refresh_timeout
+        # (file identity, credentials) from the last read or write. Replaced
+        # as a whole, so threads never see a mismatched pair.
+        self._memory = (None, None)
 
     def load(self):
         """
         Load credentials from disk.
 
+        A cached access token is returned as-is while it is still valid.
+        Otherwise, the credentials are refreshed and the new access token is
+        written back to disk.
+
+        The credentials are kept in memory. While the file is unchanged and
+        the access token is valid, loading only checks the file's metadata.
+
         Returns
         -------
         google.oauth2.credentials.Credentials, optional
             Returns user account credentials loaded from disk or ``None`` if no
             credentials could be found.
         """
-        return _load_user_credentials_from_file(self._path)
+        # Check the file before reading it. If it changes in between, the
+        # next load sees a different identity and reads it again.
+        identity = _file_identity(self._path)
+        if identity is None:
+            return None
+        remembered_identity, credentials = self._memory
+        if identity == remembered_identity and credentials.valid:
+            return credentials
+
+        credentials = _load_cached_user_credentials(self._path, self._refresh_timeout)
+        if credentials is not None:
+            self._memory = (identity, credentials)
+        return credentials
 
     def save(self, credentials):
         """
@@ -228,7 +706,10 @@ class ReadWriteCredentialsCache(CredentialsCache):
         credentials : google.oauth2.credentials.Credentials
             User credentials to save to disk.
         """
-        _save_user_account_credentials(credentials, self._path)
+        with _lock_credentials_file(self._path):
+            if _save_user_account_credentials(credentials, self._path):
+                # Other writers hold the lock, so the file is still ours.
+                self._memory = (_file_identity(self._path), credentials)
 
 
 class WriteOnlyCredentialsCache(CredentialsCache):
@@ -262,7 +743,651 @@ class WriteOnlyCredentialsCache(CredentialsCache):
         credentials : google.oauth2.credentials.Credentials
             User credentials to save to disk.
         """
-        _save_user_account_credentials(credentials, self._path)
+        with _lock_credentials_file(self._path):
+            _save_user_account_credentials(credentials, self._path)
+
+
+class BrokerCredentialsCache(CredentialsCache):
+    """
+    A :class:`~pydata_google_auth.cache.CredentialsCache` which gets access
+    tokens from a local token broker.
+
+    Start the broker with ``python -m pydata_google_auth serve``. Processes
+    using this cache never refresh tokens themselves, so many processes on
+    one machine share a single refresh stream.
+
+    Parameters
+    ----------
+    socket_path : str, optional
+        Path of the broker's Unix domain socket. Defaults to ``broker.sock``
+        in the pydata configuration directory.
+    timeout : float, optional
+        Seconds to wait for the broker to answer. Defaults to 5 seconds.
+    """
+
+    def __init__(self, socket_path=None, timeout=5.0):
+        super(BrokerCredentialsCache, self).__init__()
+        self._socket_path = socket_path
+        self._timeout = timeout
+
+    def load(self):
+        """
+        Get credentials from the token broker.
+
+        Returns
+        -------
+        google.auth.credentials.Credentials, optional
+            Returns credentials with the broker's current access token or
+            ``None`` if the broker's credentials were rejected, such as a
+            revoked refresh token.
+
+        Raises
+        ------
+        pydata_google_auth.exceptions.PyDataConnectionError
+            If the broker isn't running, or can't reach the token endpoint.
+            Many worker processes may share one broker, so they fail rather
+            than each start an interactive OAuth flow.
+        """
+        # Imported here because Unix domain sockets are not available on
+        # Windows.
+        from pydata_google_auth import _broker
+
+        credentials = _broker.BrokerCredentials(
+            socket_path=self._socket_path, timeout=self._timeout
+        )
+        try:
+            credentials.refresh(None)
+        except google.auth.exceptions.TransportError as exc:
+            raise exceptions.PyDataConnectionError(
+                "Could not get a token from the broker: {}".format(exc)
+            ) from exc
+        except google.auth.exceptions.RefreshError as exc:
+            logger.debug("Could not get a token from the broker: {}".format(exc))
+            return None
+        return credentials
+
+
+class MultiProfileCredentialsCache(CredentialsCache):
+    """
+    A :class:`~pydata_google_auth.cache.CredentialsCache` which keeps
+    credentials for several scope sets, OAuth clients and accounts.
+
+    Each set of credentials is written to its own file. A small index file
+    maps each key to its file, so a lookup reads the index and the one
+    matching file only. When there are more than ``max_entries`` sets of
+    credentials, the least recently used ones are removed.
+
+    Parameters
+    ----------
+    dirname : str, optional
+        Name of directory to write credentials to. This directory is created
+        within the ``.config`` subdirectory of the ``HOME`` (``APPDATA`` on
+        Windows) directory.
+    profiles_dirname : str, optional
+        Name of the subdirectory that holds the index and credentials files.
+    max_entries : int, optional
+        Maximum number of sets of credentials to keep. Defaults to 16.
+    account : str, optional
+        Only load credentials for this account, such as an email address.
+        Accounts are only known when the credentials include an ID token or
+        account name. By default, the most recently used matching
+        credentials are loaded.
+    refresh_timeout : float, optional
+        How long to wait for another process to refresh the same credentials
+        before refreshing them ourselves. Defaults to 30 seconds.
+    """
+
+    def __init__(
+        self,
+        dirname=_DIRNAME,
+        profiles_dirname=_PROFILES_DIRNAME,
+        max_entries=_MAX_PROFILES,
+        account=None,
+        refresh_timeout=_REFRESH_TIMEOUT,
+    ):
+        super(MultiProfileCredentialsCache, self).__init__()
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1.")
+        self._dir = _get_default_credentials_path(dirname, profiles_dirname)
+        self._index_path = os.path.join(self._dir, _PROFILES_INDEX_FILENAME)
+        self._max_entries = max_entries
+        self._account = account
+        self._refresh_timeout = refresh_timeout
+
+    def load(self):
+        """
+        Load the most recently used credentials.
+
+        Returns
+        -------
+        google.oauth2.credentials.Credentials, optional
+            Returns user account credentials loaded from disk or ``None`` if no
+            credentials could be found.
+        """
+        return self._load_matching(lambda entry: True)
+
+    def load_for(self, scopes=None, client_id=None):
+        """
+        Load credentials for the given scopes and OAuth client.
+
+        If there are no credentials for exactly these scopes, credentials
+        granted a superset of them are used to get an access token for just
+        these scopes, without asking the user for consent again. The new
+        token is saved under its own scopes.
+
+        Parameters
+        ----------
+        scopes : list[str], optional
+            Scopes the credentials were requested with.
+        client_id : str, optional
+            OAuth client ID the credentials were requested with. If not set,
+            credentials for any client match.
+
+        Returns
+        -------
+        google.oauth2.credentials.Credentials, optional
+            Returns user account credentials loaded from disk or ``None`` if no
+            matching credentials could be found.
+        """
+        scopes = list(_normalize_scopes(scopes))
+
+        def client_matches(entry):
+            return client_id is None or entry["client_id"] == client_id
+
+        credentials = self._load_matching(
+            lambda entry: entry["scopes"] == scopes and client_matches(entry)
+        )
+        if credentials is not None or not scopes:
+            return credentials
+        return self._load_narrowed(
+            scopes,
+            lambda entry: _scopes_cover(entry["scopes"], scopes)
+            and client_matches(entry),
+        )
+
+    def save(self, credentials):
+        """
+        Write credentials to disk, replacing any with the same key.
+
+        Parameters
+        ----------
+        credentials : google.oauth2.credentials.Credentials
+            User credentials to save to disk.
+        """
+        self._save(credentials, _get_account(credentials))
+
+    def _save(self, credentials, account):
+        entry = {
+            "scopes": list(_normalize_scopes(credentials.scopes)),
+            "client_id": credentials.client_id,
+            "account": account,
+        }
+        key = _profile_key(entry)
+        entry["last_used"] = time.time()
+
+        with _lock_credentials_file(self._index_path):
+            credentials_path = self._entry_path(key)
+            with _lock_credentials_file(credentials_path):
+                _save_user_account_credentials(credentials, credentials_path)
+
+            entries = self._read_index()
+            entries[key] = entry
+            evicted = sorted(entries, key=lambda k: entries[k]["last_used"])[
+                : max(len(entries) - self._max_entries, 0)
+            ]
+            for evicted_key in evicted:
+                del entries[evicted_key]
+            self._write_index(entries)
+
+        for evicted_key in evicted:
+            evicted_path = self._entry_path(evicted_key)
+            for path in (evicted_path, evicted_path + ".lock"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _entry_path(self, key):
+        return os.path.join(self._dir, key + ".json")
+
+    def _read_index(self):
+        index = _load_credentials_json_from_file(self._index_path)
+        if not isinstance(index, dict):
+            return {}
+        return index.get("entries", {})
+
+    def _write_index(self, entries):
+        _write_json_file({"entries": entries}, self._index_path)
+
+    def _find(self, matches):
+        """Key and entry of the most recently used matching credentials."""
+        # No lock is needed to read: the index is replaced atomically.
+        entries = self._read_index()
+        candidates = [
+            (entry["last_used"], key)
+            for key, entry in entries.items()
+            if matches(entry)
+            and (self._account is None or entry["account"] == self._account)
+        ]
+        if not candidates:
+            return None, None
+
+        _, key = max(candidates)
+        return key, entries[key]
+
+    def _load_matching(self, matches):
+        key, entry = self._find(matches)
+        if key is None:
+            return None
+
+        last_used = entry["last_used"]
+        credentials = _load_cached_user_credentials(
+            self._entry_path(key), self._refresh_timeout
+        )
+        if credentials is not None and (
+            time.time() - last_used > _PROFILE_LAST_USED_RESOLUTION
+        ):
+            self._touch(key)
+        return credentials
+
+    def _load_narrowed(self, scopes, matches):
+        key, entry = self._find(matches)
+        if key is None:
+            return None
+
+        # The stored access token is for the broader scopes, so only the
+        # refresh token is used.
+        credentials_json = _load_credentials_json_from_file(self._entry_path(key))
+        if credentials_json is None:
+            return None
+        narrowed = _narrow_user_credentials(
+            _user_credentials_from_info(credentials_json), scopes
+        )
+        if narrowed is not None:
+            # The refresh response may not include an ID token, so keep the
+            # account of the credentials the token came from.
+            self._save(narrowed, entry["account"])
+        return narrowed
+
+    def _touch(self, key):
+        with _lock_credentials_file(self._index_path):
+            entries = self._read_index()
+            if key in entries:
+                entries[key]["last_used"] = time.time()
+                self._write_index(entries)
+
+
+class SQLiteCredentialsCache(CredentialsCache):
+    """
+    A :class:`~pydata_google_auth.cache.CredentialsCache` backed by a SQLite
+    database, for many sets of credentials shared by many processes.
+
+    Credentials are keyed by normalized scopes, client ID and account, and
+    looked up by index. Refreshing a token updates only its row. The
+    database uses write-ahead logging, so readers don't wait for writers.
+
+    When an access token has expired, one process claims the refresh in a
+    transaction. Other processes wait up to ``refresh_timeout`` seconds for
+    the new token instead of refreshing it too.
+
+    Parameters
+    ----------
+    dirname : str, optional
+        Name of directory to write credentials to. This directory is created
+        within the ``.config`` subdirectory of the ``HOME`` (``APPDATA`` on
+        Windows) directory.
+    filename : str, optional
+        Name of the database file within the credentials directory.
+    account : str, optional
+        Only load credentials for this account, such as an email address.
+        By default, the most recently used matching credentials are loaded.
+    refresh_timeout : float, optional
+        How long to wait for another process to refresh the same credentials
+        before refreshing them ourselves. Defaults to 30 seconds.
+    """
+
+    def __init__(
+        self,
+        dirname=_DIRNAME,
+        filename=_SQLITE_FILENAME,
+        account=None,
+        refresh_timeout=_REFRESH_TIMEOUT,
+    ):
+        super(SQLiteCredentialsCache, self).__init__()
+        self._path = _get_default_credentials_path(dirname, filename)
+        self._account = account
+        self._refresh_timeout = refresh_timeout
+        # One connection per cache, used by one thread at a time. It
+        # belongs to the process that opened it.
+        self._connection = None
+        self._connection_pid = None
+        self._close_connection = None
+        self._connection_lock = threading.Lock()
+        _sqlite_caches.add(self)
+
+    def load(self):
+        """
+        Load the most recently used credentials.
+
+        Returns
+        -------
+        google.oauth2.credentials.Credentials, optional
+            Returns user account credentials loaded from disk or ``None`` if no
+            credentials could be found.
+        """
+        return self._load_matching(None, None)
+
+    def load_for(self, scopes=None, client_id=None):
+        """
+        Load credentials for the given scopes and OAuth client.
+
+        If there are no credentials for exactly these scopes, credentials
+        granted a superset of them are used to get an access token for just
+        these scopes, without asking the user for consent again. The new
+        token is saved under its own scopes.
+
+        Parameters
+        ----------
+        scopes : list[str], optional
+            Scopes the credentials were requested with.
+        client_id : str, optional
+            OAuth client ID the credentials were requested with. If not set,
+            credentials for any client match.
+
+        Returns
+        -------
+        google.oauth2.credentials.Credentials, optional
+            Returns user account credentials loaded from disk or ``None`` if no
+            matching credentials could be found.
+        """
+        return self._load_matching(_scopes_key(scopes), client_id, narrow=True)
+
+    def save(self, credentials):
+        """
+        Write credentials to disk, replacing any with the same key.
+
+        Parameters
+        ----------
+        credentials : google.oauth2.credentials.Credentials
+            User credentials to save to disk.
+        """
+        import sqlite3
+
+        with self._connection_lock:
+            connection = self._connect()
+            if connection is None:
+                return
+            try:
+                self._upsert(connection, credentials)
+            except sqlite3.Error as exc:
+                logger.warning("Unable to save credentials: {}".format(exc))
+
+    def _upsert(self, connection, credentials, account=None):
+        with connection:
+            connection.execute(
+                "INSERT INTO credentials ("
+                " scopes, client_id, account, access_token, expiry,"
+                " refresh_token, id_token, token_uri, client_secret, last_used,"
+                " refresh_claimed_until)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)"
+                " ON CONFLICT (scopes, client_id, account) DO UPDATE SET"
+                " access_token = excluded.access_token,"
+                " expiry = excluded.expiry,"
+                " refresh_token = excluded.refresh_token,"
+                " id_token = excluded.id_token,"
+                " token_uri = excluded.token_uri,"
+                " client_secret = excluded.client_secret,"
+                " last_used = excluded.last_used,"
+                " refresh_claimed_until = 0",
+                (
+                    _scopes_key(credentials.scopes),
+                    credentials.client_id or "",
+                    _get_account(credentials) if account is None else account,
+                    credentials.token,
+                    _format_expiry(credentials.expiry),
+                    credentials.refresh_token,
+                    credentials.id_token,
+                    credentials.token_uri,
+                    credentials.client_secret,
+                    time.time(),
+                ),
+            )
+
+    def _connect(self):
+        """
+        Get the connection, opening the database if needed. Call with
+        ``_connection_lock`` held.
+
+        Returns ``None`` if the database can't be opened.
+        """
+        if self._connection is not None:
+            if self._connection_pid == os.getpid():
+                return self._connection
+            self._abandon_connection()
+
+        # Imported here because most processes use the JSON file caches.
+        import sqlite3
+
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            connection = sqlite3.connect(
+                self._path,
+                timeout=_SQLITE_BUSY_TIMEOUT,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SQLITE_SCHEMA)
+        except (OSError, sqlite3.Error) as exc:
+            logger.warning("Unable to open credentials database: {}".format(exc))
+            return None
+
+        self._connection = connection
+        self._connection_pid = os.getpid()
+        # A connection is only freed by the cycle collector, so close it as
+        # soon as the cache is gone.
+        self._close_connection = weakref.finalize(self, connection.close)
+        return connection
+
+    def _abandon_connection(self):
+        """
+        Drop a connection inherited from the parent process without closing
+        it. Call with ``_connection_lock`` held.
+        """
+        # SQLite keeps per-process locking state for each open database
+        # file. Closing the parent's connection in a child, possibly in the
+        # middle of a transaction, could release or corrupt locks that
+        # connections opened by the child rely on. Keep it open, unused.
+        self._close_connection.detach()
+        _inherited_sqlite_connections.append(self._connection)
+        self._connection = None
+        self._connection_pid = None
+
+    def _select(self, connection, scopes, client_id, limit=1):
+        query = "SELECT {} FROM credentials".format(", ".join(_SQLITE_COLUMNS))
+        conditions = []
+        parameters = []
+        for column, value in (
+            ("scopes", scopes),
+            ("client_id", client_id),
+            ("account", self._account),
+        ):
+            if value is not None:
+                conditions.append("{} = ?".format(column))
+                parameters.append(value)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY last_used DESC"
+        if limit is None:
+            return [
+                dict(zip(_SQLITE_COLUMNS, row))
+                for row in connection.execute(query, parameters)
+            ]
+        row = connection.execute(query + " LIMIT ?", parameters + [limit]).fetchone()
+        if row is None:
+            return None
+        return dict(zip(_SQLITE_COLUMNS, row))
+
+    def _load_matching(self, scopes, client_id, narrow=False):
+        import sqlite3
+
+        # Holding the lock through a refresh also keeps threads in this
+        # process from refreshing the same token at once.
+        with self._connection_lock:
+            connection = self._connect()
+            if connection is None:
+                return None
+            try:
+                credentials = self._load_row(connection, scopes, client_id)
+                if credentials is None and narrow and scopes:
+                    credentials = self._load_narrowed(connection, scopes, client_id)
+                return credentials
+            except sqlite3.Error as exc:
+                logger.warning("Unable to load credentials: {}".format(exc))
+                return None
+
+    def _load_row(self, connection, scopes, client_id):
+        row = self._select(connection, scopes, client_id)
+        if row is None:
+            return None
+        credentials = _user_credentials_from_row(row)
+        if credentials.valid:
+            return credentials
+
+        deadline = time.monotonic() + self._refresh_timeout
+        while True:
+            claimed, row = self._claim_refresh(connection, row)
+            if row is None:
+                return None
+            credentials = _user_credentials_from_row(row)
+            if credentials.valid or claimed:
+                break
+            if time.monotonic() >= deadline:
+                # The process holding the claim is taking too long. Refresh
+                # without it, but leave the row to the claim holder.
+                logger.debug("Timed out waiting for credentials refresh.")
+                return _refresh_user_credentials(credentials)
+            time.sleep(_LOCK_POLL_INTERVAL)
+
+        if credentials.valid:
+            return credentials
+
+        refreshed = None
+        try:
+            refreshed = _refresh_user_credentials(credentials)
+        finally:
+            # Release the claim even if the token endpoint is unreachable,
+            # so that other processes don't wait for it to expire.
+            self._finish_refresh(connection, row, refreshed)
+        return refreshed
+
+    def _finish_refresh(self, connection, row, refreshed):
+        """Save the refreshed token, or release the claim on ``row``."""
+        with connection:
+            if refreshed is None:
+                connection.execute(
+                    "UPDATE credentials SET refresh_claimed_until = 0"
+                    " WHERE rowid = ?",
+                    (row["rowid"],),
+                )
+            else:
+                # Only the access token changes, so update just that.
+                connection.execute(
+                    "UPDATE credentials SET access_token = ?, expiry = ?,"
+                    " last_used = ?, refresh_claimed_until = 0"
+                    " WHERE rowid = ?",
+                    (
+                        refreshed.token,
+                        _format_expiry(refreshed.expiry),
+                        time.time(),
+                        row["rowid"],
+                    ),
+                )
+
+    def _load_narrowed(self, connection, scopes, client_id):
+        # Superset matches can't use the index, but a database holds few
+        # rows per client and account.
+        rows = [
+            row
+            for row in self._select(connection, None, client_id, limit=None)
+            if _scopes_cover(row["scopes"], scopes)
+        ]
+        if not rows:
+            return None
+
+        # The stored access token is for the broader scopes, so only the
+        # refresh token is used.
+        narrowed = _narrow_user_credentials(_user_credentials_from_row(rows[0]), scopes)
+        if narrowed is not None:
+            # The refresh response may not include an ID token, so keep the
+            # account of the credentials the token came from.
+            self._upsert(connection, narrowed, account=rows[0]["account"])
+        return narrowed
+
+    def _claim_refresh(self, connection, row):
+        """
+        Claim the refresh of ``row``'s access token for this process.
+
+        Returns a ``(claimed, row)`` pair with the row as of the claim. The
+        row is ``None`` if it has been removed.
+        """
+        # BEGIN IMMEDIATE takes the write lock up front, so two processes
+        # can't both see an unclaimed row and claim it.
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            current = connection.execute(
+                "SELECT {} FROM credentials WHERE rowid = ?".format(
+                    ", ".join(_SQLITE_COLUMNS)
+                ),
+                (row["rowid"],),
+            ).fetchone()
+            claimed = False
+            if current is not None:
+                current = dict(zip(_SQLITE_COLUMNS, current))
+                now = time.time()
+                if (
+                    not _user_credentials_from_row(current).valid
+                    and current["refresh_claimed_until"] <= now
+                ):
+                    connection.execute(
+                        "UPDATE credentials SET refresh_claimed_until = ?"
+                        " WHERE rowid = ?",
+                        (now + self._refresh_timeout, row["rowid"]),
+                    )
+                    claimed = True
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return claimed, current
+
+
+# A child process must not use SQLite connections it inherited. Each cache
+# opens a new connection in the child when it sees its connection was opened
+# by another process, and inherited connections are kept here so that they
+# are never closed by the child.
+#
+# The list is bounded: a process adds at most one connection per cache, the
+# one it inherited, since the connection it opens to replace it is its own.
+# Entries from the parent's list stay in the child's copy, so a process
+# holds at most one connection per cache for each fork between it and the
+# process that opened the database. They can't be dropped: freeing a
+# connection closes it, which would release the file locks held by the
+# child's own connection to the same database.
+_sqlite_caches = weakref.WeakSet()
+_inherited_sqlite_connections = []
+
+
+def _reset_sqlite_caches_after_fork():
+    # Don't wait for locks here: another thread of the parent may have been
+    # refreshing credentials, holding a lock that will never be released.
+    for sqlite_cache in list(_sqlite_caches):
+        sqlite_cache._connection_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_sqlite_caches_after_fork)
 
 
 NOOP = CredentialsCache()
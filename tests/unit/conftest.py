@@ -0,0 +1,191 @@
+"""Shared fixtures for the pydata_google_auth unit tests."""
+
+import collections
+import http.server
+import json
+import multiprocessing
+import ssl
+import threading
+import time
+
+import pytest
+
+
+class _TokenHandler(http.server.BaseHTTPRequestHandler):
+    # Keep connections open so that tests can observe connection reuse.
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately. Without TCP_NODELAY, a
+    # kept-alive connection stalls on delayed ACKs.
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with server.lock:
+            server.request_count.value += 1
+            request_number = server.request_count.value
+            failure = server.failures.popleft() if server.failures else None
+            server.in_flight += 1
+            server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+        try:
+            self._respond(request_number, failure)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _respond(self, request_number, failure):
+        time.sleep(self.server.delay)
+
+        if failure is not None:
+            status, error = failure
+            if status is None:
+                # Drop the connection without a response, as a reset does.
+                self.close_connection = True
+                return
+            self._send_json(status, {"error": error})
+            return
+
+        self._send_json(
+            200,
+            {
+                "access_token": "stub-token-{}".format(request_number),
+                "expires_in": 3600,
+                "token_type": "Bearer",
+            },
+        )
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TokenEndpoint(object):
+    """A local stand-in for the OAuth 2.0 token endpoint.
+
+    Serves HTTPS if ``certfile`` (a PEM file with the certificate and its
+    private key) is set.
+    """
+
+    def __init__(self, delay=0.0, certfile=None):
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _TokenHandler)
+        self._scheme = "http"
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile)
+            self._server.socket = context.wrap_socket(
+                self._server.socket, server_side=True
+            )
+            self._scheme = "https"
+        self._server.daemon_threads = True
+        self._server.lock = threading.Lock()
+        # A shared value, so that requests are counted even when the test
+        # forks worker processes after starting the endpoint.
+        self._server.request_count = multiprocessing.Value("i", 0, lock=False)
+        self._server.delay = delay
+        self._server.failures = collections.deque()
+        self._server.in_flight = 0
+        self._server.peak_in_flight = 0
+        self._connections = multiprocessing.Value("i", 0, lock=False)
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+
+        original_process_request = self._server.process_request
+
+        def process_request(request, client_address):
+            with self._server.lock:
+                self._connections.value += 1
+            original_process_request(request, client_address)
+
+        self._server.process_request = process_request
+
+    @property
+    def uri(self):
+        host, port = self._server.server_address
+        return "{}://{}:{}/token".format(self._scheme, host, port)
+
+    @property
+    def request_count(self):
+        return self._server.request_count.value
+
+    @property
+    def peak_in_flight(self):
+        """The most requests that were being answered at once."""
+        return self._server.peak_in_flight
+
+    @property
+    def connection_count(self):
+        return self._connections.value
+
+    @property
+    def delay(self):
+        return self._server.delay
+
+    @delay.setter
+    def delay(self, value):
+        self._server.delay = value
+
+    def fail_next(self, count=1, status=503, error="server_error"):
+        """Answer the next ``count`` requests with an error.
+
+        A ``status`` of ``None`` drops the connection without a response.
+        """
+        with self._server.lock:
+            self._server.failures.extend([(status, error)] * count)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def reset_circuit_breakers():
+    """Keep failures in one test from opening breakers in the next."""
+    from pydata_google_auth import _breaker
+
+    _breaker.set_circuit_breaker()
+    yield
+    _breaker.set_circuit_breaker()
+
+
+@pytest.fixture
+def token_endpoint():
+    endpoint = TokenEndpoint()
+    endpoint.start()
+    yield endpoint
+    endpoint.stop()
+
+
+@pytest.fixture
+def write_service_account_key():
+    """Return a function that writes a new service account key file."""
+    rsa = pytest.importorskip("cryptography.hazmat.primitives.asymmetric.rsa")
+    from cryptography.hazmat.primitives import serialization
+
+    def write(path, token_uri="https://oauth2.googleapis.com/token"):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        with open(path, "w") as stream:
+            json.dump(
+                {
+                    "type": "service_account",
+                    "client_email": "sa@my-project.iam.gserviceaccount.com",
+                    "private_key": private_key.private_bytes(
+                        serialization.Encoding.PEM,
+                        serialization.PrivateFormat.PKCS8,
+                        serialization.NoEncryption(),
+                    ).decode("utf-8"),
+                    "token_uri": token_uri,
+                },
+                stream,
+            )
+
+    return write
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+try:
+    from unittest import mock
+except ImportError:  # pragma: NO COVER
+    import mock
+
+import google.auth
+import google.auth.credentials
+import google.auth.exceptions
+import google.auth.transport
+import pytest
+
+
+@pytest.fixture
+def module_under_test(monkeypatch, tmp_path):
+    from pydata_google_auth import _adc
+
+    record_path = str(tmp_path / "adc_source.json")
+    monkeypatch.setattr(_adc, "_get_record_path", lambda: record_path)
+    monkeypatch.delenv("GOOGLE_APPLICATION_CREDENTIALS", raising=False)
+    return _adc
+
+
+def test_find_default_credentials_records_none(monkeypatch, module_under_test):
+    mock_default = mock.Mock(
+        side_effect=google.auth.exceptions.DefaultCredentialsError()
+    )
+    monkeypatch.setattr(google.auth, "default", mock_default)
+
+    for _ in range(3):
+        with pytest.raises(google.auth.exceptions.DefaultCredentialsError):
+            module_under_test.find_default_credentials(["scope"])
+
+    # Later lookups in the same environment skip discovery.
+    assert mock_default.call_count == 1
+
+
+def test_find_default_credentials_rediscovers_when_environment_changes(
+    monkeypatch, module_under_test, tmp_path
+):
+    credentials = mock.create_autospec(google.auth.credentials.Credentials)
+    mock_default = mock.Mock(
+        side_effect=[
+            google.auth.exceptions.DefaultCredentialsError(),
+            (credentials, "my-project"),
+        ]
+    )
+    monkeypatch.setattr(google.auth, "default", mock_default)
+
+    with pytest.raises(google.auth.exceptions.DefaultCredentialsError):
+        module_under_test.find_default_credentials(["scope"])
+
+    key_path = tmp_path / "key.json"
+    key_path.write_text("{}")
+    monkeypatch.setenv("GOOGLE_APPLICATION_CREDENTIALS", str(key_path))
+
+    assert module_under_test.find_default_credentials(["scope"]) == (
+        credentials,
+        "my-project",
+    )
+    fingerprint = module_under_test._environment_fingerprint()
+    assert module_under_test.load_source(fingerprint) == module_under_test.SOURCE_ENV
+
+
+def test_find_default_credentials_ignores_stale_record(monkeypatch, module_under_test):
+    fingerprint = module_under_test._environment_fingerprint()
+    module_under_test.save_source(fingerprint, module_under_test.SOURCE_ENV)
+    monkeypatch.setattr(module_under_test, "_RECORD_TTL", -1)
+
+    assert module_under_test.load_source(fingerprint) is None
+
+
+def test_none_record_expires_sooner(monkeypatch, module_under_test, tmp_path):
+    fingerprint = module_under_test._environment_fingerprint()
+    module_under_test.save_source(fingerprint, module_under_test.SOURCE_NONE)
+    assert module_under_test.load_source(fingerprint) == module_under_test.SOURCE_NONE
+
+    monkeypatch.setattr(module_under_test, "_NONE_RECORD_TTL", -1)
+    assert module_under_test.load_source(fingerprint) is None
+    # The record is replaced without leaving temporary files behind.
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["adc_source.json"]
+
+
+def _default_after_ping(error):
+    """Mock google.auth.default, failing after a metadata server ping."""
+
+    def default(scopes=None, request=None):
+        request("http://169.254.169.254", method="GET", headers={}, timeout=3)
+        raise google.auth.exceptions.DefaultCredentialsError()
+
+    transport = mock.create_autospec(google.auth.transport.Request)
+    transport.side_effect = error
+    return mock.Mock(side_effect=default), transport
+
+
+@pytest.mark.parametrize(
+    ["error", "expected_calls"],
+    [
+        # A slow metadata server is tried again by the next lookup.
+        (google.auth.exceptions.TransportError("Read timed out."), 2),
+        (google.auth.exceptions.TransportError(ConnectionRefusedError(111, "")), 1),
+    ],
+)
+def test_find_default_credentials_records_none_only_if_definitive(
+    monkeypatch, module_under_test, error, expected_calls
+):
+    mock_default, transport = _default_after_ping(error)
+    monkeypatch.setattr(google.auth, "default", mock_default)
+    monkeypatch.setattr(module_under_test._transport, "get_request", lambda: transport)
+
+    for _ in range(2):
+        with pytest.raises(google.auth.exceptions.DefaultCredentialsError):
+            module_under_test.find_default_credentials(["scope"])
+
+    assert mock_default.call_count == expected_calls
+
+
+def test_find_default_credentials_without_record(monkeypatch, module_under_test):
+    mock_default = mock.Mock(
+        side_effect=google.auth.exceptions.DefaultCredentialsError()
+    )
+    monkeypatch.setattr(google.auth, "default", mock_default)
+    fingerprint = module_under_test._environment_fingerprint()
+    module_under_test.save_source(fingerprint, module_under_test.SOURCE_NONE)
+
+    with pytest.raises(google.auth.exceptions.DefaultCredentialsError):
+        module_under_test.find_default_credentials(["scope"], record_source=False)
+
+    assert mock_default.call_count == 1
+
+
+def test_probe_request_caps_metadata_server_ping(module_under_test):
+    request = mock.create_autospec(google.auth.transport.Request)
+    request.side_effect = google.auth.exceptions.TransportError("timed out")
+    probe_request = module_under_test._ProbeRequest(request, probe_timeout=0.25)
+
+    first = probe_request("http://169.254.169.254", headers={}, timeout=3)
+    second = probe_request("http://169.254.169.254", headers={}, timeout=3)
+
+    assert first.status == 404
+    assert second.status == 404
+    request.assert_called_once_with(
+        "http://169.254.169.254", method="GET", body=None, headers={}, timeout=0.25
+    )
+
+
+def test_probe_request_passes_through_other_requests(module_under_test):
+    request = mock.create_autospec(google.auth.transport.Request)
+    probe_request = module_under_test._ProbeRequest(request, probe_timeout=0.25)
+
+    probe_request("https://sts.googleapis.com/v1/token", method="POST", timeout=30)
+
+    request.assert_called_once_with(
+        "https://sts.googleapis.com/v1/token",
+        method="POST",
+        body=None,
+        headers=None,
+        timeout=30,
+    )
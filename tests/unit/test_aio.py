@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import datetime
+
+try:
+    from unittest import mock
+except ImportError:  # pragma: NO COVER
+    import mock
+
+import google.auth._helpers
+import google.oauth2.credentials
+import pytest
+
+import pydata_google_auth
+
+
+TEST_SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+
+
+@pytest.fixture
+def module_under_test():
+    from pydata_google_auth import aio
+
+    return aio
+
+
+@pytest.fixture(autouse=True)
+def clear_credentials_memo():
+    pydata_google_auth.clear_credentials_memo()
+    yield
+    pydata_google_auth.clear_credentials_memo()
+
+
+def _valid_credentials():
+    return google.oauth2.credentials.Credentials(
+        token="token",
+        expiry=google.auth._helpers.utcnow() + datetime.timedelta(hours=1),
+    )
+
+
+def test_refresh_is_single_flight(module_under_test, token_endpoint):
+    # Slow enough that all tasks find the token expired.
+    token_endpoint.delay = 0.2
+    credentials = google.oauth2.credentials.Credentials(
+        token=None,
+        refresh_token="refresh_token",
+        token_uri=token_endpoint.uri,
+        client_id="client_id",
+        client_secret="client_secret",
+    )
+    ticks = []
+
+    async def tick():
+        # Runs only if the event loop isn't blocked by the refresh.
+        while True:
+            ticks.append(None)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        ticker = asyncio.ensure_future(tick())
+        results = await asyncio.gather(
+            *[module_under_test.refresh(credentials) for _ in range(1000)]
+        )
+        ticker.cancel()
+        return results
+
+    results = asyncio.run(main())
+
+    assert all(result is credentials for result in results)
+    assert credentials.token == "stub-token-1"
+    assert token_endpoint.request_count == 1
+    assert len(ticks) > 5
+
+
+def test_default_shares_lookup_and_uses_memo(module_under_test, monkeypatch):
+    from pydata_google_auth import auth
+
+    credentials = _valid_credentials()
+    mock_adc = mock.Mock(return_value=(credentials, "my-project"))
+    monkeypatch.setattr(auth, "get_application_default_credentials", mock_adc)
+
+    async def main():
+        return await asyncio.gather(
+            *[module_under_test.default(TEST_SCOPES) for _ in range(100)]
+        )
+
+    results = asyncio.run(main())
+
+    assert results == [(credentials, "my-project")] * 100
+    mock_adc.assert_called_once()
+
+    async def from_memo():
+        loop = asyncio.get_running_loop()
+        with mock.patch.object(loop, "run_in_executor") as mock_run:
+            result = await module_under_test.default(TEST_SCOPES)
+        mock_run.assert_not_called()
+        return result
+
+    assert asyncio.run(from_memo()) == (credentials, "my-project")
+
+
+def test_get_user_credentials(module_under_test, monkeypatch):
+    from pydata_google_auth import auth
+
+    credentials = _valid_credentials()
+    mock_get = mock.Mock(return_value=(credentials, None))
+    monkeypatch.setattr(auth, "_get_user_credentials", mock_get)
+
+    async def main():
+        return await asyncio.gather(
+            *[module_under_test.get_user_credentials(TEST_SCOPES) for _ in range(10)]
+        )
+
+    assert asyncio.run(main()) == [credentials] * 10
+    mock_get.assert_called_once()
+
+
+def test_load_service_account_credentials_shares_load(
+    module_under_test, tmp_path, write_service_account_key
+):
+    path = str(tmp_path / "service-account.json")
+    write_service_account_key(path)
+
+    async def main():
+        return await asyncio.gather(
+            *[
+                module_under_test.load_service_account_credentials(
+                    path, scopes=TEST_SCOPES, use_jwt_access=True
+                )
+                for _ in range(50)
+            ]
+        )
+
+    results = asyncio.run(main())
+
+    assert results[0].valid
+    assert all(result is results[0] for result in results)
+
+
+def test_load_user_credentials_raises(module_under_test, tmp_path):
+    with pytest.raises(pydata_google_auth.exceptions.PyDataCredentialsError):
+        asyncio.run(
+            module_under_test.load_user_credentials(str(tmp_path / "missing.json"))
+        )
@@ -1,12 +1,17 @@
 # -*- coding: utf-8 -*-
 
+import datetime
+
 try:
     from unittest import mock
 except ImportError:  # pragma: NO COVER
     import mock
 
 import google.auth
+import google.auth._helpers
 import google.auth.credentials
+import google.auth.jwt
+import google.auth.transport.requests
 import google.oauth2.credentials
 import pytest
 
@@ -31,6 +36,31 @@ def module_under_test():
     return auth
 
 
+@pytest.fixture(autouse=True)
+def isolate_adc_source_record(monkeypatch, tmp_path):
+    from pydata_google_auth import _adc
+
+    record_path = str(tmp_path / "adc_source.json")
+    monkeypatch.setattr(_adc, "_get_record_path", lambda: record_path)
+
+
+@pytest.fixture(autouse=True)
+def reset_colab_detection(monkeypatch, module_under_test):
+    # Tests replace try_colab_auth_import, so check again in each test.
+    monkeypatch.setattr(
+        module_under_test, "_colab_auth", module_under_test._COLAB_UNKNOWN
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_credentials_memo():
+    import pydata_google_auth
+
+    pydata_google_auth.clear_credentials_memo()
+    yield
+    pydata_google_auth.clear_credentials_memo()
+
+
 def test_default_returns_google_auth_credentials(monkeypatch, module_under_test):
     def mock_default_credentials(scopes=None, request=None):
         return (
@@ -64,6 +94,61 @@ def test_default_loads_user_credentials(monkeypatch, module_under_test):
     assert credentials is mock_user_credentials
 
 
+def test_default_memoizes_credentials(monkeypatch, module_under_test):
+    default_credentials = mock.create_autospec(google.auth.credentials.Credentials)
+    default_credentials.valid = True
+    mock_default = mock.Mock(return_value=(default_credentials, "default-project"))
+    monkeypatch.setattr(google.auth, "default", mock_default)
+
+    first = module_under_test.default(TEST_SCOPES)
+    # Scope order and duplicates don't matter.
+    second = module_under_test.default(TEST_SCOPES + list(reversed(TEST_SCOPES)))
+
+    assert first == (default_credentials, "default-project")
+    assert second == first
+    assert mock_default.call_count == 1
+
+    module_under_test.clear_credentials_memo()
+    module_under_test.default(TEST_SCOPES)
+    assert mock_default.call_count == 2
+
+
+def test_default_memo_skips_invalid_credentials(monkeypatch, module_under_test):
+    first_credentials = mock.create_autospec(google.auth.credentials.Credentials)
+    first_credentials.valid = True
+    second_credentials = mock.create_autospec(google.auth.credentials.Credentials)
+    second_credentials.valid = True
+    mock_default = mock.Mock(
+        side_effect=[(first_credentials, None), (second_credentials, None)]
+    )
+    monkeypatch.setattr(google.auth, "default", mock_default)
+
+    credentials, _ = module_under_test.default(TEST_SCOPES)
+    assert credentials is first_credentials
+
+    first_credentials.valid = False
+    credentials, _ = module_under_test.default(TEST_SCOPES)
+    assert credentials is second_credentials
+
+
+def test_get_user_credentials_memo_skips_noop_cache(monkeypatch, module_under_test):
+    monkeypatch.setattr(module_under_test, "try_colab_auth_import", lambda: None)
+    first_credentials = mock.create_autospec(google.oauth2.credentials.Credentials)
+    second_credentials = mock.create_autospec(google.oauth2.credentials.Credentials)
+    mock_flow = mock.Mock(side_effect=[first_credentials, second_credentials])
+    monkeypatch.setattr(module_under_test._webserver, "run_local_server", mock_flow)
+
+    first = module_under_test.get_user_credentials(
+        TEST_SCOPES, credentials_cache=pydata_google_auth.cache.NOOP
+    )
+    second = module_under_test.get_user_credentials(
+        TEST_SCOPES, credentials_cache=pydata_google_auth.cache.NOOP
+    )
+
+    assert first is first_credentials
+    assert second is second_credentials
+
+
 def test_get_user_credentials_tries_colab_first(monkeypatch, module_under_test):
     colab_auth_module = mock.Mock()
     try_colab_auth_import = mock.Mock(return_value=colab_auth_module)
@@ -111,6 +196,73 @@ def test_get_user_credentials_skips_colab_if_no_colab(monkeypatch, module_under_
     assert credentials is loaded_credentials
 
 
+def test_get_colab_default_credentials_checks_for_colab_once(
+    monkeypatch, module_under_test
+):
+    try_colab_auth_import = mock.Mock(return_value=None)
+    monkeypatch.setattr(
+        module_under_test, "try_colab_auth_import", try_colab_auth_import
+    )
+
+    assert module_under_test.get_colab_default_credentials(TEST_SCOPES) == (None, None)
+    assert module_under_test.get_colab_default_credentials(TEST_SCOPES) == (None, None)
+
+    try_colab_auth_import.assert_called_once_with()
+
+
+def test_get_colab_default_credentials_remembers_authentication(
+    monkeypatch, module_under_test
+):
+    colab_auth_module = mock.Mock()
+    monkeypatch.setattr(
+        module_under_test,
+        "try_colab_auth_import",
+        mock.Mock(return_value=colab_auth_module),
+    )
+    default_credentials = mock.create_autospec(google.auth.credentials.Credentials)
+    default_credentials.valid = True
+    mock_default = mock.Mock(return_value=(default_credentials, None))
+    monkeypatch.setattr(google.auth, "default", mock_default)
+
+    for _ in range(3):
+        credentials, _ = module_under_test.get_colab_default_credentials(TEST_SCOPES)
+        assert credentials is default_credentials
+    module_under_test.get_colab_default_credentials(["other-scope"])
+
+    colab_auth_module.authenticate_user.assert_called_once_with()
+    # Once for each set of scopes.
+    assert mock_default.call_count == 2
+
+    module_under_test.clear_credentials_memo()
+    module_under_test.get_colab_default_credentials(TEST_SCOPES)
+
+    assert colab_auth_module.authenticate_user.call_count == 2
+    assert mock_default.call_count == 3
+
+
+def test_get_colab_default_credentials_refreshes_remembered_credentials(
+    monkeypatch, module_under_test
+):
+    colab_auth_module = mock.Mock()
+    monkeypatch.setattr(
+        module_under_test,
+        "try_colab_auth_import",
+        mock.Mock(return_value=colab_auth_module),
+    )
+    default_credentials = mock.create_autospec(google.auth.credentials.Credentials)
+    default_credentials.valid = True
+    mock_default = mock.Mock(return_value=(default_credentials, None))
+    monkeypatch.setattr(google.auth, "default", mock_default)
+    module_under_test.get_colab_default_credentials(TEST_SCOPES)
+
+    default_credentials.valid = False
+    credentials, _ = module_under_test.get_colab_default_credentials(TEST_SCOPES)
+
+    assert credentials is default_credentials
+    default_credentials.refresh.assert_called_once()
+    assert mock_default.call_count == 1
+
+
 def test_load_service_account_credentials(monkeypatch, tmp_path, module_under_test):
     creds_path = str(tmp_path / "creds.json")
     with open(creds_path, "w") as stream:
@@ -125,6 +277,119 @@ def test_load_service_account_credentials(monkeypatch, tmp_path, module_under_te
     assert creds is fake_creds
 
 
+def test_load_service_account_credentials_starts_background_refresh(
+    monkeypatch, tmp_path, module_under_test
+):
+    creds_path = str(tmp_path / "creds.json")
+    with open(creds_path, "w") as stream:
+        stream.write("{}")
+
+    fake_creds = FakeCredentials()
+    mock_service = mock.create_autospec(service_account.Credentials)
+    mock_service.from_service_account_info.return_value = fake_creds
+    monkeypatch.setattr(service_account, "Credentials", mock_service)
+    mock_start = mock.Mock()
+    monkeypatch.setattr(
+        module_under_test._refresher, "start_background_refresh", mock_start
+    )
+
+    creds = module_under_test.load_service_account_credentials(
+        creds_path, background_refresh=True
+    )
+    assert creds is fake_creds
+    mock_start.assert_called_once_with(fake_creds)
+
+
+def _write_user_credentials(path, token_uri):
+    pydata_google_auth.cache._save_user_account_credentials(
+        google.oauth2.credentials.Credentials(
+            token=None,
+            refresh_token="refresh_token",
+            token_uri=token_uri,
+            client_id="client_id",
+            client_secret="client_secret",
+        ),
+        path,
+    )
+
+
+def test_load_user_credentials_lazy_refreshes_on_token_access(
+    tmp_path, module_under_test, token_endpoint
+):
+    creds_path = str(tmp_path / "creds.json")
+    _write_user_credentials(creds_path, token_endpoint.uri)
+
+    credentials = module_under_test.load_user_credentials(creds_path, lazy=True)
+
+    assert not credentials.valid
+    # Copies, which client libraries make, don't refresh either.
+    assert not credentials.with_quota_project("my-project").valid
+    assert token_endpoint.request_count == 0
+    assert credentials.token == "stub-token-1"
+    assert credentials.valid
+    assert credentials.token == "stub-token-1"
+    assert token_endpoint.request_count == 1
+
+
+def test_load_user_credentials_lazy_refreshes_before_request(
+    tmp_path, module_under_test, token_endpoint
+):
+    creds_path = str(tmp_path / "creds.json")
+    _write_user_credentials(creds_path, token_endpoint.uri)
+    credentials = module_under_test.load_user_credentials(creds_path, lazy=True)
+    headers = {}
+
+    credentials.before_request(
+        google.auth.transport.requests.Request(), "GET", "https://example.com", headers
+    )
+
+    assert headers["authorization"] == "Bearer stub-token-1"
+    assert credentials.token == "stub-token-1"
+    assert token_endpoint.request_count == 1
+
+
+def test_load_service_account_credentials_lazy(
+    tmp_path, module_under_test, token_endpoint, write_service_account_key
+):
+    creds_path = str(tmp_path / "service-account.json")
+    write_service_account_key(creds_path, token_endpoint.uri)
+
+    credentials = module_under_test.load_service_account_credentials(
+        creds_path, scopes=TEST_SCOPES, lazy=True
+    )
+
+    assert isinstance(credentials, service_account.Credentials)
+    assert token_endpoint.request_count == 0
+    assert credentials.token == "stub-token-1"
+    assert token_endpoint.request_count == 1
+
+
+def test_load_service_account_credentials_signs_jwt_locally(
+    tmp_path, module_under_test, token_endpoint, write_service_account_key
+):
+    creds_path = str(tmp_path / "service-account.json")
+    write_service_account_key(creds_path, token_endpoint.uri)
+
+    credentials = module_under_test.load_service_account_credentials(
+        creds_path, scopes=TEST_SCOPES, use_jwt_access=True
+    )
+
+    assert credentials.valid
+    claims = google.auth.jwt.decode(credentials.token, verify=False)
+    assert claims["scope"] == " ".join(TEST_SCOPES)
+    assert claims["iss"] == "sa@my-project.iam.gserviceaccount.com"
+    assert token_endpoint.request_count == 0
+
+
+def test_load_service_account_credentials_jwt_access_requires_scopes(
+    tmp_path, module_under_test
+):
+    with pytest.raises(ValueError, match="requires scopes"):
+        module_under_test.load_service_account_credentials(
+            str(tmp_path / "service-account.json"), use_jwt_access=True
+        )
+
+
 def test_load_user_credentials_raises_when_file_doesnt_exist(module_under_test):
     with pytest.raises(exceptions.PyDataCredentialsError):
         module_under_test.load_user_credentials("path/not/found.json")
@@ -135,3 +400,168 @@ def test_load_service_account_credentials_raises_when_file_doesnt_exist(
 ):
     with pytest.raises(exceptions.PyDataCredentialsError):
         module_under_test.load_service_account_credentials("path/not/found.json")
+
+
+def test_load_credentials_files_loads_each_type(
+    tmp_path, module_under_test, token_endpoint, write_service_account_key
+):
+    user_path = str(tmp_path / "user.json")
+    service_account_path = str(tmp_path / "service-account.json")
+    missing_path = str(tmp_path / "missing.json")
+    _write_user_credentials(user_path, token_endpoint.uri)
+    write_service_account_key(service_account_path, token_endpoint.uri)
+
+    loaded, errors = module_under_test.load_credentials_files(
+        [user_path, service_account_path, missing_path, user_path],
+        scopes=TEST_SCOPES,
+    )
+
+    assert list(loaded) == [user_path, service_account_path]
+    assert isinstance(loaded[user_path], google.oauth2.credentials.Credentials)
+    assert isinstance(loaded[service_account_path], service_account.Credentials)
+    assert all(credentials.valid for credentials in loaded.values())
+    assert list(errors) == [missing_path]
+    assert isinstance(errors[missing_path], exceptions.PyDataCredentialsError)
+    # The duplicate path is only loaded once.
+    assert token_endpoint.request_count == 2
+
+
+def test_load_credentials_files_refreshes_concurrently(
+    tmp_path, module_under_test, token_endpoint
+):
+    token_endpoint.delay = 0.2
+    paths = [str(tmp_path / "user-{}.json".format(index)) for index in range(8)]
+    for path in paths:
+        _write_user_credentials(path, token_endpoint.uri)
+
+    loaded, errors = module_under_test.load_credentials_files(paths, max_workers=8)
+
+    assert not errors
+    assert len(loaded) == 8
+    assert token_endpoint.request_count == 8
+    # Each response is delayed, so concurrent refreshes overlap.
+    assert token_endpoint.peak_in_flight > 1
+
+
+def test_load_credentials_files_reports_connection_errors(
+    monkeypatch, tmp_path, module_under_test
+):
+    from pydata_google_auth import _retry
+
+    monkeypatch.setattr(_retry, "_policy", _retry.RetryPolicy(max_attempts=1))
+    path = str(tmp_path / "user.json")
+    # Nothing listens on port 9 of localhost.
+    _write_user_credentials(path, "http://127.0.0.1:9/token")
+
+    loaded, errors = module_under_test.load_credentials_files([path])
+
+    assert not loaded
+    assert isinstance(errors[path], exceptions.PyDataConnectionError)
+
+
+def test_load_credentials_files_jwt_access_requires_scopes(module_under_test):
+    with pytest.raises(ValueError, match="requires scopes"):
+        module_under_test.load_credentials_files(
+            ["service-account.json"], use_jwt_access=True
+        )
+
+
+def test_get_user_credentials_loads_matching_profile(
+    monkeypatch, tmp_path, module_under_test
+):
+    monkeypatch.setattr(module_under_test, "try_colab_auth_import", lambda: None)
+    monkeypatch.setenv("HOME", str(tmp_path))
+    mock_flow = mock.Mock()
+    monkeypatch.setattr(module_under_test._webserver, "run_local_server", mock_flow)
+    credentials_cache = pydata_google_auth.cache.MultiProfileCredentialsCache()
+    for token, scopes in (("cloud", TEST_SCOPES), ("drive", ["drive"])):
+        credentials_cache.save(
+            google.oauth2.credentials.Credentials(
+                token=token,
+                expiry=google.auth._helpers.utcnow().replace(microsecond=0)
+                + datetime.timedelta(hours=1),
+                refresh_token="refresh_token",
+                client_id=module_under_test.DESKTOP_CLIENT_ID,
+                scopes=scopes,
+            )
+        )
+
+    credentials = module_under_test.get_user_credentials(
+        TEST_SCOPES, credentials_cache=credentials_cache
+    )
+
+    assert credentials.token == "cloud"
+    mock_flow.assert_not_called()
+
+
+def test_get_user_credentials_narrows_superset_profile(
+    monkeypatch, tmp_path, module_under_test
+):
+    monkeypatch.setattr(module_under_test, "try_colab_auth_import", lambda: None)
+    monkeypatch.setenv("HOME", str(tmp_path))
+    mock_flow = mock.Mock()
+    monkeypatch.setattr(module_under_test._webserver, "run_local_server", mock_flow)
+    refreshed_scopes = []
+
+    def mock_refresh(self, request):
+        refreshed_scopes.append(self.scopes)
+        self.token = "narrowed"
+        self.expiry = google.auth._helpers.utcnow() + datetime.timedelta(hours=1)
+
+    monkeypatch.setattr(google.oauth2.credentials.Credentials, "refresh", mock_refresh)
+    credentials_cache = pydata_google_auth.cache.MultiProfileCredentialsCache()
+    credentials_cache.save(
+        google.oauth2.credentials.Credentials(
+            token="broad",
+            expiry=google.auth._helpers.utcnow().replace(microsecond=0)
+            + datetime.timedelta(hours=1),
+            refresh_token="refresh_token",
+            client_id=module_under_test.DESKTOP_CLIENT_ID,
+            scopes=TEST_SCOPES + ["drive"],
+        )
+    )
+
+    credentials = module_under_test.get_user_credentials(
+        TEST_SCOPES, credentials_cache=credentials_cache
+    )
+
+    assert credentials.token == "narrowed"
+    assert refreshed_scopes == [sorted(TEST_SCOPES)]
+    mock_flow.assert_not_called()
+
+
+def test_reauth_replaces_memoized_credentials(monkeypatch, tmp_path, module_under_test):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(module_under_test, "try_colab_auth_import", lambda: None)
+    expiry = google.auth._helpers.utcnow() + datetime.timedelta(hours=1)
+
+    def make_credentials(account):
+        return google.oauth2.credentials.Credentials(
+            token=account,
+            expiry=expiry,
+            refresh_token="refresh-" + account,
+            client_id=module_under_test.DESKTOP_CLIENT_ID,
+            client_secret=module_under_test.DESKTOP_CLIENT_SECRET,
+            scopes=TEST_SCOPES,
+        )
+
+    read_write = pydata_google_auth.cache.ReadWriteCredentialsCache()
+    read_write.save(make_credentials("alice"))
+    mock_flow = mock.Mock(return_value=make_credentials("bob"))
+    monkeypatch.setattr(module_under_test._webserver, "run_local_server", mock_flow)
+
+    credentials = module_under_test.get_user_credentials(
+        TEST_SCOPES, credentials_cache=read_write
+    )
+    assert credentials.token == "alice"
+
+    module_under_test.get_user_credentials(
+        TEST_SCOPES,
+        credentials_cache=pydata_google_auth.cache.WriteOnlyCredentialsCache(),
+    )
+    assert mock_flow.call_count == 1
+
+    credentials = module_under_test.get_user_credentials(
+        TEST_SCOPES, credentials_cache=read_write
+    )
+    assert credentials.token == "bob"
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+import google.auth.exceptions
+import google.oauth2.credentials
+import pytest
+
+from pydata_google_auth import exceptions
+
+
+@pytest.fixture
+def module_under_test():
+    from pydata_google_auth import _breaker
+
+    return _breaker
+
+
+@pytest.fixture
+def refresh():
+    """Refresh with one attempt, so that each refresh is one request."""
+    from pydata_google_auth import _retry
+
+    policy = _retry.RetryPolicy(max_attempts=1)
+    return lambda credentials: _retry.refresh(credentials, policy=policy)
+
+
+def _make_credentials(token_uri, refresh_token="refresh_token"):
+    return google.oauth2.credentials.Credentials(
+        token=None,
+        refresh_token=refresh_token,
+        token_uri=token_uri,
+        client_id="client_id",
+        client_secret="client_secret",
+    )
+
+
+def test_breaker_opens_after_failure_threshold(
+    module_under_test, token_endpoint, refresh
+):
+    module_under_test.set_circuit_breaker(failure_threshold=2)
+    token_endpoint.fail_next(10, status=502, error="bad_gateway")
+
+    for index in range(2):
+        with pytest.raises(exceptions.PyDataConnectionError, match="after 1 attempts"):
+            refresh(_make_credentials(token_endpoint.uri, "token-{}".format(index)))
+    with pytest.raises(exceptions.PyDataConnectionError, match="is failing"):
+        refresh(_make_credentials(token_endpoint.uri, "other"))
+
+    assert token_endpoint.request_count == 2
+    stats = module_under_test.get_refresh_stats()[token_endpoint.uri]
+    assert stats["state"] == "open"
+    assert stats["consecutive_failures"] == 2
+    assert 0 < stats["open_for"] <= 30
+    assert stats["failures"] == 2
+    assert stats["rejections"] == 1
+    assert "bad_gateway" in stats["last_error"]
+
+
+def test_negative_cache_fails_same_credentials_fast(
+    module_under_test, token_endpoint, refresh
+):
+    token_endpoint.fail_next(status=502, error="bad_gateway")
+    credentials = _make_credentials(token_endpoint.uri)
+
+    with pytest.raises(exceptions.PyDataConnectionError, match="after 1 attempts"):
+        refresh(credentials)
+    with pytest.raises(exceptions.PyDataConnectionError, match="seconds ago"):
+        refresh(credentials)
+    # Other credentials still refresh while the breaker is closed.
+    refresh(_make_credentials(token_endpoint.uri, "other"))
+
+    assert token_endpoint.request_count == 2
+    stats = module_under_test.get_refresh_stats()[token_endpoint.uri]
+    assert stats["state"] == "closed"
+    assert stats["successes"] == 1
+
+
+def test_half_open_breaker_closes_after_successful_trial(
+    module_under_test, token_endpoint, refresh
+):
+    module_under_test.set_circuit_breaker(
+        failure_threshold=1, reset_timeout=0.05, negative_ttl=0
+    )
+    token_endpoint.fail_next(status=None)
+    credentials = _make_credentials(token_endpoint.uri)
+    with pytest.raises(exceptions.PyDataConnectionError):
+        refresh(credentials)
+
+    time.sleep(0.1)
+    stats = module_under_test.get_refresh_stats()[token_endpoint.uri]
+    assert stats["state"] == "half-open"
+    refresh(credentials)
+
+    assert credentials.valid
+    stats = module_under_test.get_refresh_stats()[token_endpoint.uri]
+    assert stats["state"] == "closed"
+    assert stats["consecutive_failures"] == 0
+
+
+def test_half_open_breaker_reopens_after_failed_trial(
+    module_under_test, token_endpoint, refresh
+):
+    module_under_test.set_circuit_breaker(
+        failure_threshold=3, reset_timeout=0.05, negative_ttl=0
+    )
+    token_endpoint.fail_next(4, status=502, error="bad_gateway")
+    credentials = _make_credentials(token_endpoint.uri)
+    for _ in range(3):
+        with pytest.raises(exceptions.PyDataConnectionError):
+            refresh(credentials)
+
+    time.sleep(0.1)
+    # One failed trial is enough to reopen.
+    with pytest.raises(exceptions.PyDataConnectionError, match="after 1 attempts"):
+        refresh(credentials)
+    with pytest.raises(exceptions.PyDataConnectionError, match="is failing"):
+        refresh(credentials)
+
+    assert token_endpoint.request_count == 4
+
+
+def test_half_open_breaker_lets_one_trial_through(module_under_test):
+    module_under_test.set_circuit_breaker(failure_threshold=1, reset_timeout=0)
+    breaker = module_under_test.get_breaker(_make_credentials("https://example.com"))
+    breaker.record_failure(RuntimeError("down"))
+
+    breaker.before_refresh()
+    with pytest.raises(exceptions.PyDataConnectionError, match="trial"):
+        breaker.before_refresh()
+    breaker.release()
+    breaker.before_refresh()
+
+
+def test_rejected_credentials_dont_open_breaker(
+    module_under_test, token_endpoint, refresh
+):
+    module_under_test.set_circuit_breaker(failure_threshold=2, negative_ttl=0)
+    token_endpoint.fail_next(status=502, error="bad_gateway")
+    token_endpoint.fail_next(status=400, error="invalid_grant")
+    token_endpoint.fail_next(status=502, error="bad_gateway")
+    credentials = _make_credentials(token_endpoint.uri)
+
+    with pytest.raises(exceptions.PyDataConnectionError):
+        refresh(credentials)
+    # The endpoint answered, so it's up.
+    with pytest.raises(google.auth.exceptions.RefreshError):
+        refresh(credentials)
+    with pytest.raises(exceptions.PyDataConnectionError):
+        refresh(credentials)
+
+    stats = module_under_test.get_refresh_stats()[token_endpoint.uri]
+    assert stats["state"] == "closed"
+    assert stats["consecutive_failures"] == 1
+
+
+def test_shared_breaker_opens_in_other_processes(
+    monkeypatch, tmp_path, module_under_test
+):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    module_under_test.set_circuit_breaker(failure_threshold=1, shared=True)
+    endpoint = "https://oauth2.example.com/token"
+    breaker = module_under_test.get_breaker(_make_credentials(endpoint))
+    breaker.record_failure(RuntimeError("down"))
+    assert os.path.exists(module_under_test._get_shared_path(endpoint))
+
+    # A breaker in another process reads the open state from the file.
+    other = module_under_test.CircuitBreaker(
+        endpoint, module_under_test._Settings(shared=True)
+    )
+    with pytest.raises(exceptions.PyDataConnectionError, match="down"):
+        other.before_refresh()
+
+    other.record_success()
+    assert not os.path.exists(module_under_test._get_shared_path(endpoint))
+
+
+def test_set_circuit_breaker_requires_threshold(module_under_test):
+    with pytest.raises(ValueError):
+        module_under_test.set_circuit_breaker(failure_threshold=0)
+
+
+def test_open_breaker_doesnt_block_self_signed_jwt(
+    module_under_test, token_endpoint, refresh, tmp_path, write_service_account_key
+):
+    import pydata_google_auth
+
+    module_under_test.set_circuit_breaker(failure_threshold=1)
+    token_endpoint.fail_next(status=None)
+    with pytest.raises(exceptions.PyDataConnectionError):
+        refresh(_make_credentials(token_endpoint.uri))
+    path = str(tmp_path / "service-account.json")
+    write_service_account_key(path, token_uri=token_endpoint.uri)
+
+    credentials = pydata_google_auth.load_service_account_credentials(
+        path, scopes=["scope"], use_jwt_access=True
+    )
+
+    assert credentials.valid
+    assert token_endpoint.request_count == 1
+    stats = module_under_test.get_refresh_stats()[token_endpoint.uri]
+    assert stats["state"] == "open"
+    assert stats["rejections"] == 0
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+import os
+import socket
+import stat
+import threading
+
+try:
+    from unittest import mock
+except ImportError:  # pragma: NO COVER
+    import mock
+
+import google.auth.exceptions
+import google.oauth2.credentials
+import pytest
+
+import pydata_google_auth.cache
+from pydata_google_auth import exceptions
+
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="requires Unix domain sockets"
+)
+
+
+@pytest.fixture
+def module_under_test():
+    from pydata_google_auth import _broker
+
+    return _broker
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / "broker.sock")
+
+
+def _unused_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def broker(module_under_test, token_endpoint, socket_path):
+    credentials = google.oauth2.credentials.Credentials(
+        token=None,
+        refresh_token="refresh_token",
+        token_uri=token_endpoint.uri,
+        client_id="client_id",
+        client_secret="client_secret",
+    )
+    server = module_under_test.TokenBroker(credentials, socket_path)
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+
+def test_broker_socket_is_private(broker, socket_path):
+    mode = os.stat(socket_path).st_mode
+    assert stat.S_ISSOCK(mode)
+    assert mode & 0o077 == 0
+
+
+def test_request_token_shares_one_refresh(
+    module_under_test, broker, token_endpoint, socket_path
+):
+    results = []
+
+    def get_token():
+        results.append(module_under_test.request_token(socket_path))
+
+    threads = [threading.Thread(target=get_token) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 20
+    assert {token for token, _ in results} == {"stub-token-1"}
+    assert all(expiry is not None for _, expiry in results)
+    assert token_endpoint.request_count == 1
+
+
+def test_broker_refreshes_expired_token(
+    module_under_test, broker, token_endpoint, socket_path
+):
+    module_under_test.request_token(socket_path)
+    broker.credentials.expiry = None
+    broker.credentials.token = None
+
+    token, _ = module_under_test.request_token(socket_path)
+
+    assert token == "stub-token-2"
+    assert token_endpoint.request_count == 2
+
+
+def test_broker_reports_refresh_error(module_under_test, broker, socket_path):
+    module_under_test.request_token(socket_path)
+    broker.credentials.token = None
+    broker.credentials._refresh_token = None
+
+    with pytest.raises(google.auth.exceptions.RefreshError, match="Refresh failed"):
+        module_under_test.request_token(socket_path)
+
+
+def test_request_token_without_broker(module_under_test, socket_path):
+    with pytest.raises(google.auth.exceptions.TransportError, match="Could not reach"):
+        module_under_test.request_token(socket_path)
+
+
+def test_broker_reports_unreachable_token_endpoint(
+    module_under_test, monkeypatch, broker, socket_path
+):
+    from pydata_google_auth import _retry
+
+    monkeypatch.setattr(_retry, "_policy", _retry.RetryPolicy(max_attempts=1))
+    module_under_test.request_token(socket_path)
+    broker.credentials.token = None
+    broker.credentials._token_uri = "http://127.0.0.1:{}/token".format(_unused_port())
+
+    with pytest.raises(google.auth.exceptions.TransportError, match="Refresh failed"):
+        module_under_test.request_token(socket_path)
+
+
+def test_server_close_removes_socket(module_under_test, socket_path):
+    credentials = google.oauth2.credentials.Credentials(token="token")
+    server = module_under_test.TokenBroker(credentials, socket_path)
+    server.server_close()
+    assert not os.path.exists(socket_path)
+
+
+def test_broker_refuses_to_replace_running_broker(
+    module_under_test, broker, socket_path
+):
+    credentials = google.oauth2.credentials.Credentials(token="token")
+    with pytest.raises(OSError, match="already listening"):
+        module_under_test.TokenBroker(credentials, socket_path)
+
+    # The running broker keeps its socket.
+    token, _ = module_under_test.request_token(socket_path)
+    assert token == "stub-token-1"
+
+
+def test_broker_replaces_stale_socket(module_under_test, socket_path):
+    # A socket file left by a broker that exited without cleaning up.
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(socket_path)
+    credentials = google.oauth2.credentials.Credentials(token="token")
+
+    server = module_under_test.TokenBroker(credentials, socket_path)
+    try:
+        # The new broker listens on the path.
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socket_path)
+    finally:
+        server.server_close()
+
+
+def test_broker_cache_loads_credentials(broker, socket_path):
+    cache = pydata_google_auth.cache.BrokerCredentialsCache(socket_path=socket_path)
+
+    credentials = cache.load()
+
+    assert credentials.valid
+    assert credentials.token == "stub-token-1"
+    request = mock.Mock()
+    credentials.refresh(request)
+    request.assert_not_called()
+
+
+def test_broker_cache_raises_without_broker(socket_path):
+    # Workers sharing a broker fail rather than each start an OAuth flow.
+    cache = pydata_google_auth.cache.BrokerCredentialsCache(socket_path=socket_path)
+    with pytest.raises(exceptions.PyDataConnectionError, match="Could not reach"):
+        cache.load()
+
+
+def test_broker_cache_raises_for_unreachable_token_endpoint(
+    module_under_test, monkeypatch, broker, socket_path
+):
+    from pydata_google_auth import _retry
+
+    monkeypatch.setattr(_retry, "_policy", _retry.RetryPolicy(max_attempts=1))
+    module_under_test.request_token(socket_path)
+    broker.credentials.token = None
+    broker.credentials._token_uri = "http://127.0.0.1:{}/token".format(_unused_port())
+    cache = pydata_google_auth.cache.BrokerCredentialsCache(socket_path=socket_path)
+
+    with pytest.raises(exceptions.PyDataConnectionError, match="Refresh failed"):
+        cache.load()
+
+
+def test_broker_cache_returns_none_for_rejected_credentials(
+    module_under_test, broker, socket_path
+):
+    module_under_test.request_token(socket_path)
+    broker.credentials.token = None
+    broker.credentials._refresh_token = None
+    cache = pydata_google_auth.cache.BrokerCredentialsCache(socket_path=socket_path)
+    assert cache.load() is None
+
+
+def test_get_user_credentials_uses_broker(monkeypatch, broker, socket_path):
+    from pydata_google_auth import auth
+
+    monkeypatch.setattr(auth, "try_colab_auth_import", lambda: None)
+    cache = pydata_google_auth.cache.BrokerCredentialsCache(socket_path=socket_path)
+
+    credentials = auth.get_user_credentials(["scope"], credentials_cache=cache)
+
+    assert credentials.token == "stub-token-1"
+    auth.clear_credentials_memo()
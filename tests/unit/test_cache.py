@@ -1,13 +1,19 @@
 """Test module for pydata_google_auth.cache"""
 
+import concurrent.futures
+import datetime
 import json
+import multiprocessing
 import os
 import os.path
 
 import pytest
 
+import google.auth.exceptions
 import google.oauth2.credentials
 
+from pydata_google_auth import exceptions
+
 try:
     from importlib import reload
 
@@ -22,6 +28,20 @@ def module_under_test():
     return cache
 
 
+def _utcnow():
+    # The cache, like google-auth, stores expiries as naive UTC datetimes.
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+@pytest.fixture
+def fast_retry(monkeypatch):
+    from pydata_google_auth import _retry
+
+    monkeypatch.setattr(
+        _retry, "_policy", _retry.RetryPolicy(max_attempts=2, initial_delay=0.01)
+    )
+
+
 def test_import_unwriteable_fs(module_under_test, monkeypatch):
     """Test import with an unwritable filesystem.
 
@@ -105,3 +125,682 @@ def test_WriteOnlyCredentialsCache_sets_path(module_under_test):
     parts = path.split(os.sep)
     assert parts[-2] == "dirtest"
     assert parts[-1] == "filetest.json"
+
+
+def test__save_user_account_credentials_saves_access_token(module_under_test, fs):
+    expiry = datetime.datetime(2030, 1, 2, 3, 4, 5)
+    credentials = google.oauth2.credentials.Credentials(
+        token="access_token",
+        expiry=expiry,
+        refresh_token="refresh_token",
+        token_uri="token_uri",
+        client_id="client_id",
+        client_secret="client_secret",
+        scopes=["scopes"],
+    )
+    path = "/home/username/.config/pydata/pydata_google_credentials.json"
+
+    module_under_test._save_user_account_credentials(credentials, path)
+
+    with open(path) as fp:
+        serialized_data = json.load(fp)
+    assert serialized_data["access_token"] == "access_token"
+    assert serialized_data["expiry"] == "2030-01-02T03:04:05Z"
+
+
+def test_ReadWriteCredentialsCache_load_skips_refresh_when_token_valid(
+    module_under_test, monkeypatch, tmp_path
+):
+    def mock_refresh(self, request):
+        raise AssertionError("refresh should not be called")
+
+    monkeypatch.setattr(google.oauth2.credentials.Credentials, "refresh", mock_refresh)
+    cache = module_under_test.ReadWriteCredentialsCache(filename="creds.json")
+    cache._path = str(tmp_path / "creds.json")
+    expiry = _utcnow() + datetime.timedelta(hours=1)
+    cache.save(
+        google.oauth2.credentials.Credentials(
+            token="access_token",
+            expiry=expiry.replace(microsecond=0),
+            refresh_token="refresh_token",
+        )
+    )
+
+    credentials = cache.load()
+
+    assert credentials.valid
+    assert credentials.token == "access_token"
+
+
+def test__load_user_credentials_from_info_raises_on_transient_error(
+    module_under_test, monkeypatch, fast_retry
+):
+    def mock_refresh(self, request):
+        raise google.auth.exceptions.TransportError("Connection reset by peer")
+
+    monkeypatch.setattr(google.oauth2.credentials.Credentials, "refresh", mock_refresh)
+
+    # Not None, which would start an OAuth flow.
+    with pytest.raises(exceptions.PyDataConnectionError):
+        module_under_test._load_user_credentials_from_info(
+            {"refresh_token": "refresh_token"}
+        )
+
+
+def test__load_user_credentials_from_info_returns_none_on_invalid_grant(
+    module_under_test, monkeypatch, fast_retry
+):
+    calls = []
+
+    def mock_refresh(self, request):
+        calls.append(request)
+        raise google.auth.exceptions.RefreshError(
+            "invalid_grant: Token has been expired or revoked.",
+            {"error": "invalid_grant"},
+            retryable=False,
+        )
+
+    monkeypatch.setattr(google.oauth2.credentials.Credentials, "refresh", mock_refresh)
+
+    credentials = module_under_test._load_user_credentials_from_info(
+        {"refresh_token": "refresh_token"}
+    )
+
+    assert credentials is None
+    assert len(calls) == 1
+
+
+def test_ReadWriteCredentialsCache_load_saves_refreshed_token(
+    module_under_test, monkeypatch, tmp_path
+):
+    new_expiry = datetime.datetime(2030, 1, 2, 3, 4, 5)
+
+    def mock_refresh(self, request):
+        self.token = "new_access_token"
+        self.expiry = new_expiry
+
+    monkeypatch.setattr(google.oauth2.credentials.Credentials, "refresh", mock_refresh)
+    cache = module_under_test.ReadWriteCredentialsCache(filename="creds.json")
+    cache._path = str(tmp_path / "creds.json")
+    cache.save(
+        google.oauth2.credentials.Credentials(
+            token="old_access_token",
+            expiry=datetime.datetime(2000, 1, 1),
+            refresh_token="refresh_token",
+        )
+    )
+
+    credentials = cache.load()
+
+    assert credentials.token == "new_access_token"
+    with open(cache._path) as fp:
+        serialized_data = json.load(fp)
+    assert serialized_data["access_token"] == "new_access_token"
+    assert serialized_data["expiry"] == "2030-01-02T03:04:05Z"
+
+
+def test_ReadWriteCredentialsCache_load_reads_file_only_when_changed(
+    module_under_test, monkeypatch, tmp_path
+):
+    path = str(tmp_path / "creds.json")
+    writer = module_under_test.ReadWriteCredentialsCache()
+    writer._path = path
+    writer.save(_make_valid_credentials("first"))
+    cache = module_under_test.ReadWriteCredentialsCache()
+    cache._path = path
+    read_paths = []
+    load_json = module_under_test._load_credentials_json_from_file
+
+    def mock_load_json(path):
+        read_paths.append(path)
+        return load_json(path)
+
+    monkeypatch.setattr(
+        module_under_test, "_load_credentials_json_from_file", mock_load_json
+    )
+
+    assert cache.load().token == "first"
+    assert cache.load().token == "first"
+    assert len(read_paths) == 1
+
+    # Another process replaces the file.
+    writer.save(_make_valid_credentials("second"))
+    assert cache.load().token == "second"
+    assert cache.load().token == "second"
+    assert len(read_paths) == 2
+
+    os.remove(path)
+    assert cache.load() is None
+
+
+def _make_valid_credentials(token):
+    expiry = _utcnow() + datetime.timedelta(hours=1)
+    return google.oauth2.credentials.Credentials(
+        token=token,
+        expiry=expiry.replace(microsecond=0),
+        refresh_token="refresh_token",
+        token_uri="token_uri",
+        client_id="client_id",
+        client_secret="client_secret",
+        scopes=["scopes"],
+    )
+
+
+def _hammer_credentials_cache(path, worker_id, iterations):
+    import google_auth_oauthlib.flow
+    from pydata_google_auth import auth
+    from pydata_google_auth import cache
+
+    def fail_flow(*args, **kwargs):
+        raise AssertionError("Started an OAuth flow.")
+
+    google_auth_oauthlib.flow.InstalledAppFlow.from_client_config = fail_flow
+    credentials_cache = cache.ReadWriteCredentialsCache()
+    credentials_cache._path = path
+
+    for iteration in range(iterations):
+        # Raises ValueError if a reader ever observes a torn write.
+        with open(path) as fp:
+            json.load(fp)
+        # Go through the cache each time, not the per-process memo.
+        auth.clear_credentials_memo()
+        credentials = auth.get_user_credentials(
+            ["scopes"], credentials_cache=credentials_cache
+        )
+        assert credentials.valid
+        credentials_cache.save(
+            _make_valid_credentials("token-{}-{}".format(worker_id, iteration))
+        )
+    return worker_id
+
+
+def test__save_user_account_credentials_is_atomic(module_under_test, tmp_path):
+    path = str(tmp_path / "creds.json")
+    module_under_test._save_user_account_credentials(
+        _make_valid_credentials("first"), path
+    )
+    module_under_test._save_user_account_credentials(
+        _make_valid_credentials("second"), path
+    )
+
+    with open(path) as fp:
+        assert json.load(fp)["access_token"] == "second"
+    # Temporary files are renamed into place, not left behind.
+    assert os.listdir(str(tmp_path)) == ["creds.json"]
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="requires fork to start many processes quickly",
+)
+def test_ReadWriteCredentialsCache_concurrent_processes(module_under_test, tmp_path):
+    path = str(tmp_path / "creds.json")
+    module_under_test._save_user_account_credentials(
+        _make_valid_credentials("initial"), path
+    )
+    num_workers = 64
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=num_workers, mp_context=multiprocessing.get_context("fork")
+    ) as executor:
+        futures = [
+            executor.submit(_hammer_credentials_cache, path, worker_id, 10)
+            for worker_id in range(num_workers)
+        ]
+        results = [future.result() for future in futures]
+
+    assert sorted(results) == list(range(num_workers))
+
+
+def _load_from_credentials_cache(path):
+    from pydata_google_auth import cache
+
+    credentials_cache = cache.ReadWriteCredentialsCache()
+    credentials_cache._path = path
+    return credentials_cache.load().token
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="requires fork to start many processes quickly",
+)
+def test_ReadWriteCredentialsCache_refreshes_once_across_processes(
+    module_under_test, tmp_path, token_endpoint
+):
+    # Slow down the token endpoint so that all workers find the token
+    # expired at the same time.
+    token_endpoint.delay = 0.5
+    path = str(tmp_path / "creds.json")
+    module_under_test._save_user_account_credentials(
+        google.oauth2.credentials.Credentials(
+            token="expired_token",
+            expiry=datetime.datetime(2000, 1, 1),
+            refresh_token="refresh_token",
+            token_uri=token_endpoint.uri,
+            client_id="client_id",
+            client_secret="client_secret",
+        ),
+        path,
+    )
+    num_workers = 32
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=num_workers, mp_context=multiprocessing.get_context("fork")
+    ) as executor:
+        tokens = list(executor.map(_load_from_credentials_cache, [path] * num_workers))
+
+    assert tokens == ["stub-token-1"] * num_workers
+    assert token_endpoint.request_count == 1
+
+
+def test_ReadWriteCredentialsCache_refreshes_after_refresh_timeout(
+    module_under_test, monkeypatch, tmp_path
+):
+    def mock_refresh(self, request):
+        self.token = "new_access_token"
+        self.expiry = datetime.datetime(2030, 1, 2, 3, 4, 5)
+
+    monkeypatch.setattr(google.oauth2.credentials.Credentials, "refresh", mock_refresh)
+    cache = module_under_test.ReadWriteCredentialsCache(refresh_timeout=0.1)
+    cache._path = str(tmp_path / "creds.json")
+    cache.save(
+        google.oauth2.credentials.Credentials(
+            token="old_access_token",
+            expiry=datetime.datetime(2000, 1, 1),
+            refresh_token="refresh_token",
+        )
+    )
+
+    # Simulate another process holding the refresh lease.
+    with module_under_test._lock_credentials_file(cache._path):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            credentials = executor.submit(cache.load).result()
+
+    assert credentials.token == "new_access_token"
+    # The lease holder is responsible for saving the refreshed token.
+    with open(cache._path) as fp:
+        assert json.load(fp)["access_token"] == "old_access_token"
+
+
+def test__load_service_account_credentials_from_file_reuses_signer(
+    module_under_test, monkeypatch, tmp_path, write_service_account_key
+):
+    monkeypatch.setattr(
+        module_under_test,
+        "_SERVICE_ACCOUNT_SIGNERS",
+        module_under_test._signers.SignerCache(),
+    )
+    path = str(tmp_path / "service-account.json")
+    write_service_account_key(path)
+
+    def load():
+        return module_under_test._load_service_account_credentials_from_file(
+            path, use_jwt_access=True, scopes=["scope"]
+        )
+
+    first = load()
+    assert load().signer is first.signer
+
+    # Touching the file changes its identity, but not its content.
+    os.utime(path, (0, 0))
+    assert load().signer is first.signer
+
+    write_service_account_key(path)
+    replaced = load()
+    assert replaced.signer is not first.signer
+    assert replaced.valid
+
+
+def _make_profile_credentials(token, scopes, client_id="client_id", account=""):
+    expiry = _utcnow() + datetime.timedelta(hours=1)
+    return google.oauth2.credentials.Credentials(
+        token=token,
+        expiry=expiry.replace(microsecond=0),
+        refresh_token="refresh_token",
+        token_uri="token_uri",
+        client_id=client_id,
+        client_secret="client_secret",
+        scopes=scopes,
+        account=account,
+    )
+
+
+@pytest.fixture
+def profiles_cache(module_under_test, monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    return module_under_test.MultiProfileCredentialsCache(max_entries=2)
+
+
+def test_MultiProfileCredentialsCache_keeps_entry_per_key(profiles_cache):
+    profiles_cache.save(_make_profile_credentials("bq", ["bigquery", "drive"]))
+    profiles_cache.save(_make_profile_credentials("gcs", ["devstorage"]))
+
+    # Scope order and duplicates don't matter.
+    credentials = profiles_cache.load_for(scopes=["drive", "bigquery", "drive"])
+    assert credentials.token == "bq"
+    assert profiles_cache.load_for(scopes=["devstorage"]).token == "gcs"
+    assert profiles_cache.load_for(scopes=["devstorage"], client_id="other") is None
+    assert profiles_cache.load_for(scopes=["other"]) is None
+    # Without a key, the most recently saved credentials are loaded.
+    assert profiles_cache.load().token == "gcs"
+
+
+def test_MultiProfileCredentialsCache_reads_only_matching_entry(
+    module_under_test, monkeypatch, profiles_cache
+):
+    profiles_cache.save(_make_profile_credentials("bq", ["bigquery"]))
+    profiles_cache.save(_make_profile_credentials("gcs", ["devstorage"]))
+    read_paths = []
+    load_json = module_under_test._load_credentials_json_from_file
+
+    def mock_load_json(path):
+        read_paths.append(os.path.basename(path))
+        return load_json(path)
+
+    monkeypatch.setattr(
+        module_under_test, "_load_credentials_json_from_file", mock_load_json
+    )
+
+    assert profiles_cache.load_for(scopes=["bigquery"]).token == "bq"
+    assert len(read_paths) == 2
+    assert read_paths[0] == "index.json"
+
+
+def test_MultiProfileCredentialsCache_evicts_least_recently_used(
+    module_under_test, monkeypatch, profiles_cache
+):
+    monkeypatch.setattr(module_under_test, "_PROFILE_LAST_USED_RESOLUTION", -1.0)
+    profiles_cache.save(_make_profile_credentials("a", ["a"]))
+    profiles_cache.save(_make_profile_credentials("b", ["b"]))
+    # Using "a" makes "b" the least recently used.
+    assert profiles_cache.load_for(scopes=["a"]).token == "a"
+    profiles_cache.save(_make_profile_credentials("c", ["c"]))
+
+    assert profiles_cache.load_for(scopes=["a"]).token == "a"
+    assert profiles_cache.load_for(scopes=["b"]) is None
+    assert profiles_cache.load_for(scopes=["c"]).token == "c"
+    entry_files = [
+        name
+        for name in os.listdir(profiles_cache._dir)
+        if name.endswith(".json") and name != "index.json"
+    ]
+    assert len(entry_files) == 2
+
+
+def test_MultiProfileCredentialsCache_filters_by_account(
+    module_under_test, profiles_cache
+):
+    profiles_cache.save(_make_profile_credentials("alice", ["s"], account="alice@x"))
+    profiles_cache.save(_make_profile_credentials("bob", ["s"], account="bob@x"))
+
+    assert profiles_cache.load_for(scopes=["s"]).token == "bob"
+    alice_cache = module_under_test.MultiProfileCredentialsCache(account="alice@x")
+    assert alice_cache.load_for(scopes=["s"]).token == "alice"
+
+
+def test__normalize_scopes(module_under_test):
+    assert module_under_test._normalize_scopes(None) == ()
+    assert module_under_test._normalize_scopes(["b", "a", "b"]) == ("a", "b")
+    assert module_under_test._normalize_scopes(" b a ") == ("a", "b")
+
+
+def test__scopes_cover(module_under_test):
+    assert module_under_test._scopes_cover(["a", "b"], "b")
+    assert not module_under_test._scopes_cover(["a"], ["a", "b"])
+    # Broad scopes don't literally include the scopes they imply.
+    assert not module_under_test._scopes_cover(
+        ["https://www.googleapis.com/auth/cloud-platform"],
+        ["https://www.googleapis.com/auth/bigquery"],
+    )
+
+
+@pytest.fixture
+def narrowing_refresh(monkeypatch):
+    """Record the scopes of each refresh and mint a token for them."""
+    refreshed_scopes = []
+
+    def mock_refresh(self, request):
+        refreshed_scopes.append(self.scopes)
+        self.token = "token-for-" + "+".join(self.scopes)
+        self.expiry = _utcnow() + datetime.timedelta(hours=1)
+
+    monkeypatch.setattr(google.oauth2.credentials.Credentials, "refresh", mock_refresh)
+    return refreshed_scopes
+
+
+def test_MultiProfileCredentialsCache_narrows_superset_credentials(
+    module_under_test, profiles_cache, narrowing_refresh
+):
+    profiles_cache.save(
+        _make_profile_credentials("broad", ["bigquery", "drive"], account="alice@x")
+    )
+
+    credentials = profiles_cache.load_for(scopes=["bigquery"])
+
+    assert credentials.token == "token-for-bigquery"
+    assert credentials.refresh_token == "refresh_token"
+    assert narrowing_refresh == [["bigquery"]]
+    # The narrowed token is cached under its own scopes and account.
+    alice_cache = module_under_test.MultiProfileCredentialsCache(account="alice@x")
+    assert alice_cache.load_for(scopes=["bigquery"]).token == "token-for-bigquery"
+    assert profiles_cache.load_for(scopes=["bigquery", "drive"]).token == "broad"
+    assert profiles_cache.load_for(scopes=["bigquery"], client_id="other") is None
+    assert narrowing_refresh == [["bigquery"]]
+
+
+@pytest.fixture
+def sqlite_cache(module_under_test, monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    return module_under_test.SQLiteCredentialsCache()
+
+
+def test_SQLiteCredentialsCache_looks_up_by_scopes_and_client(sqlite_cache):
+    sqlite_cache.save(_make_profile_credentials("bq", ["bigquery", "drive"]))
+    sqlite_cache.save(_make_profile_credentials("gcs", ["devstorage"]))
+    sqlite_cache.save(_make_profile_credentials("gcs2", ["devstorage"], "other"))
+
+    assert sqlite_cache.load_for(scopes=["drive", "bigquery"]).token == "bq"
+    assert sqlite_cache.load_for(["devstorage"], client_id="client_id").token == "gcs"
+    assert sqlite_cache.load_for(["devstorage"], client_id="other").token == "gcs2"
+    assert sqlite_cache.load_for(scopes=["other"]) is None
+    assert sqlite_cache.load().token == "gcs2"
+
+    # Saving the same key replaces the entry.
+    sqlite_cache.save(_make_profile_credentials("bq2", ["bigquery", "drive"]))
+    assert sqlite_cache.load_for(scopes=["bigquery", "drive"]).token == "bq2"
+
+
+def test_SQLiteCredentialsCache_narrows_superset_credentials(
+    module_under_test, sqlite_cache, narrowing_refresh
+):
+    sqlite_cache.save(
+        _make_profile_credentials("broad", ["bigquery", "drive"], account="alice@x")
+    )
+
+    credentials = sqlite_cache.load_for(scopes=["bigquery"])
+
+    assert credentials.token == "token-for-bigquery"
+    assert narrowing_refresh == [["bigquery"]]
+    alice_cache = module_under_test.SQLiteCredentialsCache(account="alice@x")
+    assert alice_cache.load_for(scopes=["bigquery"]).token == "token-for-bigquery"
+    assert sqlite_cache.load_for(scopes=["bigquery", "drive"]).token == "broad"
+    assert sqlite_cache.load_for(scopes=["devstorage"]) is None
+    assert narrowing_refresh == [["bigquery"]]
+
+
+def test_SQLiteCredentialsCache_uses_wal(sqlite_cache):
+    sqlite_cache.save(_make_profile_credentials("token", ["scope"]))
+    with sqlite_cache._connection_lock:
+        connection = sqlite_cache._connect()
+        assert connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+
+
+def test_SQLiteCredentialsCache_refresh_updates_only_its_row(monkeypatch, sqlite_cache):
+    def mock_refresh(self, request):
+        self.token = "new_access_token"
+        self.expiry = datetime.datetime(2030, 1, 2, 3, 4, 5)
+
+    monkeypatch.setattr(google.oauth2.credentials.Credentials, "refresh", mock_refresh)
+    expired = _make_profile_credentials("old", ["a"])
+    expired.expiry = datetime.datetime(2000, 1, 1)
+    sqlite_cache.save(expired)
+    sqlite_cache.save(_make_profile_credentials("other", ["b"]))
+
+    credentials = sqlite_cache.load_for(scopes=["a"])
+
+    assert credentials.token == "new_access_token"
+    assert credentials.refresh_token == "refresh_token"
+    assert sqlite_cache.load_for(scopes=["a"]).token == "new_access_token"
+    assert sqlite_cache.load_for(scopes=["b"]).token == "other"
+
+
+def test_SQLiteCredentialsCache_refreshes_after_refresh_timeout(
+    monkeypatch, module_under_test, tmp_path
+):
+    def mock_refresh(self, request):
+        self.token = "new_access_token"
+        self.expiry = datetime.datetime(2030, 1, 2, 3, 4, 5)
+
+    monkeypatch.setattr(google.oauth2.credentials.Credentials, "refresh", mock_refresh)
+    monkeypatch.setenv("HOME", str(tmp_path))
+    cache = module_under_test.SQLiteCredentialsCache(refresh_timeout=0.1)
+    expired = _make_profile_credentials("old", ["a"])
+    expired.expiry = datetime.datetime(2000, 1, 1)
+    cache.save(expired)
+    # Simulate another process holding the refresh claim.
+    with cache._connection_lock:
+        connection = cache._connect()
+    connection.execute("UPDATE credentials SET refresh_claimed_until = 1e12")
+
+    credentials = cache.load_for(scopes=["a"])
+
+    assert credentials.token == "new_access_token"
+    # The claim holder is responsible for saving the refreshed token.
+    row = connection.execute("SELECT access_token FROM credentials").fetchone()
+    assert row == ("old",)
+
+
+def test_SQLiteCredentialsCache_releases_claim_when_refresh_fails(
+    monkeypatch, sqlite_cache, fast_retry
+):
+    def mock_refresh(self, request):
+        raise google.auth.exceptions.TransportError("Connection reset by peer")
+
+    monkeypatch.setattr(google.oauth2.credentials.Credentials, "refresh", mock_refresh)
+    expired = _make_profile_credentials("old", ["a"])
+    expired.expiry = datetime.datetime(2000, 1, 1)
+    sqlite_cache.save(expired)
+
+    with pytest.raises(exceptions.PyDataConnectionError):
+        sqlite_cache.load_for(scopes=["a"])
+
+    with sqlite_cache._connection_lock:
+        connection = sqlite_cache._connect()
+    row = connection.execute("SELECT refresh_claimed_until FROM credentials")
+    assert row.fetchone() == (0,)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_SQLiteCredentialsCache_forks_while_lock_is_held(sqlite_cache):
+    sqlite_cache.save(_make_profile_credentials("token", ["scope"]))
+    assert sqlite_cache.load_for(scopes=["scope"]).token == "token"
+    read_fd, write_fd = os.pipe()
+
+    # As if this thread were refreshing credentials when the process forks.
+    with sqlite_cache._connection_lock:
+        pid = os.fork()
+        if pid == 0:  # pragma: NO COVER
+            try:
+                # The child opens its own connection.
+                token = sqlite_cache.load_for(scopes=["scope"]).token
+                os.write(write_fd, token.encode("utf-8"))
+            finally:
+                os._exit(0)
+    os.close(write_fd)
+
+    with os.fdopen(read_fd, "rb") as stream:
+        assert stream.read() == b"token"
+    os.waitpid(pid, 0)
+    # The parent's connection still works.
+    assert sqlite_cache.load_for(scopes=["scope"]).token == "token"
+
+
+def _fork_and_load(sqlite_cache, depth):  # pragma: NO COVER
+    """
+    Load from ``sqlite_cache`` in a chain of ``depth`` forked processes.
+    Return how many inherited connections each process kept.
+    """
+    from pydata_google_auth import cache
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read_fd)
+            # Loading twice doesn't abandon the child's own connection.
+            sqlite_cache.load_for(scopes=["scope"])
+            sqlite_cache.load_for(scopes=["scope"])
+            counts = [len(cache._inherited_sqlite_connections)]
+            if depth > 1:
+                counts.extend(_fork_and_load(sqlite_cache, depth - 1))
+            os.write(write_fd, json.dumps(counts).encode("utf-8"))
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as stream:
+        counts = json.loads(stream.read().decode("utf-8"))
+    os.waitpid(pid, 0)
+    return counts
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_SQLiteCredentialsCache_keeps_one_inherited_connection_per_fork(
+    module_under_test, sqlite_cache
+):
+    sqlite_cache.save(_make_profile_credentials("token", ["scope"]))
+    sqlite_cache.load_for(scopes=["scope"])
+    inherited = len(module_under_test._inherited_sqlite_connections)
+
+    counts = _fork_and_load(sqlite_cache, depth=3)
+
+    assert counts == [inherited + 1, inherited + 2, inherited + 3]
+    assert len(module_under_test._inherited_sqlite_connections) == inherited
+
+
+def _load_from_sqlite_cache(home):
+    from pydata_google_auth import cache
+
+    os.environ["HOME"] = home
+    return cache.SQLiteCredentialsCache().load_for(scopes=["scope"]).token
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="requires fork to start many processes quickly",
+)
+def test_SQLiteCredentialsCache_refreshes_once_across_processes(
+    module_under_test, sqlite_cache, tmp_path, token_endpoint
+):
+    token_endpoint.delay = 0.5
+    sqlite_cache.save(
+        google.oauth2.credentials.Credentials(
+            token="expired_token",
+            expiry=datetime.datetime(2000, 1, 1),
+            refresh_token="refresh_token",
+            token_uri=token_endpoint.uri,
+            client_id="client_id",
+            client_secret="client_secret",
+            scopes=["scope"],
+        )
+    )
+    num_workers = 32
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=num_workers, mp_context=multiprocessing.get_context("fork")
+    ) as executor:
+        tokens = list(
+            executor.map(_load_from_sqlite_cache, [str(tmp_path)] * num_workers)
+        )
+
+    assert tokens == ["stub-token-1"] * num_workers
+    assert token_endpoint.request_count == 1
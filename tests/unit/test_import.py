@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import pydata_google_auth
+
+
+# Time, in microseconds, that a cold import may take. Generous, to allow for
+# slow CI machines. The list of modules that must not be imported is the more
+# precise check.
+IMPORT_TIME_BUDGET_US = 500000
+# Time the imports of ``print-token`` may take when it answers from its token
+# cache, on top of interpreter startup.
+PRINT_TOKEN_IMPORT_BUDGET_US = 100000
+
+# Only needed for an interactive OAuth flow or a token refresh.
+DEFERRED_MODULES = (
+    "google_auth_oauthlib",
+    "oauthlib",
+    "requests",
+    "google.auth.transport.requests",
+    "google.oauth2.service_account",
+)
+# Not needed to print a cached token.
+PRINT_TOKEN_DEFERRED_MODULES = DEFERRED_MODULES + ("argparse", "google")
+
+# Prints how long a statement takes and the modules it imports, as JSON.
+# ``-X importtime`` doesn't report modules that the package imports through
+# importlib on attribute access.
+IMPORT_TIMES_SCRIPT = """
+import json
+import sys
+import time
+
+before = set(sys.modules)
+start = time.perf_counter()
+{statement}
+elapsed_us = int((time.perf_counter() - start) * 1000000)
+print(json.dumps(
+    {{"elapsed_us": elapsed_us, "modules": sorted(set(sys.modules) - before)}}
+))
+"""
+
+
+# Prints the process-creating audit events raised by the import.
+AUDIT_IMPORT_SCRIPT = """
+import sys
+
+events = []
+sys.addaudithook(
+    lambda event, args: events.append(event)
+    if event in ("subprocess.Popen", "os.posix_spawn", "os.fork", "os.exec")
+    else None
+)
+import pydata_google_auth
+
+print(",".join(events))
+"""
+
+
+def _deferred_imported(modules, deferred_modules):
+    return [
+        module
+        for module in modules
+        if any(
+            module == deferred or module.startswith(deferred + ".")
+            for deferred in deferred_modules
+        )
+    ]
+
+
+@pytest.fixture(scope="module")
+def package_root():
+    return os.path.dirname(os.path.dirname(pydata_google_auth.__file__))
+
+
+@pytest.fixture(
+    scope="module",
+    params=[
+        "import pydata_google_auth",
+        "import pydata_google_auth.auth",
+        "import pydata_google_auth.cache",
+        "import pydata_google_auth\npydata_google_auth.default",
+    ],
+    ids=["package", "auth", "cache", "default"],
+)
+def import_result(request, package_root):
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_TIMES_SCRIPT.format(statement=request.param)],
+        cwd=package_root,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def test_import_defers_oauth_and_transport_modules(import_result):
+    assert _deferred_imported(import_result["modules"], DEFERRED_MODULES) == []
+
+
+def test_import_time_budget(import_result):
+    assert import_result["elapsed_us"] < IMPORT_TIME_BUDGET_US
+
+
+@pytest.fixture(scope="module")
+def print_token_imports(package_root, tmp_path_factory):
+    """
+    Run ``print-token`` with a cached token. Returns the modules it imports
+    and their cumulative import time, in microseconds.
+    """
+    import google.oauth2.credentials
+
+    from pydata_google_auth import _token_cache
+
+    home = str(tmp_path_factory.mktemp("home"))
+    credentials_path = os.path.join(home, "credentials.json")
+    with open(credentials_path, "w") as stream:
+        json.dump({"refresh_token": "refresh_token"}, stream)
+    expiry = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    credentials = google.oauth2.credentials.Credentials(
+        token="cached-token", expiry=expiry + datetime.timedelta(hours=1)
+    )
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("HOME", home)
+        monkeypatch.setenv("APPDATA", home)
+        _token_cache.save_token(
+            credentials_path,
+            _token_cache.get_source_identity(credentials_path),
+            credentials,
+        )
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-X",
+                "importtime",
+                "-m",
+                "pydata_google_auth",
+                "print-token",
+                credentials_path,
+            ],
+            cwd=package_root,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    assert result.stdout.strip() == "cached-token"
+
+    # Lines look like: "import time:   self [us] | cumulative | module". The
+    # modules imported after site are the ones the command imports, and
+    # unindented modules are imported directly rather than by another one.
+    modules = []
+    elapsed_us = 0
+    after_site = False
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, module = line[len("import time:") :].split("|")
+        if after_site:
+            modules.append(module.strip())
+            if not module[1:].startswith(" "):
+                elapsed_us += int(cumulative)
+        elif module.strip() == "site":
+            after_site = True
+    return modules, elapsed_us
+
+
+def test_print_token_fast_path_defers_modules(print_token_imports):
+    modules, _ = print_token_imports
+    assert modules
+    assert _deferred_imported(modules, PRINT_TOKEN_DEFERRED_MODULES) == []
+
+
+def test_print_token_fast_path_import_time_budget(print_token_imports):
+    _, elapsed_us = print_token_imports
+    assert elapsed_us < PRINT_TOKEN_IMPORT_BUDGET_US
+
+
+def test_import_does_not_spawn_processes(package_root):
+    result = subprocess.run(
+        [sys.executable, "-c", AUDIT_IMPORT_SCRIPT],
+        cwd=package_root,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == ""
+
+
+def test_version_attributes():
+    assert isinstance(pydata_google_auth.__version__, str)
+    assert pydata_google_auth.__version__
+    assert pydata_google_auth.__git_revision__ == (
+        pydata_google_auth.versions["full-revisionid"]
+    )
+
+
+def test_version_matches_checkout(package_root):
+    try:
+        head = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=package_root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip("Not a git checkout.")
+
+    assert pydata_google_auth.__git_revision__ == head
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+import pytest
+
+
+class FakeCredentials(object):
+    valid = True
+
+
+@pytest.fixture
+def module_under_test():
+    from pydata_google_auth import _memo
+
+    return _memo
+
+
+def test_get_or_create_drops_unused_key_locks(module_under_test):
+    memo = module_under_test.CredentialsMemo()
+
+    for index in range(100):
+        memo.get_or_create(("scopes", index), lambda: (FakeCredentials(), None))
+    memo.get_or_create("missing", lambda: (None, None))
+
+    assert memo._key_locks == {}
+    assert memo.get(("scopes", 3)) is not None
+
+
+def test_get_or_create_calls_factory_once_per_key(module_under_test):
+    memo = module_under_test.CredentialsMemo()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def factory():
+        calls.append(None)
+        started.set()
+        release.wait(5)
+        return FakeCredentials(), None
+
+    threads = [
+        threading.Thread(target=memo.get_or_create, args=("key", factory))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    # Clearing while the entry is created keeps the lock for the waiters.
+    memo.clear()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert memo._key_locks == {}
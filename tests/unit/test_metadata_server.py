@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import http.client
+import json
+import socket
+import threading
+
+import google.auth
+import google.auth.compute_engine
+import google.auth.transport.requests
+import google.oauth2.credentials
+import pytest
+from google.auth.compute_engine import _metadata
+
+
+@pytest.fixture
+def module_under_test():
+    from pydata_google_auth import _metadata_server
+
+    return _metadata_server
+
+
+@pytest.fixture
+def metadata_server(module_under_test, token_endpoint):
+    credentials = google.oauth2.credentials.Credentials(
+        token=None,
+        refresh_token="refresh_token",
+        token_uri=token_endpoint.uri,
+        client_id="client_id",
+        client_secret="client_secret",
+        scopes=["https://www.googleapis.com/auth/cloud-platform"],
+    )
+    server = module_under_test.MetadataServer(
+        credentials, port=0, project_id="my-project"
+    )
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start())
+        started.set()
+        loop.run_forever()
+
+        server.close()
+        # Close connections that clients left open, as asyncio.run() would.
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.close()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    assert started.wait(10)
+    yield server
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+
+
+@pytest.fixture
+def metadata_env(monkeypatch, tmp_path, metadata_server):
+    address = "{}:{}".format(metadata_server.host, metadata_server.port)
+    # google-auth reads the metadata host when it is imported.
+    monkeypatch.setattr(_metadata, "_GCE_METADATA_HOST", address)
+    monkeypatch.setenv("GCE_METADATA_IP", address)
+    monkeypatch.setenv("CLOUDSDK_CONFIG", str(tmp_path))
+    monkeypatch.delenv("GOOGLE_APPLICATION_CREDENTIALS", raising=False)
+    return address
+
+
+def _get(server, path, headers=None):
+    connection = http.client.HTTPConnection(server.host, server.port, timeout=10)
+    try:
+        connection.request("GET", path, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, response.getheader("Metadata-Flavor"), response.read()
+    finally:
+        connection.close()
+
+
+def test_compute_engine_credentials_refresh(metadata_env, token_endpoint):
+    credentials = google.auth.compute_engine.Credentials()
+    credentials.refresh(google.auth.transport.requests.Request())
+
+    assert credentials.token == "stub-token-1"
+    assert credentials.valid
+    assert token_endpoint.request_count == 1
+
+
+def test_default_finds_metadata_server(metadata_env):
+    credentials, project_id = google.auth.default()
+
+    assert isinstance(credentials, google.auth.compute_engine.Credentials)
+    assert project_id == "my-project"
+
+
+def test_requires_metadata_flavor_header(metadata_server):
+    status, _, _ = _get(
+        metadata_server, "/computeMetadata/v1/instance/service-accounts/default/token"
+    )
+    assert status == 403
+
+
+def test_rejects_forwarded_requests(metadata_server):
+    status, _, _ = _get(
+        metadata_server,
+        "/computeMetadata/v1/instance/service-accounts/default/token",
+        headers={"Metadata-Flavor": "Google", "X-Forwarded-For": "10.0.0.1"},
+    )
+    assert status == 403
+
+
+def test_ping(metadata_server):
+    status, flavor, _ = _get(metadata_server, "/", {"Metadata-Flavor": "Google"})
+    assert status == 200
+    assert flavor == "Google"
+
+
+def test_unknown_path(metadata_server):
+    status, _, _ = _get(
+        metadata_server,
+        "/computeMetadata/v1/instance/zone",
+        {"Metadata-Flavor": "Google"},
+    )
+    assert status == 404
+
+
+def test_concurrent_requests_share_token(metadata_server, token_endpoint):
+    results = []
+
+    def get_token():
+        status, _, body = _get(
+            metadata_server,
+            "/computeMetadata/v1/instance/service-accounts/default/token",
+            {"Metadata-Flavor": "Google"},
+        )
+        results.append((status, json.loads(body)["access_token"]))
+
+    threads = [threading.Thread(target=get_token) for _ in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [(200, "stub-token-1")] * 50
+    assert token_endpoint.request_count == 1
+
+
+def test_refreshes_expired_token(metadata_server, token_endpoint):
+    metadata_server.credentials.token = None
+
+    status, _, body = _get(
+        metadata_server,
+        "/computeMetadata/v1/instance/service-accounts/default/token",
+        {"Metadata-Flavor": "Google"},
+    )
+
+    assert status == 200
+    assert json.loads(body)["access_token"] == "stub-token-2"
+    assert json.loads(body)["expires_in"] > 3500
+
+
+def test_keep_alive(metadata_server):
+    connection = http.client.HTTPConnection(
+        metadata_server.host, metadata_server.port, timeout=10
+    )
+    try:
+        for _ in range(3):
+            connection.request(
+                "GET",
+                "/computeMetadata/v1/project/project-id",
+                headers={"Metadata-Flavor": "Google"},
+            )
+            response = connection.getresponse()
+            assert response.read() == b"my-project"
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize(
+    ["content_length", "expected_status"],
+    [
+        ("5", b"200"),
+        ("1000000000", b"400"),
+        ("-1", b"400"),
+        ("ten", b"400"),
+        ("\u00b2", b"400"),
+    ],
+)
+def test_limits_request_body(metadata_server, content_length, expected_status):
+    request = (
+        "GET / HTTP/1.1\r\nHost: metadata\r\nMetadata-Flavor: Google\r\n"
+        "Content-Length: {}\r\nConnection: close\r\n\r\nhello".format(content_length)
+    )
+    with socket.create_connection(
+        (metadata_server.host, metadata_server.port), timeout=10
+    ) as connection:
+        connection.sendall(request.encode("latin-1"))
+        status_line = connection.makefile("rb").readline()
+
+    assert status_line.split()[1] == expected_status
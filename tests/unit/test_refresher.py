@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import threading
+
+try:
+    from unittest import mock
+except ImportError:  # pragma: NO COVER
+    import mock
+
+import google.auth._helpers
+import google.oauth2.credentials
+import pytest
+
+import pydata_google_auth.cache
+
+
+@pytest.fixture
+def module_under_test():
+    from pydata_google_auth import _refresher
+
+    return _refresher
+
+
+def _make_credentials(expires_in):
+    return google.oauth2.credentials.Credentials(
+        token="access_token",
+        expiry=google.auth._helpers.utcnow() + datetime.timedelta(seconds=expires_in),
+    )
+
+
+def test_next_delay_is_fraction_of_remaining_lifetime(module_under_test):
+    credentials = _make_credentials(3600)
+    refresher = module_under_test.BackgroundRefresher(
+        credentials, refresh_fraction=0.5, jitter=0.0
+    )
+
+    assert refresher._next_delay() == pytest.approx(1800, abs=5)
+
+
+def test_next_delay_applies_jitter(module_under_test):
+    credentials = _make_credentials(3600)
+    refresher = module_under_test.BackgroundRefresher(
+        credentials, refresh_fraction=0.5, jitter=0.1
+    )
+
+    delays = [refresher._next_delay() for _ in range(20)]
+    assert all(1615 <= delay <= 1985 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_next_delay_refreshes_invalid_credentials_now(module_under_test):
+    credentials = google.oauth2.credentials.Credentials(token=None)
+    refresher = module_under_test.BackgroundRefresher(credentials)
+
+    assert refresher._next_delay() == 0.0
+
+
+def test_refresher_refreshes_and_saves(monkeypatch, module_under_test):
+    monkeypatch.setattr(module_under_test, "_MIN_DELAY", 0.01)
+    credentials = _make_credentials(0.05)
+    credentials_cache = mock.create_autospec(pydata_google_auth.cache.CredentialsCache)
+    refreshed = threading.Event()
+
+    def mock_refresh(request):
+        credentials.token = "new_access_token"
+        credentials.expiry = google.auth._helpers.utcnow() + datetime.timedelta(hours=1)
+        refreshed.set()
+
+    monkeypatch.setattr(credentials, "refresh", mock_refresh)
+
+    refresher = module_under_test.start_background_refresh(
+        credentials, credentials_cache=credentials_cache
+    )
+    try:
+        assert refreshed.wait(5)
+        assert module_under_test.start_background_refresh(credentials) is refresher
+    finally:
+        refresher.stop(timeout=5)
+
+    assert not refresher.running
+    assert credentials.token == "new_access_token"
+    credentials_cache.save.assert_called_once_with(credentials)
+
+
+def test_refresher_rejects_invalid_fraction(module_under_test):
+    with pytest.raises(ValueError):
+        module_under_test.BackgroundRefresher(
+            _make_credentials(3600), refresh_fraction=1.5
+        )
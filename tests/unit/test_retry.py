@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+import google.auth.exceptions
+import google.oauth2.credentials
+import pytest
+
+from pydata_google_auth import exceptions
+
+
+@pytest.fixture
+def module_under_test():
+    from pydata_google_auth import _retry
+
+    return _retry
+
+
+@pytest.fixture
+def fast_policy(module_under_test):
+    return module_under_test.RetryPolicy(initial_delay=0.01)
+
+
+def _make_credentials(token_uri):
+    return google.oauth2.credentials.Credentials(
+        token=None,
+        refresh_token="refresh_token",
+        token_uri=token_uri,
+        client_id="client_id",
+        client_secret="client_secret",
+    )
+
+
+@pytest.mark.parametrize(
+    "status",
+    [
+        # Dropped connection.
+        None,
+        # google-auth doesn't retry a 502 itself.
+        502,
+    ],
+)
+def test_refresh_retries_transient_errors(
+    module_under_test, token_endpoint, fast_policy, status
+):
+    token_endpoint.fail_next(2, status=status, error="bad_gateway")
+    credentials = _make_credentials(token_endpoint.uri)
+
+    module_under_test.refresh(credentials, policy=fast_policy)
+
+    assert credentials.valid
+    assert credentials.token == "stub-token-3"
+    assert token_endpoint.request_count == 3
+
+
+def test_refresh_doesnt_retry_invalid_grant(
+    module_under_test, token_endpoint, fast_policy
+):
+    token_endpoint.fail_next(status=400, error="invalid_grant")
+    credentials = _make_credentials(token_endpoint.uri)
+
+    with pytest.raises(google.auth.exceptions.RefreshError, match="invalid_grant"):
+        module_under_test.refresh(credentials, policy=fast_policy)
+    assert token_endpoint.request_count == 1
+
+
+def test_refresh_raises_connection_error_after_max_attempts(
+    module_under_test, token_endpoint
+):
+    token_endpoint.fail_next(10, status=502, error="bad_gateway")
+    credentials = _make_credentials(token_endpoint.uri)
+    policy = module_under_test.RetryPolicy(max_attempts=3, initial_delay=0.01)
+
+    with pytest.raises(exceptions.PyDataConnectionError, match="after 3 attempts"):
+        module_under_test.refresh(credentials, policy=policy)
+    assert token_endpoint.request_count == 3
+
+
+def test_refresh_times_out_requests_at_deadline(module_under_test, token_endpoint):
+    token_endpoint.delay = 2.0
+    credentials = _make_credentials(token_endpoint.uri)
+    policy = module_under_test.RetryPolicy(initial_delay=0.01, deadline=0.3)
+
+    start = time.monotonic()
+    with pytest.raises(exceptions.PyDataConnectionError):
+        module_under_test.refresh(credentials, policy=policy)
+    assert time.monotonic() - start < 1.0
+
+
+class _OldRefreshError(google.auth.exceptions.RefreshError):
+    """A RefreshError as raised by google-auth 1.x, without ``retryable``."""
+
+    @property
+    def retryable(self):
+        raise AttributeError("retryable")
+
+
+def test_is_transient_without_retryable_attribute(module_under_test):
+    error = _OldRefreshError("invalid_grant")
+
+    assert not module_under_test._is_transient(error, 400)
+    assert not module_under_test._is_transient(error)
+    assert module_under_test._is_transient(error, 503)
+
+
+def test_retry_policy_backoff_is_bounded(module_under_test):
+    policy = module_under_test.RetryPolicy(initial_delay=0.5, max_delay=1.5)
+
+    for _ in range(100):
+        assert 0 <= policy.backoff(1) <= 0.5
+        assert 0 <= policy.backoff(2) <= 1.0
+        assert 0 <= policy.backoff(10) <= 1.5
+
+
+def test_retry_policy_requires_an_attempt(module_under_test):
+    with pytest.raises(ValueError):
+        module_under_test.RetryPolicy(max_attempts=0)
+
+
+def test_set_refresh_retry(monkeypatch, module_under_test, token_endpoint):
+    monkeypatch.setattr(module_under_test, "_policy", module_under_test._policy)
+    module_under_test.set_refresh_retry(max_attempts=1)
+    token_endpoint.fail_next(status=502, error="bad_gateway")
+    credentials = _make_credentials(token_endpoint.uri)
+
+    with pytest.raises(exceptions.PyDataConnectionError, match="after 1 attempts"):
+        module_under_test.refresh(credentials)
+    assert token_endpoint.request_count == 1
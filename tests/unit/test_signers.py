@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+@pytest.fixture
+def module_under_test():
+    from pydata_google_auth import _signers
+
+    return _signers
+
+
+def test_get_requires_matching_identity_or_digest(module_under_test):
+    signers = module_under_test.SignerCache()
+    signers.put("key.json", ("mtime", 1, 2), "digest", {"info": 1}, "signer")
+
+    assert signers.get("key.json", identity=("mtime", 1, 2)) == ({"info": 1}, "signer")
+    assert signers.get("key.json", identity=("other", 1, 2)) is None
+    assert signers.get("other.json", identity=("mtime", 1, 2)) is None
+    # Same content under a new identity, such as after touching the file.
+    assert signers.get("key.json", identity=("other", 1, 2), digest="digest") == (
+        {"info": 1},
+        "signer",
+    )
+    assert signers.get("key.json", identity=("other", 1, 2)) == (
+        {"info": 1},
+        "signer",
+    )
+
+
+def test_evicts_least_recently_used(module_under_test):
+    signers = module_under_test.SignerCache(maxsize=2)
+    signers.put("a", "a-id", "a-digest", {}, "a-signer")
+    signers.put("b", "b-id", "b-digest", {}, "b-signer")
+    # Using "a" makes "b" the least recently used.
+    assert signers.get("a", identity="a-id") is not None
+    signers.put("c", "c-id", "c-digest", {}, "c-signer")
+
+    assert signers.get("a", identity="a-id") is not None
+    assert signers.get("b", identity="b-id") is None
+    assert signers.get("c", identity="c-id") is not None
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import json
+import os
+
+import google.oauth2.credentials
+import pytest
+
+
+@pytest.fixture
+def module_under_test():
+    from pydata_google_auth import _token_cache
+
+    return _token_cache
+
+
+@pytest.fixture
+def credentials_path(monkeypatch, tmp_path, token_endpoint):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    path = tmp_path / "credentials.json"
+    path.write_text(
+        json.dumps(
+            {
+                "refresh_token": "refresh_token",
+                "client_id": "client_id",
+                "client_secret": "client_secret",
+                "token_uri": token_endpoint.uri,
+            }
+        )
+    )
+    return str(path)
+
+
+def _make_credentials(token, expires_in):
+    expiry = datetime.datetime.utcnow() + datetime.timedelta(seconds=expires_in)
+    return google.oauth2.credentials.Credentials(token=token, expiry=expiry)
+
+
+def test_load_token_returns_saved_token(module_under_test, credentials_path):
+    identity = module_under_test.get_source_identity(credentials_path)
+    credentials = _make_credentials("cached-token", 600)
+
+    assert module_under_test.load_token(credentials_path) is None
+    assert module_under_test.save_token(credentials_path, identity, credentials)
+
+    assert module_under_test.load_token(credentials_path) == "cached-token"
+    assert module_under_test.load_token(credentials_path, min_ttl=300) == (
+        "cached-token"
+    )
+    # Not valid for long enough.
+    assert module_under_test.load_token(credentials_path, min_ttl=900) is None
+
+
+def test_load_token_ignores_changed_credentials_file(
+    module_under_test, credentials_path
+):
+    identity = module_under_test.get_source_identity(credentials_path)
+    module_under_test.save_token(
+        credentials_path, identity, _make_credentials("cached-token", 600)
+    )
+
+    with open(credentials_path, "a") as stream:
+        stream.write("\n")
+
+    assert module_under_test.load_token(credentials_path) is None
+
+
+def test_save_token_skips_tokens_without_expiry(module_under_test, credentials_path):
+    identity = module_under_test.get_source_identity(credentials_path)
+    credentials = google.oauth2.credentials.Credentials(token="forever")
+
+    assert not module_under_test.save_token(credentials_path, identity, credentials)
+    assert module_under_test.load_token(credentials_path) is None
+
+
+def test_print_token_answers_from_cache(capsys, credentials_path, token_endpoint):
+    from pydata_google_auth import __main__
+
+    __main__.main(["print-token", credentials_path])
+    __main__.main(["print-token", credentials_path])
+    assert capsys.readouterr().out.split() == ["stub-token-1", "stub-token-1"]
+    assert token_endpoint.request_count == 1
+
+    # The token expires in an hour, so asking for two hours refreshes it.
+    __main__.main(["print-token", "--min-ttl=7200", credentials_path])
+    assert capsys.readouterr().out.split() == ["stub-token-2"]
+    assert token_endpoint.request_count == 2
+
+
+@pytest.mark.parametrize(
+    ["argv", "expected"],
+    [
+        (["print-token", "creds.json"], ("creds.json", 60)),
+        (["print-token", "--min-ttl", "5", "creds.json"], ("creds.json", 5.0)),
+        (["print-token", "creds.json", "--min-ttl=0.5"], ("creds.json", 0.5)),
+        (["print-token"], None),
+        (["print-token", "a.json", "b.json"], None),
+        (["print-token", "--min-ttl", "soon", "creds.json"], None),
+        (["print-token", "--help"], None),
+        (["check", "creds.json"], None),
+        ([], None),
+    ],
+)
+def test_parse_print_token_args(argv, expected):
+    from pydata_google_auth import __main__
+
+    assert __main__._parse_print_token_args(argv) == expected
+
+
+def test_token_cache_is_private(module_under_test, credentials_path):
+    identity = module_under_test.get_source_identity(credentials_path)
+    module_under_test.save_token(
+        credentials_path, identity, _make_credentials("cached-token", 600)
+    )
+    token_path = module_under_test._get_token_path(os.path.abspath(credentials_path))
+
+    if os.name != "nt":
+        assert os.stat(token_path).st_mode & 0o077 == 0
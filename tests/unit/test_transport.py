@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+try:
+    from unittest import mock
+except ImportError:  # pragma: NO COVER
+    import mock
+
+import google.auth.transport
+import google.oauth2.credentials
+import pytest
+
+
+@pytest.fixture
+def module_under_test():
+    from pydata_google_auth import _transport
+
+    yield _transport
+    _transport.set_transport()
+
+
+def test_get_request_returns_shared_transport(module_under_test):
+    assert module_under_test.get_request() is module_under_test.get_request()
+
+
+def test_set_transport_injects_request(module_under_test):
+    request = mock.create_autospec(google.auth.transport.Request, instance=True)
+
+    module_under_test.set_transport(request)
+
+    assert module_under_test.get_request() is request
+
+
+def test_set_transport_configures_timeout(module_under_test):
+    module_under_test.set_transport(timeout=5)
+    request = module_under_test.get_request()
+    request.session = mock.Mock()
+
+    request("https://example.com/token", method="POST")
+    request("https://example.com/token", method="POST", timeout=1)
+
+    timeouts = [call[1]["timeout"] for call in request.session.request.call_args_list]
+    assert timeouts == [5, 1]
+
+
+def test_refreshes_reuse_connection(module_under_test, token_endpoint):
+    from pydata_google_auth import cache
+
+    module_under_test.set_transport()
+    for _ in range(5):
+        credentials = google.oauth2.credentials.Credentials(
+            token=None,
+            refresh_token="refresh_token",
+            token_uri=token_endpoint.uri,
+            client_id="client_id",
+            client_secret="client_secret",
+        )
+        assert cache._refresh_user_credentials(credentials) is credentials
+
+    assert token_endpoint.request_count == 5
+    assert token_endpoint.connection_count == 1
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 
 import socket
+import threading
+import urllib.request
+import webbrowser
 
 try:
     from unittest import mock
@@ -72,3 +75,135 @@ def test_run_local_server_raises_connectionerror(monkeypatch, module_under_test)
         module_under_test.run_local_server(mock_flow)
 
     mock_flow.run_local_server.assert_not_called()
+
+
+def test_bind_open_port_os_assigned(module_under_test):
+    sock = module_under_test.bind_open_port(0)
+    try:
+        assert sock.getsockname()[1] != 0
+        # Already listening: a client can connect before any server runs.
+        socket.create_connection(sock.getsockname()).close()
+    finally:
+        sock.close()
+
+
+def test_bind_open_port_skips_busy_port(module_under_test):
+    busy = module_under_test.bind_open_port(0)
+    busy_port = busy.getsockname()[1]
+    try:
+        sock = module_under_test.bind_open_port(busy_port, stop=busy_port + 10)
+        try:
+            assert sock.getsockname()[1] != busy_port
+        finally:
+            sock.close()
+    finally:
+        busy.close()
+
+
+def test_bind_open_port_returns_none(monkeypatch, module_under_test):
+    def mock_listen(port):
+        raise socket.error
+
+    monkeypatch.setattr(module_under_test, "_listen", mock_listen)
+    assert module_under_test.bind_open_port(9000) is None
+
+
+def _follow_redirects(monkeypatch, mock_flow):
+    """
+    Stand in for the user's browser following the redirect. Returns lists
+    of the redirect URLs, their threads, and the responses.
+    """
+    redirects = []
+    threads = []
+    responses = []
+
+    def follow_redirect(redirect):
+        with urllib.request.urlopen(redirect) as response:
+            responses.append(response.read())
+
+    def mock_open(url, new=0, autoraise=True):
+        redirect = "{}?code=abc&state=state".format(mock_flow.redirect_uri)
+        redirects.append(redirect)
+        thread = threading.Thread(target=follow_redirect, args=(redirect,))
+        thread.start()
+        threads.append(thread)
+
+    monkeypatch.setattr(webbrowser, "open", mock_open)
+    return redirects, threads, responses
+
+
+def test_run_flow_on_socket_receives_redirect(monkeypatch, module_under_test):
+    mock_flow = mock.create_autospec(
+        google_auth_oauthlib.flow.InstalledAppFlow, instance=True
+    )
+    mock_flow.authorization_url.return_value = ("https://auth.example/", "state")
+    redirects, threads, responses = _follow_redirects(monkeypatch, mock_flow)
+    sock = module_under_test.bind_open_port(0)
+    port = sock.getsockname()[1]
+
+    credentials = module_under_test.run_flow_on_socket(
+        mock_flow,
+        sock,
+        authorization_prompt_message="",
+        success_message="Done.",
+        prompt="consent",
+    )
+    threads[0].join()
+
+    assert credentials is mock_flow.credentials
+    assert mock_flow.redirect_uri == "http://localhost:{}/".format(port)
+    mock_flow.authorization_url.assert_called_once_with(prompt="consent")
+    mock_flow.fetch_token.assert_called_once_with(
+        authorization_response=redirects[0].replace("http", "https", 1)
+    )
+    assert responses == [b"Done."]
+    assert sock.fileno() == -1
+
+
+def test_run_flow_on_socket_default_messages(monkeypatch, capsys, module_under_test):
+    # Only the flow's public interface, not its private default messages.
+    mock_flow = mock.Mock(
+        spec=["authorization_url", "credentials", "fetch_token", "redirect_uri"]
+    )
+    mock_flow.authorization_url.return_value = ("https://auth.example/", "state")
+    _, threads, responses = _follow_redirects(monkeypatch, mock_flow)
+
+    module_under_test.run_flow_on_socket(mock_flow, module_under_test.bind_open_port(0))
+    threads[0].join()
+
+    assert "https://auth.example/" in capsys.readouterr().out
+    assert responses == [module_under_test.DEFAULT_WEB_SUCCESS_MESSAGE.encode()]
+
+
+def test_run_local_server_bind_once_uses_socket(monkeypatch, module_under_test):
+    sockets = []
+
+    def mock_run_flow_on_socket(app_flow, sock, **kwargs):
+        sockets.append(sock)
+        sock.close()
+        return app_flow.credentials
+
+    monkeypatch.setattr(
+        module_under_test, "run_flow_on_socket", mock_run_flow_on_socket
+    )
+    mock_flow = mock.create_autospec(
+        google_auth_oauthlib.flow.InstalledAppFlow, instance=True
+    )
+
+    credentials = module_under_test.run_local_server(mock_flow, bind_once=True, port=0)
+
+    assert credentials is mock_flow.credentials
+    assert len(sockets) == 1
+    mock_flow.run_local_server.assert_not_called()
+
+
+def test_run_local_server_bind_once_raises_connectionerror(
+    monkeypatch, module_under_test
+):
+    monkeypatch.setattr(module_under_test, "bind_open_port", lambda start: None)
+    mock_flow = mock.create_autospec(
+        google_auth_oauthlib.flow.InstalledAppFlow, instance=True
+    )
+
+    with pytest.raises(exceptions.PyDataConnectionError):
+        module_under_test.run_local_server(mock_flow, bind_once=True)